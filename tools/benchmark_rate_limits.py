@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measures the rate limit checks per second and the memory per tenant.
+
+Checks requests of the given number of tenants against the default limits
+of the API, then prints the checks per second and the memory held per
+tenant by the limiter, by the limiter shared by the API workers and by
+keeping a copy of the Limit objects for every tenant, as the limiter once
+did.
+
+    tools/benchmark_rate_limits.py --tenants 10000 --checks 200000
+"""
+
+import copy
+import optparse
+import os
+import resource
+import sys
+import time
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir,
+                                                os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'trove', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+from trove.common import cfg
+from trove.common import limits
+
+CONF = cfg.CONF
+
+REQUESTS = [('GET', '/v1.0/tenant/instances'),
+            ('POST', '/v1.0/tenant/instances'),
+            ('PUT', '/v1.0/tenant/instances/id'),
+            ('DELETE', '/v1.0/tenant/instances/id')]
+
+
+def max_rss():
+    """Returns the peak memory of the process in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def check(tenants, checks, check_for_delay):
+    started = time.time()
+    for index in xrange(checks):
+        verb, url = REQUESTS[index % len(REQUESTS)]
+        check_for_delay(verb, url, 'tenant-%d' % (index % tenants))
+    return checks / (time.time() - started)
+
+
+def copied_check(levels):
+    """Checks the limits of a tenant against its own copy of the Limit
+    objects, which the limiter kept before it stored bucket states.
+    """
+    def check_for_delay(verb, url, username):
+        if username not in levels:
+            levels[username] = copy.deepcopy(limits.DEFAULT_LIMITS)
+        delays = [limit(verb, url) for limit in levels[username]]
+        return min(delay for delay in delays if delay) if any(delays) else None
+    return check_for_delay
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--tenants', type='int', default=10000)
+    parser.add_option('--checks', type='int', default=200000)
+    options, args = parser.parse_args()
+    CONF.set_override('rate_limit_max_users', options.tenants)
+
+    for name in ('copied', 'limiter', 'shared'):
+        # Each is measured in a process of its own, as the peak memory of
+        # the other would hide its growth.
+        pid = os.fork()
+        if pid:
+            os.waitpid(pid, 0)
+            continue
+        before = max_rss()
+        if name == 'copied':
+            check_for_delay = copied_check({})
+        elif name == 'limiter':
+            check_for_delay = limits.Limiter(
+                limits.DEFAULT_LIMITS).check_for_delay
+        else:
+            check_for_delay = limits.SharedLimiter(
+                limits.DEFAULT_LIMITS).check_for_delay
+        rate = check(options.tenants, options.checks, check_for_delay)
+        per_tenant = float(max_rss() - before) / options.tenants
+        print("%-8s %10.0f checks/s %8.0f bytes/tenant"
+              % (name, rate, per_tenant))
+        sys.stdout.flush()
+        os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
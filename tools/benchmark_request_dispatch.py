@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Times the dispatch of requests to the users and databases controllers.
+
+Dispatches listings and creations of many users and databases through the
+controllers' resources, whose actions do nothing, so the time measured is
+that of validating and dispatching the requests. Prints it next to that of
+creating the validator of the schema for every request, as was once done.
+
+    tools/benchmark_request_dispatch.py --items 500 --requests 200
+"""
+
+import optparse
+import os
+import sys
+import time
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                                os.pardir,
+                                                os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'trove', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+import jsonschema
+import webob
+
+from trove.common import wsgi
+from trove.extensions.mysql.service import SchemaController
+from trove.extensions.mysql.service import UserController
+
+
+class Dispatched(object):
+    """Stands in for the actions of a controller."""
+
+    def index(self, req, tenant_id, instance_id):
+        return wsgi.Result(None, 200)
+
+    def create(self, req, body, tenant_id, instance_id):
+        return wsgi.Result(None, 202)
+
+
+class Users(Dispatched, UserController):
+    pass
+
+
+class Databases(Dispatched, SchemaController):
+    pass
+
+
+class Uncached(object):
+    """Creates the validator of the schema for every request."""
+
+    @classmethod
+    def get_validator(cls, action, body):
+        schema = cls.get_schema(action, body)
+        return jsonschema.Draft4Validator(schema) if schema else None
+
+
+class UncachedUsers(Uncached, Users):
+    pass
+
+
+class UncachedDatabases(Uncached, Databases):
+    pass
+
+
+def dispatch(controller, method, action, body, requests):
+    resource = controller.create_resource()
+    args = {'tenant_id': 'tenant', 'instance_id': 'instance'}
+    if body is not None:
+        args['body'] = body
+    started = time.time()
+    for _ in range(requests):
+        request = webob.Request.blank('/', method=method)
+        result = resource.execute_action(action, request, **args)
+        if isinstance(result, wsgi.Fault):
+            sys.exit("Request failed: %s" % result.wrapped_exc)
+    return (time.time() - started) / requests * 1000000
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--items', type='int', default=500,
+                      help='Users and databases in each request body.')
+    parser.add_option('--requests', type='int', default=200)
+    options, args = parser.parse_args()
+
+    users = {'users': [{'name': 'user%d' % index, 'password': 'password',
+                        'databases': [{'name': 'database%d' % index}]}
+                       for index in range(options.items)]}
+    databases = {'databases': [{'name': 'database%d' % index}
+                               for index in range(options.items)]}
+    cases = [('GET users', 'GET', 'index', None, Users, UncachedUsers),
+             ('POST users', 'POST', 'create', users, Users, UncachedUsers),
+             ('POST databases', 'POST', 'create', databases, Databases,
+              UncachedDatabases)]
+    print("%-16s %12s %12s" % ('request', 'us', 'uncached us'))
+    for name, method, action, body, cached, uncached in cases:
+        print("%-16s %12.1f %12.1f"
+              % (name,
+                 dispatch(cached(), method, action, body, options.requests),
+                 dispatch(uncached(), method, action, body,
+                          options.requests)))
+
+
+if __name__ == '__main__':
+    main()
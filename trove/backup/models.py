@@ -14,6 +14,8 @@
 
 """Model classes that form the core of snapshots functionality."""
 
+from sqlalchemy import func
+
 from trove.common import cfg
 from trove.common import exception
 from trove.db.models import DatabaseModelBase
@@ -99,6 +101,27 @@ class Backup(object):
             query = query.filter(DBBackup.id != exclude)
         return query.first()
 
+    @classmethod
+    def running_instance_ids(cls, instance_ids):
+        """
+        Returns the set of instance ids that have a running backup
+        :param instance_ids: Ids of the instances to check
+        """
+        if not instance_ids:
+            return set()
+        query = DBBackup.query()
+        query = query.filter(DBBackup.instance_id.in_(instance_ids),
+                             DBBackup.state.in_(BackupState.RUNNING_STATES))
+        query = query.filter_by(deleted=False)
+        query = query.with_entities(DBBackup.instance_id).distinct()
+        return set(row.instance_id for row in query.all())
+
+    @classmethod
+    def last_updated(cls, instance_id):
+        """Returns when a backup of the instance was last saved, if ever."""
+        query = DBBackup.query().filter(DBBackup.instance_id == instance_id)
+        return query.with_entities(func.max(DBBackup.updated)).scalar()
+
     @classmethod
     def get_by_id(cls, context, backup_id, deleted=False):
         """
@@ -209,6 +232,13 @@ class DBBackup(DatabaseModelBase):
                     'updated', 'deleted_at']
     preserve_on_delete = True
 
+    def save(self):
+        saved = super(DBBackup, self).save()
+        # The instance models import this module, hence the late import.
+        from trove.instance import models as instance_models
+        instance_models.refresh_api_status(self.instance_id)
+        return saved
+
     @property
     def is_running(self):
         return self.state in BackupState.RUNNING_STATES
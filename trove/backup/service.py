@@ -49,7 +49,12 @@ class BackupController(wsgi.Controller):
         LOG.info(_("id : '%s'\n\n") % id)
         context = req.environ[wsgi.CONTEXT_KEY]
         backup = Backup.get_by_id(context, id)
-        return wsgi.Result(views.BackupView(backup).data(), 200)
+        etag = wsgi.compute_etag(backup.id, backup.updated)
+        not_modified = wsgi.not_modified(req, etag)
+        if not_modified:
+            return not_modified
+        return wsgi.Result(views.BackupView(backup).data(), 200,
+                           headers=wsgi.etag_headers(etag))
 
     def create(self, req, body, tenant_id):
         LOG.debug("Creating a Backup for tenant '%s'" % tenant_id)
@@ -33,8 +33,46 @@ common_opts = [
                default='sqlite:///trove_test.sqlite',
                help='SQL Connection',
                secret=True),
+    cfg.StrOpt('sql_read_connection', default=None,
+               help='SQL Connection of a read replica serving the reads of '
+                    'GET requests.',
+               secret=True),
     cfg.IntOpt('sql_idle_timeout', default=3600),
     cfg.BoolOpt('sql_query_log', default=False),
+    cfg.IntOpt('sql_max_pool_size', default=None,
+               help='Number of connections kept open to the database, '
+                    'SQLAlchemy\'s default of 5 if unset.'),
+    cfg.IntOpt('sql_max_overflow', default=None,
+               help='Number of connections opened beyond sql_max_pool_size '
+                    'under load, SQLAlchemy\'s default of 10 if unset.'),
+    cfg.IntOpt('sql_pool_timeout', default=None,
+               help='Seconds to wait for a connection of the pool, '
+                    'SQLAlchemy\'s default of 30 if unset.'),
+    cfg.BoolOpt('sql_connection_ping', default=False,
+                help='Check connections are alive before using them.'),
+    cfg.StrOpt('sql_connection_mode', default='direct',
+               help='How the database driver is called: "direct" calls it '
+                    'in the calling green thread, "tpool" in a pool of '
+                    'native threads so a blocking driver such as MySQLdb '
+                    'stalls only its own request. Pure python drivers, '
+                    'such as mysql+pymysql://, cooperate with eventlet in '
+                    'direct mode.'),
+    cfg.IntOpt('sql_tpool_size', default=20,
+               help='Number of native threads calling the database driver '
+                    'in tpool mode.'),
+    cfg.BoolOpt('sql_session_per_request', default=True,
+                help='Share one database session among the database calls '
+                     'of an API request or RPC message.'),
+    cfg.BoolOpt('model_cache', default=False,
+                help='Cache the lookups of the models whose rows rarely '
+                     'change, such as the service images, in each process.'),
+    cfg.IntOpt('model_cache_ttl', default=300,
+               help='Seconds a cached model lookup is used.'),
+    cfg.IntOpt('model_cache_size', default=1000,
+               help='Maximum number of lookups cached per model.'),
+    cfg.IntOpt('model_cache_generation_interval', default=5,
+               help='Seconds between the checks for the models other '
+                    'processes wrote to, whose cached lookups are cleared.'),
     cfg.IntOpt('bind_port', default=8779),
     cfg.StrOpt('api_extensions_path', default='trove/extensions/routes',
                help='Path to extensions'),
@@ -58,7 +96,9 @@ common_opts = [
                help='The interval in seconds which periodic tasks are run'),
     cfg.IntOpt('periodic_interval', default=60),
     cfg.BoolOpt('trove_dns_support', default=False),
-    cfg.StrOpt('db_api_implementation', default='trove.db.sqlalchemy.api'),
+    cfg.StrOpt('db_api_implementation', default='trove.db.sqlalchemy.api',
+               help='The db api module. trove.db.memory.api keeps the rows '
+                    'in the memory of each process, for load tests.'),
     cfg.StrOpt('mysql_pkg', default='mysql-server-5.5'),
     cfg.StrOpt('percona_pkg', default='percona-server-server-5.5'),
     cfg.StrOpt('dns_driver', default='trove.dns.driver.DnsDriver'),
@@ -76,10 +116,54 @@ common_opts = [
     cfg.IntOpt('users_page_size', default=20),
     cfg.IntOpt('databases_page_size', default=20),
     cfg.IntOpt('instances_page_size', default=20),
+    cfg.BoolOpt('instances_page_server_fetch', default=False,
+                help='Fetch only the Nova servers backing the requested page '
+                     'of instances instead of listing every server owned by '
+                     'the tenant.'),
+    cfg.IntOpt('instances_page_server_fetch_concurrency', default=10,
+               help='Maximum number of concurrent Nova server GETs issued '
+                    'when instances_page_server_fetch is enabled.'),
     cfg.ListOpt('ignore_users', default=['os_admin', 'root']),
     cfg.ListOpt('ignore_dbs', default=['lost+found',
                                        'mysql',
                                        'information_schema']),
+    cfg.BoolOpt('server_cache', default=False,
+                help='Cache the Nova server status and addresses of '
+                     'instances in each API and taskmanager process.'),
+    cfg.IntOpt('server_cache_ttl', default=60,
+               help='Seconds a cached server is used without being '
+                    'confirmed by a refresh.'),
+    cfg.IntOpt('server_cache_size', default=1000,
+               help='Maximum number of servers kept in the server cache.'),
+    cfg.IntOpt('server_cache_refresh_interval', default=10,
+               help='Seconds between asking Nova for the servers changed '
+                    'since the last server cache refresh.'),
+    cfg.IntOpt('server_cache_page_size', default=1000,
+               help='Servers asked of Nova per request by a server cache '
+                    'refresh. Must not exceed the osapi_max_limit of Nova.'),
+    cfg.BoolOpt('nova_notifications_consumer', default=False,
+                help='Whether the taskmanager persists the server state Nova '
+                     'sends in its compute.instance notifications.'),
+    cfg.StrOpt('nova_notifications_topic', default='notifications.info',
+               help='Topic the Nova notifications are consumed from.'),
+    cfg.StrOpt('nova_control_exchange', default='nova',
+               help='Exchange Nova publishes its notifications on.'),
+    cfg.BoolOpt('server_status_from_db', default=False,
+                help='Whether instance reads use the server state persisted '
+                     'from the Nova notifications instead of calling Nova.'),
+    cfg.IntOpt('instance_watch_poll_interval', default=1,
+               help='Seconds between the checks of a request waiting for '
+                    'an instance to change for changes made by other '
+                    'processes.'),
+    cfg.IntOpt('instance_watch_max_timeout', default=60,
+               help='Longest time in seconds a request may wait for an '
+                    'instance to change.'),
+    cfg.IntOpt('flavor_cache_ttl', default=0,
+               help='Seconds the API caches the flavor list of a tenant, '
+                    'which also gives the flavors ETags. 0 disables it.'),
+    cfg.IntOpt('volume_usage_interval', default=60,
+               help='Seconds between the guest publishing the usage of its '
+                    'volume.'),
     cfg.IntOpt('agent_call_low_timeout', default=5),
     cfg.IntOpt('agent_call_high_timeout', default=60),
     cfg.StrOpt('guest_id', default=None),
@@ -127,6 +211,10 @@ common_opts = [
     cfg.IntOpt('http_post_rate', default=200),
     cfg.IntOpt('http_delete_rate', default=200),
     cfg.IntOpt('http_put_rate', default=200),
+    cfg.IntOpt('rate_limit_max_users', default=10000,
+               help='Maximum number of users whose rate limit state the API '
+                    'keeps. The least recently seen users are forgotten '
+                    'first.'),
     cfg.BoolOpt('hostname_require_ipv4', default=True,
                 help="Require user hostnames to be IPv4 addresses."),
     cfg.BoolOpt('trove_security_groups_support', default=True),
@@ -187,6 +275,35 @@ common_opts = [
     cfg.IntOpt('exists_notification_ticks', default=360,
                help='Number of report_intevals to wait between pushing events '
                     '(see report_interval)'),
+    cfg.BoolOpt('archive_deleted_rows', default=False,
+                help='Whether the taskmanager periodically archives the rows '
+                     'soft deleted more than archive_deleted_rows_age days '
+                     'ago to the shadow tables.'),
+    cfg.IntOpt('archive_deleted_rows_ticks', default=360,
+               help='Number of report_intervals to wait between archiving '
+                    'the deleted rows (see report_interval)'),
+    cfg.IntOpt('archive_deleted_rows_age', default=90,
+               help='Days after which soft deleted rows are archived.'),
+    cfg.IntOpt('archive_deleted_rows_batch_size', default=500,
+               help='Maximum number of soft deleted rows archived in one '
+                    'transaction.'),
+    cfg.IntOpt('archive_deleted_rows_max_rows', default=10000,
+               help='Maximum number of soft deleted rows the taskmanager '
+                    'archives each time.'),
+    cfg.BoolOpt('resync_quota_usages', default=False,
+                help='Whether the taskmanager periodically recounts the '
+                     'quota usages of every tenant from the instances and '
+                     'backups.'),
+    cfg.IntOpt('resync_quota_usages_ticks', default=360,
+               help='Number of report_intervals to wait between quota usage '
+                    'resyncs (see report_interval)'),
+    cfg.IntOpt('reservation_expire_age', default=24,
+               help='Hours after which the quota reservations neither '
+                    'committed nor rolled back are rolled back by the quota '
+                    'usage resync.'),
+    cfg.IntOpt('resync_quota_usages_batch_size', default=1000,
+               help='Maximum number of quota usages corrected by one '
+                    'statement.'),
     cfg.DictOpt('notification_service_id', default={},
                 help='Unique ID to tag notification events'),
     cfg.StrOpt('nova_proxy_admin_user', default='',
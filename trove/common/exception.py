@@ -129,6 +129,16 @@ class BadRequest(TroveError):
                 "either malformed or otherwise incorrect.")
 
 
+class MarkerNotFound(BadRequest):
+
+    message = _("Marker %(marker)s could not be found.")
+
+
+class InvalidSortKey(BadRequest):
+
+    message = _("Sort key %(sort_key)s is not supported.")
+
+
 class MissingKey(BadRequest):
 
     message = _("Required element/key - %(key)s was not specified")
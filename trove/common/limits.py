@@ -17,11 +17,16 @@
 Module dedicated functions/classes dealing with rate limiting requests.
 """
 
+import array
 import collections
 import copy
+import ctypes
 import httplib
 import math
+import mmap
+import multiprocessing
 import re
+import socket
 import time
 import webob.dec
 import webob.exc
@@ -158,7 +163,8 @@ DEFAULT_LIMITS = [
 class RateLimitingMiddleware(base_wsgi.TroveMiddleware):
     """
     Rate-limits requests passing through this middleware. All limit information
-    is stored in memory for this implementation.
+    is stored in memory for this implementation, shared by the API workers
+    when trove_api_workers is set.
     """
 
     def __init__(self, application, limits=None, limiter=None, **kwargs):
@@ -176,7 +182,7 @@ class RateLimitingMiddleware(base_wsgi.TroveMiddleware):
 
         # Select the limiter class
         if limiter is None:
-            limiter = Limiter
+            limiter = SharedLimiter if CONF.trove_api_workers else Limiter
         else:
             limiter = importutils.import_class(limiter)
 
@@ -216,11 +222,37 @@ class RateLimitingMiddleware(base_wsgi.TroveMiddleware):
         return self.application
 
 
+class _LimitSet(object):
+    """A list of limits prepared for checking.
+
+    The limits are grouped by verb with their regexes compiled, so a check
+    only matches the URL against the limits of the request's verb.
+    """
+
+    __slots__ = ('limits', 'by_verb')
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.by_verb = {}
+        for index, limit in enumerate(limits):
+            self.by_verb.setdefault(limit.verb, []).append(
+                (index, re.compile(limit.regex).match, limit))
+
+
 class Limiter(object):
     """
     Rate-limit checking class which handles limits in memory.
+
+    The bucket state of each user is an array of STATE_SIZE doubles per
+    limit of the user: the water level, the time of the last request, the
+    time of the next request allowed and the requests remaining. The states
+    of at most rate_limit_max_users users are kept, and the least recently
+    seen are forgotten first. A bucket is empty again once its unit of time
+    went by, so forgetting a user idle for that long changes nothing.
     """
 
+    STATE_SIZE = 4
+
     def __init__(self, limits, **kwargs):
         """
         Initialize the new `Limiter`.
@@ -228,19 +260,57 @@ class Limiter(object):
         @param limits: List of `Limit` objects
         """
         self.limits = copy.deepcopy(limits)
-        self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        self.max_users = CONF.rate_limit_max_users
+        self._default_set = _LimitSet(self.limits)
+        self._user_sets = {}
+        self._states = collections.OrderedDict()
 
         # Pick up any per-user limit information
         for key, value in kwargs.items():
             if key.startswith('user:'):
                 username = key[5:]
-                self.levels[username] = self.parse_limits(value)
+                self._user_sets[username] = _LimitSet(
+                    self.parse_limits(value))
+
+    def _limit_set(self, username):
+        return self._user_sets.get(username, self._default_set)
+
+    def _find_state(self, username):
+        """Returns the bucket state of the user and the offset of its first
+        limit in it, or None and 0 if the user has none.
+        """
+        return self._states.get(username), 0
+
+    def _state(self, username, limit_set, now):
+        """Returns the bucket state of the user and the offset of its first
+        limit in it, marked as the most recently used, after creating it if
+        need be.
+        """
+        state = self._states.pop(username, None)
+        if state is None:
+            state = array.array('d')
+            for limit in limit_set.limits:
+                state.extend((0.0, now, 0.0, limit.value))
+            while len(self._states) >= self.max_users:
+                self._states.popitem(last=False)
+        self._states[username] = state
+        return state, 0
 
     def get_limits(self, username=None):
         """
         Return the limits for a given user.
         """
-        return [limit.display() for limit in self.levels[username]]
+        state, base = self._find_state(username)
+        result = []
+        for index, limit in enumerate(self._limit_set(username).limits):
+            shown = limit.display()
+            if state is not None:
+                offset = base + index * self.STATE_SIZE
+                shown['remaining'] = int(state[offset + 3])
+                shown['resetTime'] = int(state[offset + 2] or
+                                         limit._get_time())
+            result.append(shown)
+        return result
 
     def check_for_delay(self, verb, url, username=None):
         """
@@ -248,10 +318,18 @@ class Limiter(object):
 
         @return: Tuple of delay (in seconds) and error message (or None, None)
         """
-        delays = []
+        limit_set = self._limit_set(username)
+        matched = [(index, limit)
+                   for index, match, limit in limit_set.by_verb.get(verb, ())
+                   if match(url)]
+        if not matched:
+            return None, None
 
-        for limit in self.levels[username]:
-            delay = limit(verb, url)
+        state, base = self._state(username, limit_set,
+                                  matched[0][1]._get_time())
+        delays = []
+        for index, limit in matched:
+            delay = self._leak(limit, state, base + index * self.STATE_SIZE)
             if delay:
                 delays.append((delay, limit.error_message))
 
@@ -261,6 +339,28 @@ class Limiter(object):
 
         return None, None
 
+    @staticmethod
+    def _leak(limit, state, offset):
+        """Records a request in the leaky bucket of the limit at offset of
+        the state. Returns the delay before the request is allowed, if any,
+        as Limit.__call__ does.
+        """
+        now = limit._get_time()
+        water_level = max(state[offset] - (now - state[offset + 1]), 0)
+        water_level += limit.request_value
+        difference = water_level - limit.capacity
+        state[offset + 1] = now
+
+        if difference > 0:
+            state[offset] = water_level - limit.request_value
+            state[offset + 2] = now + difference
+            return difference
+
+        state[offset] = water_level
+        state[offset + 2] = now
+        state[offset + 3] = math.floor(
+            ((limit.capacity - water_level) / limit.capacity) * limit.value)
+
     # This was ported from nova.
     # Keeping it as a static method for the sake of consistency
     #
@@ -325,6 +425,88 @@ class Limiter(object):
         return result
 
 
+class SharedLimiter(Limiter):
+    """
+    Rate-limit checking class which keeps the bucket states in memory shared
+    with the processes forked after it's created, such as the API workers,
+    so a user's requests count against the same limits whichever worker
+    serves them.
+
+    The states are kept in a hash table of rate_limit_max_users slots, each
+    holding the time the user was last seen and the states of the user's
+    limits laid out as in `Limiter`. A new user takes the first free slot
+    among the PROBES following its hash, or else the least recently seen
+    of them. The table is locked by a semaphore for the few microseconds a
+    check takes.
+    """
+
+    PROBES = 8
+
+    def __init__(self, limits, **kwargs):
+        """
+        Initialize the new `SharedLimiter`.
+
+        @param limits: List of `Limit` objects
+        """
+        super(SharedLimiter, self).__init__(limits, **kwargs)
+        limit_sets = [self._default_set] + self._user_sets.values()
+        self._stride = 1 + self.STATE_SIZE * max(len(limit_set.limits)
+                                                 for limit_set in limit_sets)
+        slots = self.max_users
+        self._memory = mmap.mmap(-1, 8 * slots * (1 + self._stride))
+        self._keys = (ctypes.c_uint64 * slots).from_buffer(self._memory)
+        self._table = (ctypes.c_double * (slots * self._stride)).from_buffer(
+            self._memory, 8 * slots)
+        self._lock = multiprocessing.Lock()
+
+    @staticmethod
+    def _key(username):
+        """Returns the non-zero hash keying the user's slot, which the
+        processes forked from this one compute alike.
+        """
+        return (hash(username) & 0xffffffffffffffff) | 1
+
+    def _probes(self, key):
+        slots = self.max_users
+        return [(key + probe) % slots
+                for probe in range(min(self.PROBES, slots))]
+
+    def _find_state(self, username):
+        key = self._key(username)
+        for slot in self._probes(key):
+            if self._keys[slot] == key:
+                return self._table, slot * self._stride + 1
+        return None, 0
+
+    def _state(self, username, limit_set, now):
+        key = self._key(username)
+        probes = self._probes(key)
+        found = [slot for slot in probes if self._keys[slot] == key]
+        if found:
+            slot = found[0]
+        else:
+            free = [slot for slot in probes if not self._keys[slot]]
+            slot = free[0] if free else min(
+                probes, key=lambda slot: self._table[slot * self._stride])
+            self._keys[slot] = key
+            offset = slot * self._stride + 1
+            for limit in limit_set.limits:
+                self._table[offset:offset + self.STATE_SIZE] = [
+                    0.0, now, 0.0, limit.value]
+                offset += self.STATE_SIZE
+        self._table[slot * self._stride] = now
+        return self._table, slot * self._stride + 1
+
+    def get_limits(self, username=None):
+        with self._lock:
+            return super(SharedLimiter, self).get_limits(username)
+
+    def check_for_delay(self, verb, url, username=None):
+        with self._lock:
+            return super(SharedLimiter, self).check_for_delay(verb, url,
+                                                              username)
+
+
 class WsgiLimiter(object):
     """
     Rate-limit checking from a WSGI application. Uses an in-memory `Limiter`.
@@ -389,24 +571,41 @@ class WsgiLimiterProxy(object):
         @param limiter_address: IP/port combination of where to request limit
         """
         self.limiter_address = limiter_address
+        # The idle keep-alive connections to the limiter, so a check costs
+        # a request rather than a new connection.
+        self._connections = []
+
+    def _request(self, conn, path, body, headers):
+        conn.request("POST", path, body, headers)
+        resp = conn.getresponse()
+        # The response is read in full so the connection can be reused.
+        content = resp.read()
+        if not resp.will_close:
+            self._connections.append(conn)
+        return resp, content
 
     def check_for_delay(self, verb, path, username=None):
         body = jsonutils.dumps({"verb": verb, "path": path})
         headers = {"Content-Type": "application/json"}
-
-        conn = httplib.HTTPConnection(self.limiter_address)
-
-        if username:
-            conn.request("POST", "/%s" % (username), body, headers)
+        path = "/%s" % username if username else "/"
+
+        if self._connections:
+            conn = self._connections.pop()
+            try:
+                resp, content = self._request(conn, path, body, headers)
+            except (httplib.HTTPException, socket.error):
+                # The limiter closed the idle connection.
+                conn.close()
+                conn = httplib.HTTPConnection(self.limiter_address)
+                resp, content = self._request(conn, path, body, headers)
         else:
-            conn.request("POST", "/", body, headers)
-
-        resp = conn.getresponse()
+            conn = httplib.HTTPConnection(self.limiter_address)
+            resp, content = self._request(conn, path, body, headers)
 
-        if 200 >= resp.status < 300:
+        if 200 <= resp.status < 300:
             return None, None
 
-        return resp.getheader("X-Wait-Seconds"), resp.read() or None
+        return resp.getheader("X-Wait-Seconds"), content or None
 
     # This was ported from nova.
     # Keeping it as a static method for the sake of consistency
@@ -1,6 +1,8 @@
+import functools
 import inspect
 import os
 
+from trove import db
 from trove.openstack.common import importutils
 from trove.openstack.common import loopingcall
 from trove.openstack.common.rpc import service as rpc_service
@@ -9,6 +11,28 @@ from trove.common import cfg
 CONF = cfg.CONF
 
 
+class SessionScopedManager(object):
+    """Runs the methods called on a manager in a database session scope.
+
+    The dispatcher finds the RPC methods on the manager by name, so wrapping
+    them here scopes every message without the managers knowing.
+    """
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        attr = getattr(self._manager, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def scoped(*args, **kwargs):
+            with db.session_scope():
+                return attr(*args, **kwargs)
+        return scoped
+
+
 class RpcService(rpc_service.Service):
 
     def __init__(self, host=None, binary=None, topic=None, manager=None):
@@ -17,13 +41,13 @@ class RpcService(rpc_service.Service):
         topic = topic or binary.rpartition('trove-')[2]
         self.manager_impl = importutils.import_object(manager)
         self.report_interval = CONF.report_interval
-        super(RpcService, self).__init__(host, topic,
-                                         manager=self.manager_impl)
+        super(RpcService, self).__init__(
+            host, topic, manager=SessionScopedManager(self.manager_impl))
 
     def start(self):
         super(RpcService, self).start()
         # TODO(hub-cap): Currently the context is none... do we _need_ it here?
-        pulse = loopingcall.LoopingCall(self.manager_impl.run_periodic_tasks,
+        pulse = loopingcall.LoopingCall(self.manager.run_periodic_tasks,
                                         context=None)
         pulse.start(interval=self.report_interval,
                     initial_delay=self.report_interval)
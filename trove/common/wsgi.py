@@ -17,6 +17,7 @@
 """Wsgi helper utilities for trove"""
 
 import eventlet.wsgi
+import hashlib
 import math
 import jsonschema
 import paste.urlmap
@@ -33,6 +34,7 @@ from xml.dom import minidom
 from trove.common import context as rd_context
 from trove.common import exception
 from trove.common import utils
+from trove import db
 from trove.openstack.common.gettextutils import _
 from trove.openstack.common import jsonutils
 
@@ -281,9 +283,10 @@ class Result(object):
 
     """
 
-    def __init__(self, data, status=200):
+    def __init__(self, data, status=200, headers=None):
         self._data = data
         self.status = status
+        self.headers = headers or {}
 
     def data(self, serialization_type):
         """Return an appropriate serialized type for the body.
@@ -301,7 +304,31 @@ class Result(object):
         return self._data
 
 
+def compute_etag(*parts):
+    """Returns a strong ETag for the representation fingerprinted by parts.
+
+    The parts must change whenever the representation does, for instance
+    the updated columns of the rows it is built from.
+    """
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+def etag_headers(etag):
+    return {'ETag': '"%s"' % etag}
+
+
+def not_modified(req, etag, headers=None):
+    """Returns a 304 Result if req's If-None-Match holds etag, else None."""
+    if etag not in req.if_none_match:
+        return None
+    headers = dict(headers or {}, **etag_headers(etag))
+    return Result(None, 304, headers=headers)
+
+
 class Resource(openstack_wsgi.Resource):
+    # The methods whose requests have no body to validate.
+    UNVALIDATED_METHODS = ('GET', 'HEAD', 'DELETE')
+
     def __init__(self, controller, deserializer, serializer,
                  exception_map=None):
         exception_map = exception_map or {}
@@ -316,7 +343,8 @@ class Resource(openstack_wsgi.Resource):
         if getattr(self.controller, action, None) is None:
             return Fault(webob.exc.HTTPNotFound())
         try:
-            self.controller.validate_request(action, action_args)
+            if request.method not in self.UNVALIDATED_METHODS:
+                self.controller.validate_request(action, action_args)
             result = super(Resource, self).execute_action(
                 action,
                 request,
@@ -427,17 +455,35 @@ class Controller(object):
 
     schemas = {}
 
+    # The validators of the schemas used so far by id, along with the
+    # schemas, which keep their ids from being reused.
+    _validators = {}
+
     @classmethod
     def get_schema(cls, action, body):
-        LOG.debug("Getting schema for %s:%s" %
-                  (cls.__class__.__name__, action))
+        LOG.debug("Getting schema for %s:%s", cls.__name__, action)
         if cls.schemas:
             matching_schema = cls.schemas.get(action, {})
             if matching_schema:
-                LOG.debug("Found Schema: %s" % matching_schema.get("name",
-                                                                   "none"))
+                LOG.debug("Found Schema: %s",
+                          matching_schema.get("name", "none"))
             return matching_schema
 
+    @classmethod
+    def get_validator(cls, action, body):
+        """Returns the validator of the schema of the action, which is
+        created the first time the schema is used, or None if the action
+        has no schema.
+        """
+        schema = cls.get_schema(action, body)
+        if not schema:
+            return None
+        cached = Controller._validators.get(id(schema))
+        if cached is None:
+            cached = (schema, jsonschema.Draft4Validator(schema))
+            Controller._validators[id(schema)] = cached
+        return cached[1]
+
     @staticmethod
     def format_validation_msg(errors):
         # format path like object['field1'][i]['subfield2']
@@ -454,15 +500,12 @@ class Controller(object):
 
     def validate_request(self, action, action_args):
         body = action_args.get('body', {})
-        schema = self.get_schema(action, body)
-        if schema:
-            validator = jsonschema.Draft4Validator(schema)
-            if not validator.is_valid(body):
-                errors = sorted(validator.iter_errors(body),
-                                key=lambda e: e.path)
-                error_msg = self.format_validation_msg(errors)
-                LOG.info(error_msg)
-                raise exception.BadRequest(message=error_msg)
+        validator = self.get_validator(action, body)
+        if validator is not None and not validator.is_valid(body):
+            errors = sorted(validator.iter_errors(body), key=lambda e: e.path)
+            error_msg = self.format_validation_msg(errors)
+            LOG.info(error_msg)
+            raise exception.BadRequest(message=error_msg)
 
     def create_resource(self):
         serializer = TroveResponseSerializer(
@@ -603,6 +646,7 @@ class TroveResponseSerializer(openstack_wsgi.ResponseSerializer):
             action)
         if isinstance(data, Result):
             response.status = data.status
+            response.headers.update(data.headers)
 
 
 class Fault(webob.exc.HTTPException):
@@ -739,6 +783,24 @@ class FaultWrapper(openstack_wsgi.Middleware):
         return _factory
 
 
+class SessionScopeMiddleware(openstack_wsgi.Middleware):
+    """Shares one database session among the calls made by a request.
+
+    The reads of GET and HEAD requests may be served by the read replica.
+    """
+
+    @webob.dec.wsgify(RequestClass=openstack_wsgi.Request)
+    def __call__(self, req):
+        with db.session_scope(replica_reads=req.method in ('GET', 'HEAD')):
+            return req.get_response(self.application)
+
+    @classmethod
+    def factory(cls, global_config, **local_config):
+        def _factory(app):
+            return cls(app)
+        return _factory
+
+
 # ported from Nova
 class OverLimitFault(webob.exc.HTTPException):
     """
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import optparse
 
 from trove.common import utils
@@ -29,6 +30,24 @@ def get_db_api():
     return utils.import_module(db_api_opt)
 
 
+def session_scope(replica_reads=False):
+    """Shares one database session among the calls made in the block.
+
+    With replica_reads the reads may go to the read replica until the
+    block's first write.
+    """
+    return get_db_api().session_scope(replica_reads)
+
+
+def without_session_scope(func):
+    """Decorates a long running function to use a session per call."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_db_api().unscoped():
+            return func(*args, **kwargs)
+    return wrapper
+
+
 class Query(object):
     """Mimics sqlalchemy query object.
 
@@ -62,17 +81,35 @@ class Query(object):
         self.db_api.delete_all(self._query_func, self._model,
                                **self._conditions)
 
-    def limit(self, limit=200, marker=None, marker_column=None):
+    def limit(self, limit=200, marker=None, marker_column=None,
+              sort_keys=None, sort_dir='asc', ranges=None):
+        """Returns a page of the matching rows.
+
+        Without sort_keys the rows are ordered by marker_column and the
+        marker is a value of it. With sort_keys the rows are ordered by those
+        columns then by id, and the marker is the id of the last row of the
+        previous page, from which the page seeks on all the sort keys.
+        ranges maps column names to (low, high) bounds, low inclusive and
+        high exclusive, either of which may be None.
+        """
         return self.db_api.find_all_by_limit(
             self._query_func,
             self._model,
             self._conditions,
             limit=limit,
             marker=marker,
-            marker_column=marker_column)
-
-    def paginated_collection(self, limit=200, marker=None, marker_column=None):
-        collection = self.limit(int(limit) + 1, marker, marker_column)
+            marker_column=marker_column,
+            sort_keys=sort_keys,
+            sort_dir=sort_dir,
+            ranges=ranges)
+
+    def paginated_collection(self, limit=200, marker=None, marker_column=None,
+                             sort_keys=None, sort_dir='asc', ranges=None):
+        if limit is None:
+            return (self.limit(None, marker, marker_column, sort_keys,
+                               sort_dir, ranges), None)
+        collection = self.limit(int(limit) + 1, marker, marker_column,
+                                sort_keys, sort_dir, ranges)
         if len(collection) > int(limit):
             return (collection[0:-1], collection[-2]['id'])
         return (collection, None)
@@ -0,0 +1,178 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Process wide read-through cache of the models which declare _cacheable.
+
+The rows found by each lookup of a model are kept for model_cache_ttl
+seconds in a bounded LRU cache of the model. The column values of the rows
+are kept rather than the models, and each hit builds a new model from them,
+so a caller changing the model it was given leaves the cache alone.
+
+The db api clears a cache whenever its process writes rows of the model,
+and also bumps the model's generation in the cache_generations table, which
+the other processes check every model_cache_generation_interval seconds to
+clear their caches too.
+"""
+
+import collections
+
+from trove.common import cfg
+from trove.db import get_db_api
+from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+_MISSING = object()
+
+_CACHES = {}
+_SYNCED_AT = None
+
+
+class ModelCache(object):
+    """A bounded LRU cache of the lookups of one model with a time to live.
+
+    Each entry holds the column values of the row found by a lookup, or
+    None if it found no row.
+    """
+
+    def __init__(self, name, ttl, max_size):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the cached result of the lookup or _MISSING."""
+        entry = self._entries.pop(key, None)
+        if entry is None or timeutils.is_older_than(entry[0], self.ttl):
+            self.misses += 1
+            return _MISSING
+        # Re-insert the entry to mark it as the most recently used.
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, values):
+        self._entries.pop(key, None)
+        self._entries[key] = (timeutils.utcnow(), values)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.invalidations += 1
+
+    def data(self):
+        return {'name': self.name,
+                'size': len(self),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations}
+
+
+def _get_cache(model):
+    global _SYNCED_AT
+    if not CONF.model_cache or not getattr(model, '_cacheable', False):
+        return None
+    name = model.__name__
+    if name not in _CACHES:
+        _CACHES[name] = ModelCache(name, CONF.model_cache_ttl,
+                                   CONF.model_cache_size)
+        # Learn the generation of the new cache before filling it.
+        _SYNCED_AT = None
+    return _CACHES[name]
+
+
+def _sync_generations():
+    """Clears the caches whose model another process has written to."""
+    global _SYNCED_AT
+    if (_SYNCED_AT is not None and not timeutils.is_older_than(
+            _SYNCED_AT, CONF.model_cache_generation_interval)):
+        return
+    _SYNCED_AT = timeutils.utcnow()
+    generations = get_db_api().get_generations()
+    for name, cache in _CACHES.items():
+        generation = generations.get(name, 0)
+        if cache.generation is not None and cache.generation != generation:
+            LOG.debug("Model cache of %s cleared for generation %d."
+                      % (name, generation))
+            cache.clear()
+        cache.generation = generation
+
+
+def find_by(model, load, **conditions):
+    """Returns the result of load() for the lookup, from the cache if it can.
+
+    load runs the lookup of the model by the conditions against the database.
+    """
+    cache = _get_cache(model)
+    if cache is None:
+        return load()
+    try:
+        key = tuple(sorted(conditions.items()))
+        hash(key)
+    except TypeError:
+        return load()
+    _sync_generations()
+    values = cache.get(key)
+    if values is not _MISSING:
+        return None if values is None else get_db_api().load(model, values)
+    invalidations = cache.invalidations
+    found = load()
+    # A write during the load may have left found stale.
+    if cache.invalidations == invalidations:
+        cache.put(key, None if found is None
+                  else get_db_api().values_of(model, found))
+    return found
+
+
+def invalidate(model):
+    """Clears the cached lookups of the model in every process.
+
+    Called by the db api after each write to rows of the model.
+    """
+    if not getattr(model, '_cacheable', False):
+        return
+    name = model.__name__
+    cache = _CACHES.get(name)
+    if cache is not None:
+        cache.clear()
+    # Bumped even with the cache disabled here, for the processes using it.
+    get_db_api().bump_generation(name)
+
+
+def stats():
+    return [_CACHES[name].data() for name in sorted(_CACHES)]
+
+
+def reset():
+    """Drops every cache, for the tests."""
+    global _SYNCED_AT
+    _CACHES.clear()
+    _SYNCED_AT = None
@@ -0,0 +1,359 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A db api keeping the rows in the memory of the process.
+
+Set db_api_implementation to trove.db.memory.api to run the API or the
+taskmanager without a database server, such as for load tests measuring
+the overhead of the services alone. The rows are lost when the process
+exits and aren't shared with other processes.
+"""
+
+import contextlib
+
+from trove.backup.models import BackupState
+from trove.common import exception
+from trove.common import utils
+from trove.db import cache
+from trove.db.memory import store
+from trove.db.sqlalchemy import archive
+from trove.db.sqlalchemy import mappers
+from trove.db.sqlalchemy import quotas
+from trove.db.sqlalchemy import tables
+from trove.instance.tasks import InstanceTasks
+
+_GENERATIONS = {}
+
+
+def list(query_func, *args, **kwargs):
+    return query_func(*args, **kwargs).all()
+
+
+def count(query, *args, **kwargs):
+    return query(*args, **kwargs).count()
+
+
+def find_all(model, **conditions):
+    return store.Query(model).filter_by(**conditions)
+
+
+def find_all_by_limit(query_func, model, conditions, limit, marker=None,
+                      marker_column=None, sort_keys=None, sort_dir='asc',
+                      ranges=None):
+    query = query_func(model, **conditions)
+    for name, (low, high) in (ranges or {}).iteritems():
+        column = getattr(model, name)
+        if low is not None:
+            query = query.filter(column >= low)
+        if high is not None:
+            query = query.filter(column < high)
+    if sort_keys:
+        keys = [key for key in sort_keys]
+        if 'id' not in keys:
+            keys.append('id')
+    else:
+        keys = [store.column_name(marker_column or model.id)]
+    descending = bool(sort_keys) and sort_dir == 'desc'
+
+    def sort_key(row):
+        return [store.sort_key(getattr(row, key)) for key in keys]
+
+    rows = sorted(query.all(), key=sort_key, reverse=descending)
+    if marker and sort_keys:
+        marker_row = find_by(model, id=marker)
+        if marker_row is None:
+            raise exception.MarkerNotFound(marker=marker)
+        after = sort_key(marker_row)
+        rows = [row for row in rows if (sort_key(row) < after if descending
+                                        else sort_key(row) > after)]
+    elif marker:
+        rows = [row for row in rows
+                if getattr(row, keys[0]) is not None and
+                getattr(row, keys[0]) > marker]
+    if limit is not None:
+        rows = rows[:limit]
+    return rows
+
+
+def find_by(model, **kwargs):
+    return find_all(model, **kwargs).first()
+
+
+def save(model):
+    with store.LOCK:
+        table = store.table_of(model.__class__)
+        table.put(mappers.values_of(model.__class__, model))
+    cache.invalidate(model.__class__)
+    return model
+
+
+def compare_and_set(model, conditions, values):
+    """Updates the row matching all the conditions.
+
+    Returns whether a row matched.
+    """
+    matched = find_all(model, **conditions).update(values) > 0
+    if matched:
+        cache.invalidate(model)
+    return matched
+
+
+def values_of(model, instance):
+    return mappers.values_of(model, instance)
+
+
+def load(model, values):
+    return mappers.load(model, values)
+
+
+def delete(model):
+    with store.LOCK:
+        table = store.table_of(model.__class__)
+        table.remove(table.key(mappers.values_of(model.__class__, model)))
+    cache.invalidate(model.__class__)
+
+
+def delete_all(query_func, model, **conditions):
+    query_func(model, **conditions).delete()
+    cache.invalidate(model)
+
+
+def update(model, **values):
+    for k, v in values.iteritems():
+        model[k] = v
+
+
+def update_all(query_func, model, conditions, values):
+    query_func(model, **conditions).update(values)
+    cache.invalidate(model)
+
+
+def configure_db(options, *plugins):
+    mappers.map(None, mappers.persisted_models())
+    configure_db_for_plugins(options, *plugins)
+
+
+def configure_db_for_plugins(options, *plugins):
+    for plugin in plugins:
+        plugin.mapper.map(None)
+
+
+def drop_db(options):
+    clean_db()
+
+
+def clean_db():
+    store.clear()
+    _GENERATIONS.clear()
+
+
+def db_sync(options, version=None, repo_path=None):
+    pass
+
+
+def db_upgrade(options, version=None, repo_path=None):
+    pass
+
+
+def db_downgrade(options, version, repo_path=None):
+    pass
+
+
+def db_reset(options, *plugins):
+    drop_db(options)
+    configure_db(options, *plugins)
+
+
+def pool_metrics():
+    return []
+
+
+def archive_deleted_rows(deleted_before, batch_size, max_rows=None):
+    """Moves the rows deleted before deleted_before to the shadow tables.
+
+    The rows are moved all at once, as no other process waits on them.
+    """
+    archived = {}
+    remaining = max_rows
+    with store.LOCK:
+        for table, dependents in archive.ARCHIVED:
+            rows = [row for row in store.get_table(table).rows.values()
+                    if row['deleted'] and row['deleted_at'] is not None
+                    and row['deleted_at'] < deleted_before]
+            rows.sort(key=lambda row: row['deleted_at'])
+            if remaining is not None:
+                rows = rows[:remaining]
+                remaining -= len(rows)
+            for dependent, column, parent_column in dependents:
+                values = set(row[parent_column] for row in rows
+                             if row[parent_column] is not None)
+                candidates = store.get_table(dependent).rows.values()
+                moved = [row for row in candidates if row[column] in values]
+                archived[dependent.name] = (archived.get(dependent.name, 0) +
+                                            _move(dependent, moved))
+            archived[table.name] = (archived.get(table.name, 0) +
+                                    _move(table, rows))
+    return archived
+
+
+def _move(table, rows):
+    source = store.get_table(table)
+    shadow = store.get_table(tables.meta.tables['shadow_' + table.name])
+    for row in rows:
+        shadow.put(source.remove(source.key(row)))
+    return len(rows)
+
+
+def quota_reserve(tenant_id, deltas, default_limits):
+    usages = store.get_table(tables.quota_usages)
+    with store.LOCK:
+        now = utils.utcnow()
+        locked = {}
+        for resource in sorted(deltas):
+            found = usages.candidates({'tenant_id': tenant_id,
+                                       'resource': resource})
+            found = [row for row in found if row['tenant_id'] == tenant_id
+                     and row['resource'] == resource]
+            locked[resource] = found[0] if found else usages.put(
+                {'id': utils.generate_uuid(), 'tenant_id': tenant_id,
+                 'resource': resource, 'in_use': 0, 'reserved': 0,
+                 'created': now, 'updated': now})
+        limits = dict(default_limits)
+        for row in store.get_table(tables.quotas).rows.values():
+            if row['tenant_id'] == tenant_id and row['resource'] in deltas:
+                limits[row['resource']] = row['hard_limit']
+        overs = [resource for resource in sorted(deltas)
+                 if deltas[resource] > 0 and
+                 (locked[resource]['in_use'] + locked[resource]['reserved'] +
+                  deltas[resource]) > limits[resource]]
+        if overs:
+            raise exception.QuotaExceeded(overs=overs)
+        reservations = []
+        for resource in sorted(deltas):
+            usage = usages.update(locked[resource], {
+                'reserved': locked[resource]['reserved'] + deltas[resource],
+                'updated': now})
+            reservations.append(store.get_table(tables.reservations).put(
+                {'id': utils.generate_uuid(), 'usage_id': usage['id'],
+                 'delta': deltas[resource], 'status': quotas.RESERVED,
+                 'created': now, 'updated': now}))
+        return reservations
+
+
+def _settle(reservation_ids, status, in_use_sign):
+    usages = store.get_table(tables.quota_usages)
+    table = store.get_table(tables.reservations)
+    settled = []
+    with store.LOCK:
+        now = utils.utcnow()
+        for reservation_id in reservation_ids:
+            row = table.rows.get((reservation_id,))
+            if row is None or row['status'] != quotas.RESERVED:
+                continue
+            usage = usages.rows[(row['usage_id'],)]
+            usages.update(usage, {
+                'in_use': usage['in_use'] + in_use_sign * row['delta'],
+                'reserved': usage['reserved'] - row['delta'],
+                'updated': now})
+            table.update(row, {'status': status, 'updated': now})
+            settled.append(reservation_id)
+    return settled
+
+
+def reservation_commit(reservation_ids):
+    return _settle(reservation_ids, quotas.COMMITTED, 1)
+
+
+def reservation_rollback(reservation_ids):
+    return _settle(reservation_ids, quotas.ROLLED_BACK, 0)
+
+
+def quota_usage_resync(resources, reserved_before, batch_size):
+    """Sets the usages to the counts of the rows they track.
+
+    Everything is done at once, as no other process waits on the rows.
+    """
+    usages = store.get_table(tables.quota_usages)
+    reservations = store.get_table(tables.reservations)
+    with store.LOCK:
+        expired = reservation_rollback(
+            [row['id'] for row in reservations.rows.values()
+             if row['status'] == quotas.RESERVED
+             and row['created'] < reserved_before])
+        in_use = {}
+        for row in store.get_table(tables.instances).rows.values():
+            if (not row['deleted'] and
+                    row['task_id'] != InstanceTasks.DELETING.code):
+                for resource, used in (('instances', 1),
+                                       ('volumes', row['volume_size'] or 0)):
+                    key = (row['tenant_id'], resource)
+                    in_use[key] = in_use.get(key, 0) + used
+        for row in store.get_table(tables.backups).rows.values():
+            if (not row['deleted'] and
+                    row['state'] != BackupState.DELETE_FAILED):
+                key = (row['tenant_id'], 'backups')
+                in_use[key] = in_use.get(key, 0) + 1
+        pending = set(row['usage_id'] for row in reservations.rows.values()
+                      if row['status'] == quotas.RESERVED)
+        now = utils.utcnow()
+        corrected = 0
+        for row in usages.rows.values():
+            if row['resource'] not in resources:
+                continue
+            count = in_use.pop((row['tenant_id'], row['resource']), 0)
+            if (row['id'] not in pending and
+                    (row['in_use'], row['reserved']) != (count, 0)):
+                usages.update(row, {'in_use': count, 'reserved': 0,
+                                    'updated': now})
+                corrected += 1
+        added = 0
+        for (tenant_id, resource), count in sorted(in_use.items()):
+            if resource in resources and count:
+                usages.put({'id': utils.generate_uuid(),
+                            'tenant_id': tenant_id, 'resource': resource,
+                            'in_use': count, 'reserved': 0, 'created': now,
+                            'updated': now})
+                added += 1
+    return {'expired': len(expired), 'corrected': corrected, 'added': added}
+
+
+def get_generations():
+    with store.LOCK:
+        return dict(_GENERATIONS)
+
+
+def bump_generation(name):
+    with store.LOCK:
+        _GENERATIONS[name] = _GENERATIONS.get(name, 0) + 1
+
+
+@contextlib.contextmanager
+def session_scope(replica_reads=False):
+    yield
+
+
+@contextlib.contextmanager
+def unscoped():
+    yield
+
+
+def _base_query(cls):
+    return store.Query(cls)
+
+
+def _read_query(cls):
+    return store.Query(cls)
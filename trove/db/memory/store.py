@@ -0,0 +1,330 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The rows of the in-memory db api and the queries over them.
+
+The models stay mapped against the static tables, so the criteria they
+build from their columns are evaluated here against the rows, which are
+kept as dicts of column values keyed by primary key. The columns the
+tables index are indexed here too, by value. Every read and write holds
+LOCK, and reads return new model objects, so callers never share rows.
+"""
+
+import collections
+import threading
+
+from sqlalchemy import orm
+from sqlalchemy.sql import operators
+
+from trove.common import exception
+from trove.db.sqlalchemy import mappers
+
+# Guards every table. The threading module is green when eventlet patched
+# it, and nothing yields while the lock is held anyway.
+LOCK = threading.RLock()
+
+_TABLES = {}
+
+
+class Table(object):
+    """The rows of a table, indexed by primary key and indexed columns."""
+
+    def __init__(self, table):
+        self.name = table.name
+        self.primary_key = [column.name for column in table.primary_key]
+        self.unique = [[column.name for column in constraint.columns]
+                       for constraint in table.constraints
+                       if getattr(constraint, '__visit_name__', None)
+                       == 'unique_constraint']
+        indexed = set(list(index.columns)[0].name for index in table.indexes)
+        indexed.update(columns[0] for columns in self.unique)
+        self.columns = [column.name for column in table.columns]
+        self.rows = {}
+        self.indexes = dict((name, collections.defaultdict(set))
+                            for name in indexed)
+
+    def key(self, row):
+        return tuple(row.get(name) for name in self.primary_key)
+
+    def candidates(self, conditions):
+        """Returns the rows which may match the equality conditions."""
+        if all(name in conditions for name in self.primary_key):
+            key = tuple(conditions[name] for name in self.primary_key)
+            row = self.rows.get(key)
+            return [row] if row is not None else []
+        for name, value in conditions.iteritems():
+            if name in self.indexes:
+                return [self.rows[key]
+                        for key in self.indexes[name].get(value, ())]
+        return self.rows.values()
+
+    def put(self, values):
+        """Inserts the row of values or replaces the row with its key."""
+        row = dict((name, values.get(name)) for name in self.columns)
+        key = self.key(row)
+        for columns in self.unique:
+            conditions = dict((name, row[name]) for name in columns)
+            if None in conditions.values():
+                # Unique constraints don't apply to NULLs.
+                continue
+            for other in self.candidates(conditions):
+                if (self.key(other) != key and
+                        all(other[name] == row[name] for name in columns)):
+                    raise exception.DBConstraintError(
+                        model_name=self.name,
+                        error="Duplicate entry for %s" % ", ".join(columns))
+        self.remove(key)
+        self.rows[key] = row
+        for name, index in self.indexes.iteritems():
+            index[row[name]].add(key)
+        return row
+
+    def update(self, row, values):
+        changed = dict(row)
+        changed.update(values)
+        return self.put(changed)
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is not None:
+            for name, index in self.indexes.iteritems():
+                index[row[name]].discard(key)
+                if not index[row[name]]:
+                    del index[row[name]]
+        return row
+
+    def clear(self):
+        self.rows.clear()
+        for index in self.indexes.values():
+            index.clear()
+
+
+def get_table(table):
+    with LOCK:
+        if table.name not in _TABLES:
+            _TABLES[table.name] = Table(table)
+        return _TABLES[table.name]
+
+
+def table_of(model):
+    return get_table(orm.class_mapper(model).mapped_table)
+
+
+def clear():
+    with LOCK:
+        for table in _TABLES.values():
+            table.clear()
+
+
+def _clause(clause):
+    if hasattr(clause, '__clause_element__'):
+        return clause.__clause_element__()
+    return clause
+
+
+def column_name(column):
+    if isinstance(column, basestring):
+        return column
+    return _clause(column).name
+
+
+def _compare(operator, left, right):
+    # SQL comparisons with NULL are never true.
+    if left is None or right is None:
+        return False
+    return operator(left, right)
+
+
+_COMPARISONS = {
+    operators.eq: lambda left, right: _compare(operators.eq, left, right),
+    operators.ne: lambda left, right: _compare(operators.ne, left, right),
+    operators.lt: lambda left, right: _compare(operators.lt, left, right),
+    operators.le: lambda left, right: _compare(operators.le, left, right),
+    operators.gt: lambda left, right: _compare(operators.gt, left, right),
+    operators.ge: lambda left, right: _compare(operators.ge, left, right),
+    operators.is_: lambda left, right: left == right,
+    operators.isnot: lambda left, right: left != right,
+    operators.in_op: lambda left, right: left is not None and left in right,
+    operators.notin_op: lambda left, right: (left is not None and
+                                             left not in right),
+}
+
+
+def evaluate(clause, row):
+    """Evaluates the SQL expression clause against the row."""
+    clause = _clause(clause)
+    kind = clause.__visit_name__
+    if kind == 'column':
+        return row[clause.name]
+    if kind == 'bindparam':
+        return clause.value
+    if kind == 'null':
+        return None
+    if kind == 'true':
+        return True
+    if kind == 'false':
+        return False
+    if kind == 'grouping':
+        return evaluate(clause.element, row)
+    if kind == 'clauselist':
+        values = [evaluate(element, row) for element in clause.clauses]
+        if clause.operator is operators.and_:
+            return all(values)
+        if clause.operator is operators.or_:
+            return any(values)
+        return values
+    if kind == 'unary' and clause.operator is operators.inv:
+        return not evaluate(clause.element, row)
+    if kind == 'binary' and clause.operator in _COMPARISONS:
+        return _COMPARISONS[clause.operator](evaluate(clause.left, row),
+                                             evaluate(clause.right, row))
+    raise NotImplementedError("The in-memory db api can't evaluate %s."
+                              % clause)
+
+
+def sort_key(value):
+    # NULLs sort first, as MySQL sorts them.
+    return (value is not None, value)
+
+
+class Query(object):
+    """The part of the SQLAlchemy query interface the models use."""
+
+    def __init__(self, model, conditions=None, criteria=None, order=None,
+                 limit=None, entities=None, distinct=False):
+        self.model = model
+        self.table = table_of(model)
+        self._conditions = conditions or {}
+        self._criteria = criteria or []
+        self._order = order or []
+        self._limit = limit
+        self._entities = entities
+        self._distinct = distinct
+
+    def _copy(self, **changes):
+        args = {'conditions': self._conditions, 'criteria': self._criteria,
+                'order': self._order, 'limit': self._limit,
+                'entities': self._entities, 'distinct': self._distinct}
+        args.update(changes)
+        return Query(self.model, **args)
+
+    def filter_by(self, **conditions):
+        merged = dict(self._conditions)
+        merged.update(conditions)
+        return self._copy(conditions=merged)
+
+    def filter(self, *criteria):
+        return self._copy(criteria=self._criteria + list(criteria))
+
+    def order_by(self, *columns):
+        return self._copy(order=self._order + list(columns))
+
+    def limit(self, limit):
+        return self._copy(limit=limit)
+
+    def with_entities(self, *entities):
+        return self._copy(entities=list(entities))
+
+    def distinct(self):
+        return self._copy(distinct=True)
+
+    def populate_existing(self):
+        return self
+
+    def _matches(self, row):
+        return (all(row[name] == value
+                    for name, value in self._conditions.iteritems()) and
+                all(evaluate(criterion, row) for criterion in self._criteria))
+
+    def _rows(self):
+        rows = [row for row in self.table.candidates(self._conditions)
+                if self._matches(row)]
+        for column in reversed(self._order):
+            column = _clause(column)
+            descending = False
+            if getattr(column, 'modifier', None) is operators.desc_op:
+                descending = True
+            if getattr(column, 'modifier', None) in (operators.desc_op,
+                                                     operators.asc_op):
+                column = column.element
+            name = column_name(column)
+            rows.sort(key=lambda row: sort_key(row[name]),
+                      reverse=descending)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def _entity_rows(self, rows):
+        entities = [_clause(entity) for entity in self._entities]
+        aggregates = {'max': max, 'min': min, 'count': len}
+        if any(entity.__visit_name__ == 'function' for entity in entities):
+            values = []
+            for entity in entities:
+                function = aggregates[entity.name]
+                argument = list(entity.clauses)[0]
+                column = [evaluate(argument, row) for row in rows]
+                column = [value for value in column if value is not None]
+                values.append(function(column) if column or
+                              function is len else None)
+            return [tuple(values)]
+        Row = collections.namedtuple('Row', [entity.name
+                                             for entity in entities])
+        result = [Row(*[row[entity.name] for entity in entities])
+                  for row in rows]
+        if self._distinct:
+            seen = set()
+            result = [row for row in result
+                      if not (row in seen or seen.add(row))]
+        return result
+
+    def all(self):
+        with LOCK:
+            rows = self._rows()
+            if self._entities:
+                return self._entity_rows(rows)
+            return [mappers.load(self.model, row) for row in rows]
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def first(self):
+        found = self.limit(1).all() if not self._entities else self.all()
+        return found[0] if found else None
+
+    def scalar(self):
+        found = self.first()
+        return found[0] if found is not None else None
+
+    def count(self):
+        with LOCK:
+            return len(self._rows())
+
+    def update(self, values, synchronize_session=None):
+        values = dict((column_name(name), value)
+                      for name, value in values.iteritems())
+        with LOCK:
+            rows = self._rows()
+            for row in rows:
+                self.table.update(row, values)
+            return len(rows)
+
+    def delete(self, synchronize_session=None):
+        with LOCK:
+            rows = self._rows()
+            for row in rows:
+                self.table.remove(self.table.key(row))
+            return len(rows)
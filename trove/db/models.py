@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from trove.db import cache
 from trove.db import get_db_api
 from trove.db import db_query
 from trove.common import exception
@@ -26,6 +27,9 @@ LOG = logging.getLogger(__name__)
 
 class DatabaseModelBase(models.ModelBase):
     _auto_generated_attrs = ['id']
+    # Whether find_by and get_by may be served by the model cache, for
+    # models whose rows rarely change.
+    _cacheable = False
 
     @classmethod
     def create(cls, **values):
@@ -49,6 +53,11 @@ class DatabaseModelBase(models.ModelBase):
 
     @classmethod
     def query(cls):
+        return get_db_api()._read_query(cls)
+
+    @classmethod
+    def write_query(cls):
+        """Returns a query on the primary, for bulk updates and deletes."""
         return get_db_api()._base_query(cls)
 
     def save(self):
@@ -107,7 +116,10 @@ class DatabaseModelBase(models.ModelBase):
 
     @classmethod
     def get_by(cls, **kwargs):
-        return get_db_api().find_by(cls, **cls._process_conditions(kwargs))
+        conditions = cls._process_conditions(kwargs)
+        return cache.find_by(
+            cls, lambda: get_db_api().find_by(cls, **conditions),
+            **conditions)
 
     @classmethod
     def find_all(cls, **kwargs):
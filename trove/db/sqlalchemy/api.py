@@ -22,9 +22,13 @@ from sqlalchemy.orm import aliased
 
 from trove.common import exception
 from trove.common import utils
+from trove.db import cache
+from trove.db.sqlalchemy import archive
 from trove.db.sqlalchemy import migration
 from trove.db.sqlalchemy import mappers
+from trove.db.sqlalchemy import quotas
 from trove.db.sqlalchemy import session
+from trove.db.sqlalchemy import tables
 
 
 def list(query_func, *args, **kwargs):
@@ -40,9 +44,10 @@ def find_all(model, **conditions):
 
 
 def find_all_by_limit(query_func, model, conditions, limit, marker=None,
-                      marker_column=None):
+                      marker_column=None, sort_keys=None, sort_dir='asc',
+                      ranges=None):
     return _limits(query_func, model, conditions, limit, marker,
-                   marker_column).all()
+                   marker_column, sort_keys, sort_dir, ranges).all()
 
 
 def find_by(model, **kwargs):
@@ -53,22 +58,49 @@ def save(model):
     try:
         db_session = session.get_session()
         model = db_session.merge(model)
-        db_session.flush()
-        return model
+        # Only the model saved is written, not the other models of a shared
+        # session changed meanwhile.
+        db_session.flush([model])
     except sqlalchemy.exc.IntegrityError as error:
         raise exception.DBConstraintError(model_name=model.__class__.__name__,
                                           error=str(error.orig))
+    cache.invalidate(model.__class__)
+    return model
+
+
+def compare_and_set(model, conditions, values):
+    """Updates the row matching all the conditions in a single statement.
+
+    Returns whether a row matched, which tells callers conditioning on the
+    values they last read whether someone changed the row since.
+    """
+    query = _base_query(model).filter_by(**conditions)
+    matched = query.update(values, synchronize_session=False) > 0
+    if matched:
+        cache.invalidate(model)
+    return matched
+
+
+def values_of(model, instance):
+    return mappers.values_of(model, instance)
+
+
+def load(model, values):
+    return mappers.load(model, values)
 
 
 def delete(model):
     db_session = session.get_session()
     model = db_session.merge(model)
     db_session.delete(model)
-    db_session.flush()
+    db_session.flush([model])
+    cache.invalidate(model.__class__)
 
 
 def delete_all(query_func, model, **conditions):
+    session.use_primary()
     query_func(model, **conditions).delete()
+    cache.invalidate(model)
 
 
 def update(model, **values):
@@ -77,7 +109,9 @@ def update(model, **values):
 
 
 def update_all(query_func, model, conditions, values):
+    session.use_primary()
     query_func(model, **conditions).update(values)
+    cache.invalidate(model)
 
 
 def configure_db(options, *plugins):
@@ -116,20 +150,135 @@ def db_reset(options, *plugins):
     configure_db(options)
 
 
+def pool_metrics():
+    return session.pool_metrics()
+
+
+def archive_deleted_rows(deleted_before, batch_size, max_rows=None):
+    return archive.archive_deleted_rows(deleted_before, batch_size, max_rows)
+
+
+def quota_reserve(tenant_id, deltas, default_limits):
+    return quotas.reserve(tenant_id, deltas, default_limits)
+
+
+def reservation_commit(reservation_ids):
+    return quotas.commit(reservation_ids)
+
+
+def reservation_rollback(reservation_ids):
+    return quotas.rollback(reservation_ids)
+
+
+def quota_usage_resync(resources, reserved_before, batch_size):
+    return quotas.resync_usages(resources, reserved_before, batch_size)
+
+
+def get_generations():
+    """Returns the cache generation of each model written to so far."""
+    table = tables.cache_generations
+    rows = session.get_read_session().execute(table.select())
+    return dict((row.name, row.generation) for row in rows)
+
+
+def bump_generation(name):
+    table = tables.cache_generations
+    db_session = session.get_session()
+    bump = (table.update().where(table.c.name == name)
+            .values(generation=table.c.generation + 1))
+    if db_session.execute(bump).rowcount:
+        return
+    try:
+        db_session.execute(table.insert().values(name=name, generation=1))
+    except sqlalchemy.exc.IntegrityError:
+        # Another process inserted the row first.
+        db_session.execute(bump)
+
+
+def session_scope(replica_reads=False):
+    return session.session_scope(replica_reads)
+
+
+def unscoped():
+    return session.unscoped()
+
+
 def _base_query(cls):
-    return session.get_session().query(cls)
+    return _scoped_query(session.get_session(), cls)
+
+
+def _read_query(cls):
+    return _scoped_query(session.get_read_session(), cls)
+
+
+def _scoped_query(db_session, cls):
+    query = db_session.query(cls)
+    if session.in_scope():
+        # Objects the scope already holds are refreshed from the rows read,
+        # as a fresh session would have returned them.
+        query = query.populate_existing()
+    return query
 
 
 def _query_by(cls, **conditions):
-    query = _base_query(cls)
+    query = _read_query(cls)
     if conditions:
         query = query.filter_by(**conditions)
     return query
 
 
-def _limits(query_func, model, conditions, limit, marker, marker_column=None):
+def _limits(query_func, model, conditions, limit, marker, marker_column=None,
+            sort_keys=None, sort_dir='asc', ranges=None):
     query = query_func(model, **conditions)
-    marker_column = marker_column or model.id
+    for name, (low, high) in (ranges or {}).iteritems():
+        column = getattr(model, name)
+        if low is not None:
+            query = query.filter(column >= low)
+        if high is not None:
+            query = query.filter(column < high)
+    if sort_keys:
+        query = _seek(query, model, sort_keys, sort_dir, marker)
+    else:
+        marker_column = marker_column or model.id
+        if marker:
+            query = query.filter(marker_column > marker)
+        query = query.order_by(marker_column)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _seek(query, model, sort_keys, sort_dir, marker):
+    """Orders the query by sort_keys and id and seeks past the marker row.
+
+    The rows following the marker are those whose sort key values come
+    after the marker's, which lets the database walk an index from the
+    marker instead of counting past the rows of the previous pages.
+    """
+    columns = [getattr(model, key) for key in sort_keys]
+    if 'id' not in sort_keys:
+        columns.append(model.id)
+    descending = sort_dir == 'desc'
     if marker:
-        query = query.filter(marker_column > marker)
-    return query.order_by(marker_column).limit(limit)
+        marker_row = _read_query(model).filter(model.id == marker).first()
+        if marker_row is None:
+            raise exception.MarkerNotFound(marker=marker)
+        values = [getattr(marker_row, column.key) for column in columns]
+        criteria = []
+        for index, column in enumerate(columns):
+            criterion = [columns[i] == values[i] for i in range(index)]
+            if descending:
+                criterion.append(column < values[index])
+            else:
+                criterion.append(column > values[index])
+            criteria.append(and_(*criterion))
+        # The redundant bound on the first key lets the database start its
+        # index range scan at the marker rather than filter from the start.
+        if descending:
+            query = query.filter(columns[0] <= values[0])
+        else:
+            query = query.filter(columns[0] >= values[0])
+        query = query.filter(or_(*criteria))
+    for column in columns:
+        query = query.order_by(column.desc() if descending else column.asc())
+    return query
@@ -0,0 +1,121 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Moves the rows soft deleted long ago to their shadow tables.
+
+The rows are moved in batches, each in a transaction of its own, so a batch
+holds its locks only while it moves at most batch_size soft deleted rows and
+the rows depending on them.
+"""
+
+import sqlalchemy
+
+from trove.db.sqlalchemy import session
+from trove.db.sqlalchemy import tables
+from trove.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# The soft deleted tables, in the order they are archived, each with the
+# rows archived along with its rows, as (table, column, column of the soft
+# deleted row the column matches). The rows referencing a table by a foreign
+# key are archived before it.
+ARCHIVED = [
+    (tables.instances, [
+        (tables.service_statuses, 'instance_id', 'id'),
+        (tables.agent_heartbeats, 'instance_id', 'id'),
+        (tables.dns_records, 'name', 'hostname'),
+        (tables.security_group_instance_associations, 'instance_id', 'id'),
+    ]),
+    (tables.security_groups, [
+        (tables.security_group_instance_associations, 'security_group_id',
+         'id'),
+        (tables.security_group_rules, 'parent_group_id', 'id'),
+    ]),
+    (tables.security_group_instance_associations, []),
+    (tables.security_group_rules, []),
+    (tables.backups, []),
+]
+
+
+def _move(db_session, table, where, rows=None):
+    """Copies the rows of table matching where to its shadow table, then
+    deletes them. Returns the number of rows moved.
+    """
+    if rows is None:
+        rows = db_session.execute(table.select().where(where)).fetchall()
+    if rows:
+        shadow = tables.meta.tables['shadow_' + table.name]
+        db_session.execute(shadow.insert(),
+                           [dict(row.items()) for row in rows])
+        db_session.execute(table.delete().where(where))
+    return len(rows)
+
+
+def _archive_batch(table, dependents, deleted_before, limit, archived):
+    """Moves up to limit rows of table deleted before deleted_before, and
+    their dependents. Returns the number of rows of table moved.
+    """
+    db_session = session.get_session()
+    with db_session.begin():
+        query = (table.select()
+                 .where(sqlalchemy.and_(table.c.deleted,
+                                        table.c.deleted_at < deleted_before))
+                 .order_by(table.c.deleted_at)
+                 .limit(limit))
+        rows = db_session.execute(query).fetchall()
+        if not rows:
+            return 0
+        for dependent, column, parent_column in dependents:
+            values = [row[parent_column] for row in rows
+                      if row[parent_column] is not None]
+            if values:
+                archived[dependent.name] += _move(
+                    db_session, dependent, dependent.c[column].in_(values))
+        moved = _move(db_session, table,
+                      table.c.id.in_([row['id'] for row in rows]), rows)
+        archived[table.name] += moved
+        return moved
+
+
+def archive_deleted_rows(deleted_before, batch_size, max_rows=None):
+    """Moves the rows soft deleted before deleted_before to shadow tables.
+
+    Stops once max_rows soft deleted rows were moved, if given, not counting
+    the rows depending on them. Returns the number of rows moved from each
+    table.
+    """
+    archived = {}
+    for table, dependents in ARCHIVED:
+        archived[table.name] = 0
+        for dependent in dependents:
+            archived[dependent[0].name] = 0
+    remaining = max_rows
+    for table, dependents in ARCHIVED:
+        while remaining is None or remaining > 0:
+            limit = batch_size
+            if remaining is not None:
+                limit = min(limit, remaining)
+            moved = _archive_batch(table, dependents, deleted_before, limit,
+                                   archived)
+            if remaining is not None:
+                remaining -= moved
+            if moved < limit:
+                break
+    LOG.info("Archived the rows deleted before %s: %s"
+             % (deleted_before, archived))
+    return archived
@@ -15,44 +15,74 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from sqlalchemy import MetaData
-from sqlalchemy import Table
 from sqlalchemy import orm
+from sqlalchemy.orm import attributes
 from sqlalchemy.orm import exc as orm_exc
 
+from trove.db.sqlalchemy import tables
+
 
 def map(engine, models):
-    meta = MetaData()
-    meta.bind = engine
     if mapping_exists(models['instance']):
         return
 
-    orm.mapper(models['instance'], Table('instances', meta, autoload=True))
-    orm.mapper(models['root_enabled_history'],
-               Table('root_enabled_history', meta, autoload=True))
-    orm.mapper(models['service_image'],
-               Table('service_images', meta, autoload=True))
-    orm.mapper(models['service_statuses'],
-               Table('service_statuses', meta, autoload=True))
-    orm.mapper(models['dns_records'],
-               Table('dns_records', meta, autoload=True))
-    orm.mapper(models['agent_heartbeats'],
-               Table('agent_heartbeats', meta, autoload=True))
-    orm.mapper(models['quotas'],
-               Table('quotas', meta, autoload=True))
-    orm.mapper(models['quota_usages'],
-               Table('quota_usages', meta, autoload=True))
-    orm.mapper(models['reservations'],
-               Table('reservations', meta, autoload=True))
-    orm.mapper(models['backups'],
-               Table('backups', meta, autoload=True))
-    orm.mapper(models['security_group'],
-               Table('security_groups', meta, autoload=True))
-    orm.mapper(models['security_group_rule'],
-               Table('security_group_rules', meta, autoload=True))
+    orm.mapper(models['instance'], tables.instances)
+    orm.mapper(models['root_enabled_history'], tables.root_enabled_history)
+    orm.mapper(models['service_image'], tables.service_images)
+    orm.mapper(models['service_statuses'], tables.service_statuses)
+    orm.mapper(models['dns_records'], tables.dns_records)
+    orm.mapper(models['agent_heartbeats'], tables.agent_heartbeats)
+    orm.mapper(models['quotas'], tables.quotas)
+    orm.mapper(models['quota_usages'], tables.quota_usages)
+    orm.mapper(models['reservations'], tables.reservations)
+    orm.mapper(models['backups'], tables.backups)
+    orm.mapper(models['security_group'], tables.security_groups)
+    orm.mapper(models['security_group_rule'], tables.security_group_rules)
     orm.mapper(models['security_group_instance_association'],
-               Table('security_group_instance_associations', meta,
-                     autoload=True))
+               tables.security_group_instance_associations)
+
+
+def values_of(model, instance):
+    """Returns the column values of the object of the mapped model."""
+    table = orm.class_mapper(model).mapped_table
+    return dict((name, getattr(instance, name, None))
+                for name in table.columns.keys())
+
+
+def load(model, values):
+    """Returns a new object of the mapped model holding the values as loaded
+    from the database, so only the changes made to it afterwards are saved.
+    """
+    instance = attributes.manager_of_class(model).new_instance()
+    for name, value in values.iteritems():
+        attributes.set_committed_value(instance, name, value)
+    return instance
+
+
+def persisted_models():
+    """Returns the models of every module, by the names map expects."""
+    from trove.instance import models as base_models
+    from trove.dns import models as dns_models
+    from trove.extensions.mysql import models as mysql_models
+    from trove.guestagent import models as agent_models
+    from trove.quota import models as quota_models
+    from trove.backup import models as backup_models
+    from trove.extensions.security_group import models as secgrp_models
+
+    model_modules = [
+        base_models,
+        dns_models,
+        mysql_models,
+        agent_models,
+        quota_models,
+        backup_models,
+        secgrp_models,
+    ]
+
+    models = {}
+    for module in model_modules:
+        models.update(module.persisted_models())
+    return models
 
 
 def mapping_exists(model):
@@ -0,0 +1,153 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Connection pool metrics of the SQLAlchemy engines."""
+
+import bisect
+import time
+
+from sqlalchemy import event
+from sqlalchemy import exc
+from sqlalchemy import pool
+
+from trove.openstack.common import log as logging
+from trove.openstack.common.gettextutils import _
+
+LOG = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the buckets of the checkout time histogram.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+
+class PoolMetrics(object):
+    """Counts what happens to the connections of an engine's pool."""
+
+    def __init__(self, name):
+        self.name = name
+        self.pool = None
+        self.checked_out = 0
+        self.checkouts = 0
+        self.connections = 0
+        self.connection_errors = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record_wait(self, seconds):
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def listen(self, engine):
+        self.pool = engine.pool
+        event.listen(engine, 'connect', self._connected)
+        event.listen(engine, 'checkout', self._checked_out)
+        event.listen(engine, 'checkin', self._checked_in)
+
+    def _connected(self, dbapi_con, con_record):
+        self.connections += 1
+
+    def _checked_out(self, dbapi_con, con_record, con_proxy):
+        self.checkouts += 1
+        self.checked_out += 1
+
+    def _checked_in(self, dbapi_con, con_record):
+        self.checked_out -= 1
+
+    def data(self):
+        buckets = [{'le': str(bound), 'count': count} for bound, count
+                   in zip(WAIT_BUCKETS + ('inf',), self.wait_buckets)]
+        data = {'name': self.name,
+                'checked_out': self.checked_out,
+                'checkouts': self.checkouts,
+                'connections': self.connections,
+                'connection_errors': self.connection_errors,
+                'timeouts': self.timeouts,
+                'wait': {'count': self.wait_count,
+                         'total': self.wait_total,
+                         'max': self.wait_max,
+                         'buckets': buckets}}
+        if isinstance(self.pool, pool.QueuePool):
+            data['size'] = self.pool.size()
+            data['overflow'] = self.pool.overflow()
+        return data
+
+
+class InstrumentedQueuePool(pool.QueuePool):
+    """A QueuePool timing its checkouts and counting connection errors.
+
+    The time of a checkout covers waiting for a free connection, opening
+    a new one and pinging it, so it is the latency the pool adds to a query.
+    """
+
+    metrics = None
+
+    def connect(self):
+        return self._timed(super(InstrumentedQueuePool, self).connect)
+
+    def unique_connection(self):
+        return self._timed(
+            super(InstrumentedQueuePool, self).unique_connection)
+
+    def _timed(self, checkout):
+        started = time.time()
+        try:
+            return checkout()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.time() - started)
+
+    def _create_connection(self):
+        try:
+            return super(InstrumentedQueuePool, self)._create_connection()
+        except Exception:
+            self.metrics.connection_errors += 1
+            raise
+
+
+def instrumented_pool_class(metrics):
+    """Returns a QueuePool class recording into metrics.
+
+    The class carries the metrics since the pool recreates itself from its
+    class when its connections are invalidated.
+    """
+    return type('InstrumentedQueuePool', (InstrumentedQueuePool,),
+                {'metrics': metrics})
+
+
+def ping_on_checkout(engine, metrics):
+    """Makes the pool check each connection is alive before handing it out.
+
+    A dead connection is replaced by a new one instead of failing the
+    query of whoever got it.
+    """
+    def ping(dbapi_con, con_record, con_proxy):
+        try:
+            cursor = dbapi_con.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            metrics.connection_errors += 1
+            LOG.warn(_("Replacing a dead connection of the %s pool.")
+                     % metrics.name)
+            raise exc.DisconnectionError()
+    event.listen(engine, 'checkout', ping)
@@ -0,0 +1,56 @@
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Index
+from sqlalchemy.schema import MetaData
+
+from trove.db.sqlalchemy.migrate_repo.schema import Table
+
+# The indexes backing the sort keys and filters of the instance lists. InnoDB
+# appends the primary key to secondary indexes, which covers the id the
+# listing always uses as the last sort key.
+INDEXES = {
+    'instances_tenant_id_deleted_created_idx':
+    ('tenant_id', 'deleted', 'created'),
+    'instances_tenant_id_deleted_updated_idx':
+    ('tenant_id', 'deleted', 'updated'),
+    'instances_tenant_id_deleted_name_idx':
+    ('tenant_id', 'deleted', 'name'),
+    'instances_tenant_id_deleted_service_type_idx':
+    ('tenant_id', 'deleted', 'service_type'),
+    'instances_deleted_created_idx': ('deleted', 'created'),
+}
+
+
+def _indexes(instances):
+    return [Index(name, *[instances.c[column] for column in columns])
+            for name, columns in sorted(INDEXES.items())]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    instances = Table('instances', meta, autoload=True)
+    for index in _indexes(instances):
+        index.create()
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    instances = Table('instances', meta, autoload=True)
+    for index in _indexes(instances):
+        index.drop()
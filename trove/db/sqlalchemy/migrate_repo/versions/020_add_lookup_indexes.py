@@ -0,0 +1,81 @@
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import Column
+from sqlalchemy.schema import Index
+from sqlalchemy.schema import MetaData
+
+from trove.db.sqlalchemy.migrate_repo.schema import Boolean
+from trove.db.sqlalchemy.migrate_repo.schema import String
+from trove.db.sqlalchemy.migrate_repo.schema import Table
+
+# The indexes backing the lookups of a row by the instance it belongs to.
+# The quota usages are looked up by tenant and resource, which their unique
+# constraint already indexes.
+INDEXES = {
+    'service_statuses': {
+        'service_statuses_instance_id_idx': ('instance_id',),
+    },
+    'agent_heartbeats': {
+        'agent_heartbeats_instance_id_idx': ('instance_id',),
+    },
+    'backups': {
+        'backups_instance_id_deleted_idx': ('instance_id', 'deleted'),
+    },
+    'instances': {
+        'instances_compute_instance_id_idx': ('compute_instance_id',),
+    },
+    'security_group_instance_associations': {
+        'security_group_instance_associations_instance_id_idx':
+        ('instance_id', 'deleted'),
+        'security_group_instance_associations_security_group_id_idx':
+        ('security_group_id', 'deleted'),
+    },
+}
+
+
+def _column(name):
+    return Column(name, Boolean() if name == 'deleted' else String(36))
+
+
+def _indexes(meta):
+    # The tables are declared with the indexed columns only rather than
+    # reflected, as migration 014 leaves a foreign key to migration_tmp on
+    # older SQLite versions which fails the reflection.
+    indexes = []
+    for table_name, table_indexes in sorted(INDEXES.items()):
+        columns = set(column for names in table_indexes.values()
+                      for column in names)
+        table = Table(table_name, meta,
+                      *[_column(column) for column in sorted(columns)])
+        for name, columns in sorted(table_indexes.items()):
+            indexes.append(Index(name,
+                                 *[table.c[column] for column in columns]))
+    return indexes
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for index in _indexes(meta):
+        index.create()
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for index in _indexes(meta):
+        index.drop()
@@ -0,0 +1,59 @@
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy.schema import MetaData
+
+from trove.db.sqlalchemy import tables
+from trove.db.sqlalchemy.migrate_repo.schema import create_tables
+from trove.db.sqlalchemy.migrate_repo.schema import drop_tables
+from trove.db.sqlalchemy.migrate_repo.schema import Table
+
+# The tables whose soft deleted rows, and the rows depending on them, are
+# archived to a shadow table with the same columns.
+ARCHIVED_TABLES = [
+    'instances',
+    'service_statuses',
+    'agent_heartbeats',
+    'dns_records',
+    'backups',
+    'security_groups',
+    'security_group_instance_associations',
+    'security_group_rules',
+]
+
+
+def _shadows(meta):
+    # The shadow tables are copied from their static definitions rather
+    # than reflected, as migration 014 leaves a foreign key to
+    # migration_tmp on older SQLite versions which fails the reflection.
+    shadows = []
+    for name in ARCHIVED_TABLES:
+        shadow = tables.meta.tables['shadow_' + name]
+        shadows.append(Table(shadow.name, meta,
+                             *[column.copy() for column in shadow.columns]))
+    return shadows
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    create_tables(_shadows(meta))
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    drop_tables(_shadows(meta))
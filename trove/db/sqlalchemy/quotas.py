@@ -0,0 +1,304 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Reserves quota and settles the reservations in one transaction each.
+
+The usage rows of the tenant are locked with SELECT ... FOR UPDATE before
+they're checked, and changed by UPDATEs adding to the counts in place, so
+the reservations of concurrent requests are applied one after the other
+and none is checked against counts another has since changed. The UPDATE
+reserving a resource also repeats the check in its WHERE clause, which
+keeps the limit on databases which don't lock rows, such as SQLite.
+
+The usages drift from the rows they count when a request fails to settle
+its reservations, which resync_usages corrects for every tenant at once.
+"""
+
+import sqlalchemy
+import sqlalchemy.exc
+
+from trove.backup.models import BackupState
+from trove.common import exception
+from trove.common import utils
+from trove.db.sqlalchemy import session
+from trove.db.sqlalchemy import tables
+from trove.instance.tasks import InstanceTasks
+from trove.openstack.common import log as logging
+from trove.openstack.common.gettextutils import _
+
+LOG = logging.getLogger(__name__)
+
+# The statuses of trove.quota.models.Reservation.
+RESERVED = 'Reserved'
+COMMITTED = 'Committed'
+ROLLED_BACK = 'Rolled Back'
+
+
+def _get_session():
+    """Returns a session of its own for the quota transactions.
+
+    Committing the session shared by the request would also flush the
+    models the request changed, so a reservation writes quota rows only.
+    """
+    return session._make_session()
+
+
+def _add_usages(db_session, tenant_id, resources):
+    now = utils.utcnow()
+    for resource in resources:
+        try:
+            db_session.execute(tables.quota_usages.insert().values(
+                id=utils.generate_uuid(), tenant_id=tenant_id,
+                resource=resource, in_use=0, reserved=0, created=now,
+                updated=now))
+        except sqlalchemy.exc.IntegrityError:
+            # Another request added the row first.
+            pass
+
+
+def _lock_usages(db_session, tenant_id, resources):
+    usages = tables.quota_usages
+    # Locked in the same order by every request, so they can't deadlock.
+    query = (usages.select(for_update=True)
+             .where(sqlalchemy.and_(usages.c.tenant_id == tenant_id,
+                                    usages.c.resource.in_(resources)))
+             .order_by(usages.c.id))
+    return dict((row.resource, row) for row in db_session.execute(query))
+
+
+def _reserve_locked(db_session, tenant_id, deltas, default_limits, locked):
+    usages = tables.quota_usages
+    quotas = tables.quotas
+    resources = sorted(deltas)
+    limits = dict(default_limits)
+    query = sqlalchemy.select([quotas.c.resource, quotas.c.hard_limit])
+    query = query.where(sqlalchemy.and_(quotas.c.tenant_id == tenant_id,
+                                        quotas.c.resource.in_(resources)))
+    limits.update((row.resource, row.hard_limit)
+                  for row in db_session.execute(query))
+
+    def over(resource):
+        usage = locked[resource]
+        return (deltas[resource] > 0 and
+                usage.in_use + usage.reserved + deltas[resource]
+                > limits[resource])
+
+    overs = [resource for resource in resources if over(resource)]
+    if overs:
+        raise exception.QuotaExceeded(overs=overs)
+    now = utils.utcnow()
+    reservations = []
+    for resource in resources:
+        usage = locked[resource]
+        delta = deltas[resource]
+        update = (usages.update().where(usages.c.id == usage.id)
+                  .values(reserved=usages.c.reserved + delta, updated=now))
+        if delta > 0:
+            update = update.where(usages.c.in_use + usages.c.reserved
+                                  + delta <= limits[resource])
+        if not db_session.execute(update).rowcount:
+            raise exception.QuotaExceeded(overs=[resource])
+        reservations.append({'id': utils.generate_uuid(),
+                             'usage_id': usage.id, 'delta': delta,
+                             'status': RESERVED, 'created': now,
+                             'updated': now})
+    db_session.execute(tables.reservations.insert(), reservations)
+    return reservations
+
+
+def reserve(tenant_id, deltas, default_limits):
+    """Checks the deltas against the tenant's quotas and reserves them.
+
+    Raises QuotaExceeded with the resources over their limits, reserving
+    nothing. Otherwise returns the values of the reservations created.
+    """
+    resources = sorted(deltas)
+    db_session = _get_session()
+    while True:
+        with db_session.begin():
+            locked = _lock_usages(db_session, tenant_id, resources)
+            missing = [resource for resource in resources
+                       if resource not in locked]
+            if not missing:
+                return _reserve_locked(db_session, tenant_id, deltas,
+                                       default_limits, locked)
+        # The usage rows of a tenant's first reservations are added outside
+        # the transaction, as another request may add them first.
+        _add_usages(db_session, tenant_id, missing)
+
+
+def _settle(reservation_ids, status, values_of):
+    """Applies the reservations still reserved among reservation_ids to
+    their usages and marks them with status. Returns their ids.
+    """
+    usages = tables.quota_usages
+    table = tables.reservations
+    db_session = _get_session()
+    with db_session.begin():
+        where = sqlalchemy.and_(table.c.id.in_(reservation_ids),
+                                table.c.status == RESERVED)
+        rows = db_session.execute(table.select(for_update=True).where(where)
+                                  .order_by(table.c.usage_id)).fetchall()
+        if not rows:
+            return []
+        totals = {}
+        for row in rows:
+            totals[row.usage_id] = totals.get(row.usage_id, 0) + row.delta
+        for usage_id in sorted(totals):
+            db_session.execute(
+                usages.update().where(usages.c.id == usage_id)
+                .values(updated=utils.utcnow(),
+                        **values_of(usages, totals[usage_id])))
+        db_session.execute(table.update().where(where)
+                           .values(status=status, updated=utils.utcnow()))
+    return [row.id for row in rows]
+
+
+def commit(reservation_ids):
+    """Moves the reserved deltas into the usages' in_use counts."""
+    return _settle(reservation_ids, COMMITTED,
+                   lambda usages, delta: {
+                       'in_use': usages.c.in_use + delta,
+                       'reserved': usages.c.reserved - delta})
+
+
+def rollback(reservation_ids):
+    """Releases the reserved deltas."""
+    return _settle(reservation_ids, ROLLED_BACK,
+                   lambda usages, delta: {
+                       'reserved': usages.c.reserved - delta})
+
+
+def _batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def _expire(db_session, reserved_before, batch_size):
+    """Rolls back the reservations still reserved since before
+    reserved_before. Returns how many were.
+    """
+    table = tables.reservations
+    query = sqlalchemy.select([table.c.id]).where(sqlalchemy.and_(
+        table.c.status == RESERVED, table.c.created < reserved_before))
+    ids = [row.id for row in db_session.execute(query)]
+    return sum(len(rollback(batch)) for batch in _batches(ids, batch_size))
+
+
+def _count_in_use(db_session, resources):
+    """Returns the use of each resource counted from the rows it tracks,
+    by (tenant_id, resource).
+    """
+    instances = tables.instances
+    backups = tables.backups
+    in_use = {}
+    if 'instances' in resources or 'volumes' in resources:
+        # Deleting instances no longer count, as their deletion released
+        # their quota.
+        query = (sqlalchemy.select([instances.c.tenant_id,
+                                    sqlalchemy.func.count(instances.c.id),
+                                    sqlalchemy.func.sum(
+                                        instances.c.volume_size)])
+                 .where(sqlalchemy.and_(
+                     sqlalchemy.not_(instances.c.deleted),
+                     instances.c.task_id != InstanceTasks.DELETING.code))
+                 .group_by(instances.c.tenant_id))
+        for tenant_id, count, volume_size in db_session.execute(query):
+            in_use[(tenant_id, 'instances')] = count
+            in_use[(tenant_id, 'volumes')] = int(volume_size or 0)
+    if 'backups' in resources:
+        # Nor do backups whose deletion failed, as their deletion released
+        # their quota too.
+        query = (sqlalchemy.select([backups.c.tenant_id,
+                                    sqlalchemy.func.count(backups.c.id)])
+                 .where(sqlalchemy.and_(
+                     sqlalchemy.not_(backups.c.deleted),
+                     backups.c.state != BackupState.DELETE_FAILED))
+                 .group_by(backups.c.tenant_id))
+        for tenant_id, count in db_session.execute(query):
+            in_use[(tenant_id, 'backups')] = count
+    return dict((key, count) for key, count in in_use.iteritems()
+                if key[1] in resources)
+
+
+def resync_usages(resources, reserved_before, batch_size):
+    """Sets the usages of resources of every tenant to the counts of the
+    rows they track, after expiring the reservations made before
+    reserved_before.
+
+    The usages with reservations still reserved are left alone, as their
+    rows may already be counted. Each usage is corrected only if it still
+    holds the counts read, so a reservation made meanwhile isn't lost. The
+    corrections are written batch_size usages per statement. Returns the
+    number of reservations expired and of usages corrected and added.
+    """
+    usages = tables.quota_usages
+    reservations = tables.reservations
+    db_session = _get_session()
+    expired = _expire(db_session, reserved_before, batch_size)
+    # The usages are read before the reservations pending and the rows
+    # counted, so a reservation made or settled meanwhile changes the usage
+    # from the values read and its correction is skipped.
+    query = (sqlalchemy.select([usages.c.id, usages.c.tenant_id,
+                                usages.c.resource, usages.c.in_use,
+                                usages.c.reserved])
+             .where(usages.c.resource.in_(resources)))
+    rows = db_session.execute(query).fetchall()
+    query = (sqlalchemy.select([reservations.c.usage_id]).distinct()
+             .where(reservations.c.status == RESERVED))
+    pending = set(row.usage_id for row in db_session.execute(query))
+    in_use = _count_in_use(db_session, resources)
+    corrections = []
+    for row in rows:
+        count = in_use.pop((row.tenant_id, row.resource), 0)
+        if row.id not in pending and (row.in_use, row.reserved) != (count, 0):
+            corrections.append({'usage_id': row.id, 'old_in_use': row.in_use,
+                                'old_reserved': row.reserved,
+                                'new_in_use': count})
+    now = utils.utcnow()
+    update = (usages.update()
+              .where(sqlalchemy.and_(
+                  usages.c.id == sqlalchemy.bindparam('usage_id'),
+                  usages.c.in_use == sqlalchemy.bindparam('old_in_use'),
+                  usages.c.reserved == sqlalchemy.bindparam('old_reserved')))
+              .values(in_use=sqlalchemy.bindparam('new_in_use'), reserved=0,
+                      updated=now))
+    corrected = 0
+    for batch in _batches(corrections, batch_size):
+        with db_session.begin():
+            corrected += db_session.execute(update, batch).rowcount
+    # The tenants using resources without a usage row yet.
+    additions = [{'id': utils.generate_uuid(), 'tenant_id': tenant_id,
+                  'resource': resource, 'in_use': count, 'reserved': 0,
+                  'created': now, 'updated': now}
+                 for (tenant_id, resource), count in sorted(in_use.items())
+                 if count]
+    added = 0
+    for batch in _batches(additions, batch_size):
+        try:
+            with db_session.begin():
+                db_session.execute(usages.insert(), batch)
+            added += len(batch)
+        except sqlalchemy.exc.IntegrityError:
+            # A reservation added some of the rows since, which the next
+            # resync corrects if need be.
+            pass
+    LOG.info(_("Resynced the quota usages: %(expired)d reservations "
+               "expired, %(corrected)d usages corrected and %(added)d "
+               "added.") % {'expired': expired, 'corrected': corrected,
+                            'added': added})
+    return {'expired': expired, 'corrected': corrected, 'added': added}
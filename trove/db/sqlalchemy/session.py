@@ -16,17 +16,30 @@
 #    under the License.
 
 import contextlib
+
+from eventlet import corolocal
 from sqlalchemy import create_engine
 from sqlalchemy import MetaData
+from sqlalchemy.engine import url as sa_url
 from sqlalchemy.orm import sessionmaker
 
 from trove.common import cfg
 from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
 from trove.db.sqlalchemy import mappers
+from trove.db.sqlalchemy import metrics
+from trove.db.sqlalchemy import threadpool
 
 _ENGINE = None
 _MAKER = None
+# The engine of sql_read_connection, serving the reads of read only scopes.
+_READ_ENGINE = None
+_READ_MAKER = None
+# The pool metrics of each engine created, by name.
+_METRICS = {}
+# Holds the session shared by the database calls of a green thread while it
+# runs in a session_scope.
+_SCOPE = corolocal.local()
 
 
 LOG = logging.getLogger(__name__)
@@ -35,47 +48,88 @@ CONF = cfg.CONF
 
 
 def configure_db(options, models_mapper=None):
-    global _ENGINE
+    global _ENGINE, _READ_ENGINE
     if not _ENGINE:
-        _ENGINE = _create_engine(options)
+        _METRICS['main'] = metrics.PoolMetrics('main')
+        _ENGINE = _create_engine(options, _METRICS['main'])
+    if not _READ_ENGINE and CONF.sql_read_connection:
+        _METRICS['read'] = metrics.PoolMetrics('read')
+        _READ_ENGINE = _create_engine(
+            {'sql_connection': CONF.sql_read_connection}, _METRICS['read'])
     if models_mapper:
         models_mapper.map(_ENGINE)
     else:
-        from trove.instance import models as base_models
-        from trove.dns import models as dns_models
-        from trove.extensions.mysql import models as mysql_models
-        from trove.guestagent import models as agent_models
-        from trove.quota import models as quota_models
-        from trove.backup import models as backup_models
-        from trove.extensions.security_group import models as secgrp_models
-
-        model_modules = [
-            base_models,
-            dns_models,
-            mysql_models,
-            agent_models,
-            quota_models,
-            backup_models,
-            secgrp_models,
-        ]
-
-        models = {}
-        for module in model_modules:
-            models.update(module.persisted_models())
-        mappers.map(_ENGINE, models)
-
-
-def _create_engine(options):
+        mappers.map(_ENGINE, mappers.persisted_models())
+
+
+def _create_engine(options, pool_metrics=None):
     engine_args = {
         "pool_recycle": CONF.sql_idle_timeout,
         "echo": CONF.sql_query_log
     }
+    pool_metrics = pool_metrics or metrics.PoolMetrics('unnamed')
+    connection = options['sql_connection']
+    url = sa_url.make_url(connection)
+    # SQLite is given the pool its dialect picks, which isn't sized.
+    if url.drivername != 'sqlite':
+        engine_args['poolclass'] = metrics.instrumented_pool_class(
+            pool_metrics)
+        pool_args = {"pool_size": CONF.sql_max_pool_size,
+                     "max_overflow": CONF.sql_max_overflow,
+                     "pool_timeout": CONF.sql_pool_timeout}
+        engine_args.update((key, value) for key, value
+                           in pool_args.iteritems() if value is not None)
+    if CONF.sql_connection_mode == 'tpool':
+        engine_args.update(threadpool.engine_args(url, CONF.sql_tpool_size))
+    elif CONF.sql_connection_mode != 'direct':
+        raise RuntimeError(_("Unknown sql_connection_mode %s.")
+                           % CONF.sql_connection_mode)
     LOG.info(_("Creating SQLAlchemy engine with args: %s") % engine_args)
-    return create_engine(options['sql_connection'], **engine_args)
+    engine = create_engine(connection, **engine_args)
+    if CONF.sql_connection_ping:
+        metrics.ping_on_checkout(engine, pool_metrics)
+    pool_metrics.listen(engine)
+    return engine
+
+
+def pool_metrics():
+    """Returns the pool metrics of the engines of this process."""
+    return [_METRICS[name].data() for name in sorted(_METRICS)]
 
 
 def get_session(autocommit=True, expire_on_commit=False):
     """Helper method to grab session."""
+    scoped = getattr(_SCOPE, 'session', None)
+    if scoped is not None:
+        use_primary()
+        return scoped
+    return _make_session(autocommit, expire_on_commit)
+
+
+def get_read_session():
+    """Returns the session for a read which the read replica may serve.
+
+    Only the reads of a scope entered with replica_reads go to the replica,
+    until the scope first uses the primary: from then on it reads from the
+    primary too, so it sees what it wrote.
+    """
+    global _READ_MAKER
+    if _READ_ENGINE is None or not getattr(_SCOPE, 'replica_reads', False):
+        return get_session()
+    if _SCOPE.read_session is None:
+        if not _READ_MAKER:
+            _READ_MAKER = sessionmaker(bind=_READ_ENGINE, autocommit=True,
+                                       expire_on_commit=False)
+        _SCOPE.read_session = _READ_MAKER(autoflush=False)
+    return _SCOPE.read_session
+
+
+def use_primary():
+    """Sends the remaining reads of the current scope to the primary."""
+    _SCOPE.replica_reads = False
+
+
+def _make_session(autocommit=True, expire_on_commit=False, **kwargs):
     global _MAKER, _ENGINE
     if not _MAKER:
         if not _ENGINE:
@@ -85,7 +139,67 @@ def get_session(autocommit=True, expire_on_commit=False):
         _MAKER = sessionmaker(bind=_ENGINE,
                               autocommit=autocommit,
                               expire_on_commit=expire_on_commit)
-    return _MAKER()
+    return _MAKER(**kwargs)
+
+
+def in_scope():
+    return getattr(_SCOPE, 'session', None) is not None
+
+
+@contextlib.contextmanager
+def session_scope(replica_reads=False):
+    """Shares one session among the database calls made in the block.
+
+    Models loaded in the scope stay in the session's identity map, so saving
+    them again doesn't select them first. Saving a model flushes that model
+    only, and the session doesn't autoflush, so a model changed but not
+    saved is never written behind the caller's back. Transactions begun on
+    the session would flush every change, so code committing one, such as
+    the quota reservations, uses a session of its own. Nested scopes
+    join the outer one, and blocks run unscoped aren't scoped at all.
+
+    With replica_reads, for blocks which mostly read, the reads go to
+    sql_read_connection if set until the block first uses the primary.
+    """
+    if (not CONF.sql_session_per_request or in_scope()
+            or getattr(_SCOPE, 'unscoped', False)):
+        yield
+        return
+    _SCOPE.session = _make_session(autoflush=False)
+    _SCOPE.read_session = None
+    _SCOPE.replica_reads = replica_reads
+    try:
+        yield
+    finally:
+        try:
+            _SCOPE.session.close()
+            if _SCOPE.read_session is not None:
+                _SCOPE.read_session.close()
+        finally:
+            _SCOPE.session = None
+            _SCOPE.read_session = None
+            _SCOPE.replica_reads = False
+
+
+@contextlib.contextmanager
+def unscoped():
+    """Gives every database call in the block a session of its own.
+
+    For long running flows, such as the taskmanager's, which would otherwise
+    hold the models they load for their whole run.
+    """
+    scoped = getattr(_SCOPE, 'session', None)
+    was_unscoped = getattr(_SCOPE, 'unscoped', False)
+    replica_reads = getattr(_SCOPE, 'replica_reads', False)
+    _SCOPE.session = None
+    _SCOPE.unscoped = True
+    _SCOPE.replica_reads = False
+    try:
+        yield
+    finally:
+        _SCOPE.session = scoped
+        _SCOPE.unscoped = was_unscoped
+        _SCOPE.replica_reads = replica_reads
 
 
 def raw_query(model, autocommit=True, expire_on_commit=False):
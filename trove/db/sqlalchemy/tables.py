@@ -0,0 +1,246 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The tables of the models, as the migrate_repo migrations leave them.
+
+The models are mapped against these definitions rather than tables
+reflected from the database, so starting a service doesn't query the
+database. A migration changing a mapped table changes its definition here
+too; test_tables checks they match a migrated database.
+"""
+
+from sqlalchemy import Boolean
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Float
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import Text
+from sqlalchemy import UniqueConstraint
+
+meta = MetaData()
+
+instances = Table(
+    'instances', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('name', String(255)),
+    Column('hostname', String(255)),
+    Column('compute_instance_id', String(36)),
+    Column('task_id', Integer()),
+    Column('task_description', String(32)),
+    Column('task_start_time', DateTime()),
+    Column('volume_id', String(36)),
+    Column('flavor_id', Integer()),
+    Column('volume_size', Integer()),
+    Column('tenant_id', String(36)),
+    Column('server_status', String(64)),
+    Column('deleted', Boolean()),
+    Column('deleted_at', DateTime()),
+    Column('service_type', String(36)),
+    Column('server_addresses', Text()),
+    Column('server_updated', DateTime()),
+    Column('api_status', String(64)))
+
+Index('instances_tenant_id_deleted_created_idx',
+      instances.c.tenant_id, instances.c.deleted, instances.c.created)
+Index('instances_tenant_id_deleted_updated_idx',
+      instances.c.tenant_id, instances.c.deleted, instances.c.updated)
+Index('instances_tenant_id_deleted_name_idx',
+      instances.c.tenant_id, instances.c.deleted, instances.c.name)
+Index('instances_tenant_id_deleted_service_type_idx',
+      instances.c.tenant_id, instances.c.deleted, instances.c.service_type)
+Index('instances_deleted_created_idx',
+      instances.c.deleted, instances.c.created)
+Index('instances_tenant_id_deleted_api_status_idx',
+      instances.c.tenant_id, instances.c.deleted, instances.c.api_status)
+Index('instances_compute_instance_id_idx', instances.c.compute_instance_id)
+
+service_images = Table(
+    'service_images', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('service_name', String(255)),
+    Column('image_id', String(255)))
+
+service_statuses = Table(
+    'service_statuses', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('instance_id', String(36), nullable=False),
+    Column('status_id', Integer(), nullable=False),
+    Column('status_description', String(64), nullable=False),
+    Column('updated_at', DateTime()),
+    Column('volume_used', Float()),
+    Column('volume_updated', DateTime()))
+
+Index('service_statuses_instance_id_idx', service_statuses.c.instance_id)
+
+root_enabled_history = Table(
+    'root_enabled_history', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('user', String(255)),
+    Column('created', DateTime()))
+
+agent_heartbeats = Table(
+    'agent_heartbeats', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('instance_id', String(36), nullable=False),
+    Column('updated_at', DateTime()))
+
+Index('agent_heartbeats_instance_id_idx', agent_heartbeats.c.instance_id)
+
+dns_records = Table(
+    'dns_records', meta,
+    Column('name', String(255), primary_key=True, nullable=False),
+    Column('record_id', String(64)))
+
+quotas = Table(
+    'quotas', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('tenant_id', String(36)),
+    Column('resource', String(255), nullable=False),
+    Column('hard_limit', Integer()),
+    UniqueConstraint('tenant_id', 'resource'))
+
+quota_usages = Table(
+    'quota_usages', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('tenant_id', String(36)),
+    Column('in_use', Integer()),
+    Column('reserved', Integer()),
+    Column('resource', String(255), nullable=False),
+    UniqueConstraint('tenant_id', 'resource'))
+
+reservations = Table(
+    'reservations', meta,
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('usage_id', String(36)),
+    Column('delta', Integer(), nullable=False),
+    Column('status', String(36)))
+
+Index('reservations_status_created_idx',
+      reservations.c.status, reservations.c.created)
+
+backups = Table(
+    'backups', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('name', String(255), nullable=False),
+    Column('description', String(512)),
+    Column('location', String(1024)),
+    Column('backup_type', String(32)),
+    Column('size', Float()),
+    Column('tenant_id', String(36)),
+    Column('state', String(32), nullable=False),
+    Column('instance_id', String(36)),
+    Column('checksum', String(32)),
+    Column('backup_timestamp', DateTime()),
+    Column('deleted', Boolean()),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('deleted_at', DateTime()))
+
+Index('backups_instance_id_deleted_idx',
+      backups.c.instance_id, backups.c.deleted)
+
+security_groups = Table(
+    'security_groups', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('name', String(255)),
+    Column('description', String(255)),
+    Column('user', String(255)),
+    Column('tenant_id', String(255)),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('deleted', Boolean()),
+    Column('deleted_at', DateTime()))
+
+security_group_instance_associations = Table(
+    'security_group_instance_associations', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('security_group_id', String(36),
+           ForeignKey('security_groups.id', ondelete="CASCADE",
+                      onupdate="CASCADE")),
+    Column('instance_id', String(36),
+           ForeignKey('instances.id', ondelete="CASCADE",
+                      onupdate="CASCADE")),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('deleted', Boolean()),
+    Column('deleted_at', DateTime()))
+
+Index('security_group_instance_associations_instance_id_idx',
+      security_group_instance_associations.c.instance_id,
+      security_group_instance_associations.c.deleted)
+Index('security_group_instance_associations_security_group_id_idx',
+      security_group_instance_associations.c.security_group_id,
+      security_group_instance_associations.c.deleted)
+
+security_group_rules = Table(
+    'security_group_rules', meta,
+    Column('id', String(36), primary_key=True, nullable=False),
+    Column('group_id', String(36),
+           ForeignKey('security_groups.id', ondelete="CASCADE",
+                      onupdate="CASCADE")),
+    Column('parent_group_id', String(36),
+           ForeignKey('security_groups.id', ondelete="CASCADE",
+                      onupdate="CASCADE")),
+    Column('protocol', String(255)),
+    Column('from_port', Integer()),
+    Column('to_port', Integer()),
+    Column('cidr', String(255)),
+    Column('created', DateTime()),
+    Column('updated', DateTime()),
+    Column('deleted', Boolean()),
+    Column('deleted_at', DateTime()))
+
+cache_generations = Table(
+    'cache_generations', meta,
+    Column('name', String(64), primary_key=True, nullable=False),
+    Column('generation', Integer(), nullable=False))
+
+
+def _shadow(table):
+    """Defines the table the archived rows of table are moved to.
+
+    A shadow table has the columns of its table but none of its indexes or
+    foreign keys, so archiving a row never depends on another.
+    """
+    return Table(
+        'shadow_' + table.name, meta,
+        *[Column(column.name, column.type, primary_key=column.primary_key,
+                 nullable=column.nullable) for column in table.columns])
+
+
+shadow_instances = _shadow(instances)
+shadow_service_statuses = _shadow(service_statuses)
+shadow_agent_heartbeats = _shadow(agent_heartbeats)
+shadow_dns_records = _shadow(dns_records)
+shadow_backups = _shadow(backups)
+shadow_security_groups = _shadow(security_groups)
+shadow_security_group_instance_associations = _shadow(
+    security_group_instance_associations)
+shadow_security_group_rules = _shadow(security_group_rules)
@@ -0,0 +1,51 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Calls a blocking database driver from eventlet's native thread pool.
+
+A C driver such as MySQLdb blocks the whole process while it waits on the
+database, so one slow query stalls every green thread. The engines of the
+tpool connection mode are given a ThreadPoolDBAPI in place of the driver's
+module: the connections and cursors it returns run each of their calls in
+a native thread, and only the green thread making the call waits.
+"""
+
+from eventlet import tpool
+
+
+class ThreadPoolDBAPI(object):
+    """Wraps a DB-API module so its connections run in native threads."""
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+    def connect(self, *args, **kwargs):
+        connection = tpool.execute(self._module.connect, *args, **kwargs)
+        return tpool.Proxy(connection, autowrap_names=('cursor',))
+
+
+def engine_args(url, size):
+    """Returns the create_engine arguments of the tpool mode for url."""
+    tpool.set_num_threads(size)
+    args = {'module': ThreadPoolDBAPI(url.get_dialect().dbapi())}
+    if url.drivername == 'sqlite':
+        # A connection may be called from any thread of the pool.
+        args['connect_args'] = {'check_same_thread': False}
+    return args
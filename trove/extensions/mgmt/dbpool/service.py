@@ -0,0 +1,47 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from trove.common import wsgi
+from trove.common.auth import admin_context
+from trove.db import cache
+from trove.db import get_db_api
+from trove.extensions.mgmt.dbpool import views
+from trove.openstack.common import log as logging
+from trove.openstack.common.gettextutils import _
+
+LOG = logging.getLogger(__name__)
+
+
+class DbPoolController(wsgi.Controller):
+    """Controller for the database connection pools of this API worker."""
+
+    @admin_context
+    def index(self, req, tenant_id):
+        """Return the metrics of the database connection pools."""
+        LOG.info(_("Indexing database pools for tenant '%s'") % tenant_id)
+        pools = get_db_api().pool_metrics()
+        return wsgi.Result(views.DbPoolsView(pools).data(), 200)
+
+
+class DbCacheController(wsgi.Controller):
+    """Controller for the model caches of this API worker."""
+
+    @admin_context
+    def index(self, req, tenant_id):
+        """Return the hit and miss counts of the model caches."""
+        LOG.info(_("Indexing model caches for tenant '%s'") % tenant_id)
+        return wsgi.Result(views.DbCachesView(cache.stats()).data(), 200)
@@ -27,22 +27,52 @@ LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
 
-def load_mgmt_instances(context, deleted=None, client=None):
+def load_mgmt_instances(context, deleted=None, client=None, db_only=False):
+    """Loads the instances of all tenants.
+
+    With db_only, only the servers of the instances lacking a server state
+    persisted from the Nova notifications are fetched from Nova, instead of
+    listing every server.
+    """
+    instances, marker = load_mgmt_instances_page(context, deleted=deleted,
+                                                 client=client,
+                                                 db_only=db_only)
+    return instances
+
+
+def load_mgmt_instances_page(context, deleted=None, client=None,
+                             db_only=False, limit=None, marker=None,
+                             sort_keys=None, sort_dir='asc', conditions=None,
+                             ranges=None):
+    """Loads a page of the instances of all tenants and the next marker.
+
+    Without a limit all the instances are loaded. The sort keys, conditions
+    and ranges are applied by the database, see Query.limit.
+    """
     if not client:
         client = remote.create_nova_client(context)
-    try:
-        mgmt_servers = client.rdservers.list()
-    except AttributeError:
-        mgmt_servers = client.servers.list(search_opts={'all_tenants': 1})
-    LOG.info("Found %d servers in Nova" %
-             len(mgmt_servers if mgmt_servers else []))
+    conditions = dict(conditions or {})
     if deleted is not None:
-        db_infos = instance_models.DBInstance.find_all(deleted=deleted)
+        conditions['deleted'] = deleted
+    query = instance_models.DBInstance.find_all(**conditions)
+    db_infos, next_marker = query.paginated_collection(
+        limit=limit, marker=marker, sort_keys=sort_keys, sort_dir=sort_dir,
+        ranges=ranges)
+    if db_only:
+        mgmt_servers = imodels.load_servers_by_id(
+            client, [db.compute_instance_id for db in db_infos
+                     if not db.deleted and imodels.server_status_needed(db)])
     else:
-        db_infos = instance_models.DBInstance.find_all()
+        try:
+            mgmt_servers = client.rdservers.list()
+        except AttributeError:
+            mgmt_servers = client.servers.list(
+                search_opts={'all_tenants': 1})
+    LOG.info("Found %d servers in Nova" %
+             len(mgmt_servers if mgmt_servers else []))
     instances = MgmtInstances.load_status_from_existing(context, db_infos,
                                                         mgmt_servers)
-    return instances
+    return instances, next_marker
 
 
 def load_mgmt_instance(cls, context, id):
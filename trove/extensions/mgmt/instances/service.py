@@ -19,7 +19,9 @@
 from novaclient import exceptions as nova_exceptions
 
 from trove.backup.models import Backup
+from trove.common import cfg
 from trove.common import exception
+from trove.common import pagination
 from trove.common import wsgi
 from trove.common.auth import admin_context
 from trove.instance import models as instance_models
@@ -29,11 +31,13 @@ from trove.extensions.mgmt.instances.views import DiagnosticsView
 from trove.extensions.mgmt.instances.views import HwInfoView
 from trove.extensions.mysql import models as mysql_models
 from trove.instance.service import InstanceController
+from trove.instance.service import list_options
 from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
 import trove.common.apischema as apischema
 
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -59,13 +63,18 @@ class MgmtInstanceController(InstanceController):
         elif deleted_q in ['false']:
             deleted = False
         try:
-            instances = models.load_mgmt_instances(context, deleted=deleted)
+            instances, marker = models.load_mgmt_instances_page(
+                context, deleted=deleted, db_only=CONF.server_status_from_db,
+                limit=context.limit, marker=context.marker,
+                **list_options(req))
         except nova_exceptions.ClientException as e:
             LOG.error(e)
             return wsgi.Result(str(e), 403)
 
-        view_cls = views.MgmtInstancesView
-        return wsgi.Result(view_cls(instances, req=req).data(), 200)
+        view = views.MgmtInstancesView(instances, req=req)
+        paged = pagination.SimplePaginatedDataView(req.url, 'instances', view,
+                                                   marker)
+        return wsgi.Result(paged.data(), 200)
 
     @admin_context
     def show(self, req, tenant_id, id):
@@ -23,6 +23,7 @@ from trove.common import cfg
 from trove.common import exception
 from trove.common import utils
 from trove.common.remote import create_guest_client
+from trove.db import cache
 from trove.db import get_db_api
 from trove.guestagent.db import models as guest_models
 from trove.instance import models as base_models
@@ -200,6 +201,7 @@ class RootHistory(object):
     _auto_generated_attrs = ['id']
     _data_fields = ['instance_id', 'user', 'created']
     _table_name = 'root_enabled_history'
+    _cacheable = True
 
     def __init__(self, instance_id, user):
         self.id = instance_id
@@ -213,8 +215,9 @@ class RootHistory(object):
 
     @classmethod
     def load(cls, context, instance_id):
-        history = get_db_api().find_by(cls, id=instance_id)
-        return history
+        return cache.find_by(
+            cls, lambda: get_db_api().find_by(cls, id=instance_id),
+            id=instance_id)
 
     @classmethod
     def create(cls, context, instance_id, user):
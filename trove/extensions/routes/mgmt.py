@@ -19,6 +19,8 @@ from trove.openstack.common import log as logging
 
 from trove.common import extensions
 from trove.common import wsgi
+from trove.extensions.mgmt.dbpool.service import DbCacheController
+from trove.extensions.mgmt.dbpool.service import DbPoolController
 from trove.extensions.mgmt.instances.service import MgmtInstanceController
 from trove.extensions.mgmt.host.service import HostController
 from trove.extensions.mgmt.quota.service import QuotaController
@@ -86,6 +88,22 @@ class Mgmt(extensions.ExtensionsDescriptor):
             member_actions={})
         resources.append(storage)
 
+        dbpool = extensions.ResourceExtension(
+            '{tenant_id}/mgmt/dbpool',
+            DbPoolController(),
+            deserializer=wsgi.RequestDeserializer(),
+            serializer=serializer,
+            member_actions={})
+        resources.append(dbpool)
+
+        dbcache = extensions.ResourceExtension(
+            '{tenant_id}/mgmt/dbcache',
+            DbCacheController(),
+            deserializer=wsgi.RequestDeserializer(),
+            serializer=serializer,
+            member_actions={})
+        resources.append(dbcache)
+
         host_instances = extensions.ResourceExtension(
             'instances',
             hostservice.HostInstanceController(),
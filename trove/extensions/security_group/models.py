@@ -45,6 +45,7 @@ def persisted_models():
 class SecurityGroup(DatabaseModelBase):
     _data_fields = ['id', 'name', 'description', 'user', 'tenant_id',
                     'created', 'updated', 'deleted', 'deleted_at']
+    _cacheable = True
 
     @property
     def instance_id(self):
@@ -133,6 +134,7 @@ class SecurityGroupRule(DatabaseModelBase):
     _data_fields = ['id', 'parent_group_id', 'protocol', 'from_port',
                     'to_port', 'cidr', 'group_id', 'created', 'updated',
                     'deleted', 'deleted_at']
+    _cacheable = True
 
     @classmethod
     def create_sec_group_rule(cls, sec_group, protocol, from_port,
@@ -20,10 +20,15 @@
 from trove import db
 
 from novaclient import exceptions as nova_exceptions
+from trove.common import cfg
 from trove.common import exception
 from trove.common import utils
+from trove.common import wsgi
 from trove.common.models import NovaRemoteModelBase
 from trove.common.remote import create_nova_client
+from trove.openstack.common import timeutils
+
+CONF = cfg.CONF
 
 
 class Flavor(object):
@@ -81,3 +86,44 @@ class Flavors(NovaRemoteModelBase):
     def __iter__(self):
         for item in self.flavors:
             yield item
+
+
+class FlavorCache(object):
+    """Caches the Nova flavor list of each tenant for ttl seconds.
+
+    Each list comes with a generation which only changes when a reload
+    returns different flavors, so it can serve as the ETag of the flavors.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+
+    def get(self, context):
+        """Returns the flavors of the tenant and their generation."""
+        entry = self._entries.get(context.tenant)
+        if entry is None or timeutils.is_older_than(entry[0], self.ttl):
+            nova_flavors = create_nova_client(context).flavors.list()
+            generation = wsgi.compute_etag(*sorted(
+                (item.id, item.name, item.ram, item.vcpus, item.ephemeral)
+                for item in nova_flavors))
+            entry = (timeutils.utcnow(), nova_flavors, generation)
+            self._entries[context.tenant] = entry
+        return entry[1], entry[2]
+
+
+_CACHE = None
+
+
+def load_cached_flavors(context):
+    """Returns the flavors of the tenant and their generation.
+
+    Returns None instead when flavor_cache_ttl disables the cache.
+    """
+    global _CACHE
+    if not CONF.flavor_cache_ttl:
+        return None
+    if _CACHE is None:
+        _CACHE = FlavorCache(CONF.flavor_cache_ttl)
+    nova_flavors, generation = _CACHE.get(context)
+    return [Flavor(flavor=item) for item in nova_flavors], generation
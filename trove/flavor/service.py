@@ -32,15 +32,39 @@ class FlavorController(wsgi.Controller):
         """Return a single flavor."""
         context = req.environ[wsgi.CONTEXT_KEY]
         self._validate_flavor_id(id)
-        flavor = models.Flavor(context=context, flavor_id=int(id))
+        headers = {}
+        flavor = None
+        cached = models.load_cached_flavors(context)
+        if cached:
+            flavors, generation = cached
+            etag = wsgi.compute_etag(generation, int(id))
+            not_modified = wsgi.not_modified(req, etag)
+            if not_modified:
+                return not_modified
+            headers = wsgi.etag_headers(etag)
+            for item in flavors:
+                if str(item.id) == str(int(id)):
+                    flavor = item
+        if flavor is None:
+            flavor = models.Flavor(context=context, flavor_id=int(id))
         # Pass in the request to build accurate links.
-        return wsgi.Result(views.FlavorView(flavor, req).data(), 200)
+        return wsgi.Result(views.FlavorView(flavor, req).data(), 200,
+                           headers=headers)
 
     def index(self, req, tenant_id):
         """Return all flavors."""
         context = req.environ[wsgi.CONTEXT_KEY]
-        flavors = models.Flavors(context=context)
-        return wsgi.Result(views.FlavorsView(flavors, req).data(), 200)
+        cached = models.load_cached_flavors(context)
+        if not cached:
+            flavors = models.Flavors(context=context)
+            return wsgi.Result(views.FlavorsView(flavors, req).data(), 200)
+        flavors, generation = cached
+        etag = wsgi.compute_etag(generation)
+        not_modified = wsgi.not_modified(req, etag)
+        if not_modified:
+            return not_modified
+        return wsgi.Result(views.FlavorsView(flavors, req).data(), 200,
+                           headers=wsgi.etag_headers(etag))
 
     def _validate_flavor_id(self, id):
         try:
@@ -10,6 +10,7 @@ from trove.guestagent.manager.mysql_service import MySqlApp
 from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
 from trove.openstack.common import periodic_task
+from trove.openstack.common import timeutils
 
 
 LOG = logging.getLogger(__name__)
@@ -18,10 +19,24 @@ CONF = cfg.CONF
 
 class Manager(periodic_task.PeriodicTasks):
 
+    _volume_used_published = None
+
     @periodic_task.periodic_task(ticks_between_runs=3)
     def update_status(self, context):
         """Update the status of the MySQL service"""
-        MySqlAppStatus.get().update()
+        app_status = MySqlAppStatus.get()
+        app_status.update()
+        self._publish_volume_used(app_status)
+
+    def _publish_volume_used(self, app_status):
+        """Publish the volume usage every volume_usage_interval seconds."""
+        if (self._volume_used_published is not None and
+                not timeutils.is_older_than(self._volume_used_published,
+                                            CONF.volume_usage_interval)):
+            return
+        stats = dbaas.get_filesystem_volume_stats(CONF.mount_point)
+        app_status.set_volume_used(stats['used'])
+        self._volume_used_published = timeutils.utcnow()
 
     def change_passwords(self, context, users):
         return MySqlAdmin().change_passwords(users)
@@ -114,6 +114,11 @@ class BaseDbStatus(object):
         db_status.save()
         self.status = status
 
+    def set_volume_used(self, volume_used):
+        """Publishes the volume usage measured on this machine."""
+        rd_models.InstanceServiceStatus.save_volume_used(CONF.guest_id,
+                                                         volume_used)
+
     def update(self):
         """Find and report status of DB on this machine.
         The database is update and the status is also returned.
@@ -0,0 +1,123 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Persists the server state Nova reports in its compute notifications."""
+
+from trove.instance.models import DBInstance
+from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
+from trove.openstack.common.gettextutils import _
+
+LOG = logging.getLogger(__name__)
+
+EVENT_PREFIX = 'compute.instance.'
+
+# Maps the vm_state and task_state Nova sends in its notifications to the
+# status the Nova API shows for the server, as done by Nova itself.
+_STATE_MAP = {
+    'active': {
+        'default': 'ACTIVE',
+        'rebooting': 'REBOOT',
+        'reboot_pending': 'REBOOT',
+        'reboot_started': 'REBOOT',
+        'rebooting_hard': 'HARD_REBOOT',
+        'updating_password': 'PASSWORD',
+        'rebuilding': 'REBUILD',
+        'rebuild_block_device_mapping': 'REBUILD',
+        'rebuild_spawning': 'REBUILD',
+        'migrating': 'MIGRATING',
+        'resize_prep': 'RESIZE',
+        'resize_migrating': 'RESIZE',
+        'resize_migrated': 'RESIZE',
+        'resize_finish': 'RESIZE',
+    },
+    'building': {'default': 'BUILD'},
+    'stopped': {
+        'default': 'SHUTOFF',
+        'resize_prep': 'RESIZE',
+        'resize_migrating': 'RESIZE',
+        'resize_migrated': 'RESIZE',
+        'resize_finish': 'RESIZE',
+    },
+    'resized': {
+        'default': 'VERIFY_RESIZE',
+        'resize_reverting': 'REVERT_RESIZE',
+    },
+    'paused': {'default': 'PAUSED'},
+    'suspended': {'default': 'SUSPENDED'},
+    'rescued': {'default': 'RESCUE'},
+    'error': {'default': 'ERROR'},
+    # The API reports servers Nova no longer has as SHUTDOWN.
+    'deleted': {'default': 'SHUTDOWN'},
+    'soft-delete': {'default': 'SOFT_DELETED'},
+    'shelved': {'default': 'SHELVED'},
+    'shelved_offloaded': {'default': 'SHELVED_OFFLOADED'},
+}
+
+
+def server_status_from_state(vm_state, task_state=None):
+    task_map = _STATE_MAP.get(vm_state, {'default': 'UNKNOWN'})
+    return task_map.get(task_state, task_map['default'])
+
+
+def addresses_from_fixed_ips(fixed_ips):
+    """Builds the addresses dict of a server from the notification ips."""
+    addresses = {}
+    for fixed_ip in fixed_ips:
+        label = addresses.setdefault(fixed_ip.get('label'), [])
+        label.append({'addr': fixed_ip.get('address'),
+                      'version': fixed_ip.get('version')})
+        for floating_ip in fixed_ip.get('floating_ips', []):
+            label.append({'addr': floating_ip.get('address'),
+                          'version': fixed_ip.get('version')})
+    return addresses
+
+
+class ComputeNotificationHandler(object):
+    """Consumes compute.instance.* notifications.
+
+    The server status and addresses of the matching instance are written to
+    the instances table, so the API can read them without calling Nova.
+    """
+
+    def __call__(self, message):
+        event_type = message.get('event_type', '')
+        if not event_type.startswith(EVENT_PREFIX):
+            return
+        payload = message.get('payload', {})
+        server_id = payload.get('instance_id')
+        vm_state = payload.get('state')
+        if not server_id or not vm_state:
+            return
+        status = server_status_from_state(vm_state,
+                                          payload.get('new_task_state'))
+        addresses = None
+        if vm_state == 'deleted':
+            addresses = {}
+        elif 'fixed_ips' in payload:
+            addresses = addresses_from_fixed_ips(payload['fixed_ips'])
+        try:
+            updated = timeutils.normalize_time(
+                timeutils.parse_isotime(message['timestamp']))
+        except (KeyError, ValueError):
+            updated = timeutils.utcnow()
+        try:
+            DBInstance.save_server_state(server_id, status, addresses,
+                                         updated)
+        except Exception:
+            LOG.exception(_("Unable to save the state of server %s from "
+                            "notification %s.") % (server_id, event_type))
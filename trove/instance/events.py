@@ -0,0 +1,70 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process bus telling green threads an instance's state was written.
+
+Writers publish the id of the instance whose task or service status they
+saved, and every green thread waiting on that instance wakes up.
+"""
+
+import collections
+
+import eventlet
+from eventlet import event
+
+
+class InstanceEventBus(object):
+
+    def __init__(self):
+        self._waiters = collections.defaultdict(set)
+
+    def publish(self, instance_id):
+        for waiter in self._waiters.pop(instance_id, ()):
+            waiter.send()
+
+    def wait(self, instance_id, timeout):
+        """Waits for a publish on the instance for up to timeout seconds.
+
+        Returns True if one happened, False if the timeout ran out.
+        """
+        waiter = event.Event()
+        self._waiters[instance_id].add(waiter)
+        try:
+            with eventlet.Timeout(timeout, False):
+                waiter.wait()
+                return True
+            return False
+        finally:
+            waiters = self._waiters.get(instance_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[instance_id]
+
+    def waiting(self, instance_id):
+        return len(self._waiters.get(instance_id, ()))
+
+
+_BUS = InstanceEventBus()
+
+
+def publish(instance_id):
+    _BUS.publish(instance_id)
+
+
+def wait(instance_id, timeout):
+    return _BUS.wait(instance_id, timeout)
@@ -17,8 +17,14 @@
 
 """Model classes that form the core of instances functionality."""
 
+import hashlib
+
 from datetime import datetime
+from datetime import timedelta
+from eventlet import greenpool
 from novaclient import exceptions as nova_exceptions
+from sqlalchemy.orm import attributes
+from sqlalchemy.sql import expression
 from trove.common import cfg
 from trove.common import exception
 import trove.common.instance as rd_instance
@@ -27,16 +33,21 @@ from trove.common.remote import create_guest_client
 from trove.common.remote import create_nova_client
 from trove.common.remote import create_cinder_client
 from trove.common import utils
+from trove.common import wsgi
 from trove.extensions.security_group.models import SecurityGroup
 from trove.extensions.security_group.models import SecurityGroupRule
 from trove.db import get_db_api
 from trove.db import models as dbmodels
 from trove.backup.models import Backup
 from trove.quota.quota import run_with_quotas
+from trove.instance import events
+from trove.instance import server_cache
 from trove.instance.tasks import InstanceTask
 from trove.instance.tasks import InstanceTasks
 from trove.taskmanager import api as task_api
+from trove.openstack.common import jsonutils
 from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
 from trove.openstack.common import uuidutils
 from trove.openstack.common.gettextutils import _
 
@@ -52,10 +63,12 @@ def load_server(context, instance_id, server_id):
         server = client.servers.get(server_id)
     except nova_exceptions.NotFound:
         LOG.debug("Could not find nova server_id(%s)" % server_id)
+        server_cache.invalidate(server_id)
         raise exception.ComputeInstanceNotFound(instance_id=instance_id,
                                                 server_id=server_id)
     except nova_exceptions.ClientException as e:
         raise exception.TroveError(str(e))
+    server_cache.put(server)
     return server
 
 
@@ -82,20 +95,45 @@ def validate_volume_size(size):
         raise exception.VolumeQuotaExceeded(msg)
 
 
+def load_server_status_from_db(db_info):
+    """Uses the server state persisted from the Nova notifications.
+
+    Returns False if reading it is disabled or no notification has been
+    received for the server yet, in which case Nova has to be asked.
+    """
+    if not CONF.server_status_from_db or db_info.server_updated is None:
+        return False
+    db_info.addresses = jsonutils.loads(db_info.server_addresses or '{}')
+    return True
+
+
+def server_status_needed(db_info):
+    """True if the server status of the instance has to come from Nova."""
+    if InstanceTasks.BUILDING == db_info.task_status:
+        return False
+    return not (CONF.server_status_from_db and db_info.server_updated)
+
+
 def load_simple_instance_server_status(context, db_info):
     """Loads a server or raises an exception."""
     if 'BUILDING' == db_info.task_status.action:
         db_info.server_status = "BUILD"
         db_info.addresses = {}
+    elif load_server_status_from_db(db_info):
+        return
     else:
-        client = create_nova_client(context)
-        try:
-            server = client.servers.get(db_info.compute_instance_id)
-            db_info.server_status = server.status
-            db_info.addresses = server.addresses
-        except nova_exceptions.NotFound:
-            db_info.server_status = "SHUTDOWN"
-            db_info.addresses = {}
+        server = server_cache.get(db_info.compute_instance_id)
+        if server is None:
+            client = create_nova_client(context)
+            try:
+                server = client.servers.get(db_info.compute_instance_id)
+                server_cache.put(server)
+            except nova_exceptions.NotFound:
+                db_info.server_status = "SHUTDOWN"
+                db_info.addresses = {}
+                return
+        db_info.server_status = server.status
+        db_info.addresses = server.addresses
 
 
 # If the compute server is in any of these states we can't perform any
@@ -122,6 +160,7 @@ class SimpleInstance(object):
         self.db_info = db_info
         self.service_status = service_status
         self.root_pass = root_password
+        self._has_running_backup = None
 
     @property
     def addresses(self):
@@ -138,6 +177,17 @@ class SimpleInstance(object):
         # Flavor ID is a str in the 1.0 API.
         return str(self.db_info.flavor_id)
 
+    @property
+    def has_running_backup(self):
+        """True if a backup is running, unless preloaded by the caller."""
+        if self._has_running_backup is not None:
+            return self._has_running_backup
+        return Backup.running(self.id) is not None
+
+    @has_running_backup.setter
+    def has_running_backup(self, value):
+        self._has_running_backup = value
+
     @property
     def hostname(self):
         return self.db_info.hostname
@@ -169,20 +219,26 @@ class SimpleInstance(object):
 
     @property
     def status(self):
-        ### Check for taskmanager errors.
-        if self.db_info.task_status.is_error:
-            return InstanceStatus.ERROR
+        """The public status of the instance.
+
+        The api_status persisted by the writers is used when it doesn't
+        depend on a server status only Nova knows.
+        """
+        if self.db_info.api_status and not server_status_needed(self.db_info):
+            return self.db_info.api_status
+        return self.computed_status
 
-        ### Check for taskmanager status.
+    @property
+    def computed_status(self):
+        ### Check for taskmanager errors and status.
+        status = task_api_status(self.db_info.task_status)
+        if status is not None:
+            return status
         ACTION = self.db_info.task_status.action
         if 'BUILDING' == ACTION:
             if 'ERROR' == self.db_info.server_status:
                 return InstanceStatus.ERROR
             return InstanceStatus.BUILD
-        if 'REBOOTING' == ACTION:
-            return InstanceStatus.REBOOT
-        if 'RESIZING' == ACTION:
-            return InstanceStatus.RESIZE
 
         ### Check for server status.
         if self.db_info.server_status in ["BUILD", "ERROR", "REBOOT",
@@ -190,7 +246,7 @@ class SimpleInstance(object):
             return self.db_info.server_status
 
         ### Check if there is a backup running for this instance
-        if Backup.running(self.id):
+        if self.has_running_backup:
             return InstanceStatus.BACKUP
 
         ### Report as Shutdown while deleting, unless there's an error.
@@ -246,6 +302,7 @@ class DetailInstance(SimpleInstance):
     def __init__(self, context, db_info, service_status):
         super(DetailInstance, self).__init__(context, db_info, service_status)
         self._volume_used = None
+        self._volume_used_updated = None
 
     @property
     def volume_used(self):
@@ -255,6 +312,15 @@ class DetailInstance(SimpleInstance):
     def volume_used(self, value):
         self._volume_used = value
 
+    @property
+    def volume_used_updated(self):
+        """When the guest measured volume_used."""
+        return self._volume_used_updated
+
+    @volume_used_updated.setter
+    def volume_used_updated(self, value):
+        self._volume_used_updated = value
+
 
 def get_db_info(context, id):
     if context is None:
@@ -281,9 +347,8 @@ def load_any_instance(context, id):
 def load_instance(cls, context, id, needs_server=False):
     db_info = get_db_info(context, id)
     if not needs_server:
-        # TODO(tim.simpson): When we have notifications this won't be
-        # necessary and instead we'll just use the server_status field from
-        # the instance table.
+        # Uses the server_status field from the instance table when it is
+        # kept up to date from the Nova notifications.
         load_simple_instance_server_status(context, db_info)
         server = None
     else:
@@ -303,13 +368,87 @@ def load_instance(cls, context, id, needs_server=False):
     return cls(context, db_info, server, service_status)
 
 
-def load_instance_with_guest(cls, context, id):
+def state_tag(db_info, service_status):
+    """Fingerprints the task, server and service state of an instance.
+
+    It changes whenever the instance row is saved or the service status
+    changes, and only needs the database to compute.
+    """
+    state = (db_info.updated, db_info.task_id, db_info.server_status,
+             service_status.status_id if service_status else None)
+    return hashlib.sha1(repr(state)).hexdigest()
+
+
+def load_state_tag(context, id):
     db_info = get_db_info(context, id)
-    load_simple_instance_server_status(context, db_info)
-    service_status = InstanceServiceStatus.find_by(instance_id=id)
-    LOG.info("service status=%s" % service_status)
+    service_status = InstanceServiceStatus.get_by(instance_id=id)
+    return state_tag(db_info, service_status)
+
+
+def load_etag(context, id, fields=None):
+    """Returns a strong ETag of the details of the instance, or None.
+
+    It is computed from the updated columns of the instance, its service
+    status and its backups. Those only cover everything the details show
+    while the server status needs no call to Nova, so there is no ETag for
+    the other instances.
+    """
+    db_info = get_db_info(context, id)
+    if server_status_needed(db_info):
+        return None
+    service_status = InstanceServiceStatus.get_by(instance_id=id)
+    return wsgi.compute_etag(
+        db_info.id, db_info.updated, db_info.server_updated,
+        service_status.updated_at if service_status else None,
+        service_status.volume_updated if service_status else None,
+        Backup.last_updated(id), sorted(fields) if fields else None)
+
+
+def wait_for_change(context, id, tag, timeout):
+    """Blocks until the state tag of the instance differs from tag.
+
+    Saves made by this process wake the wait up at once. Those made by the
+    taskmanager and the guests are seen by rechecking the tag every
+    instance_watch_poll_interval seconds. Gives up after timeout seconds.
+    """
+    deadline = utils.utcnow() + timedelta(seconds=timeout)
+    while load_state_tag(context, id) == tag:
+        remaining = timeutils.delta_seconds(utils.utcnow(), deadline)
+        if remaining <= 0:
+            return False
+        events.wait(id, min(remaining, CONF.instance_watch_poll_interval))
+    return True
+
+
+def fields_requested(fields, *names):
+    """True if fields is None, meaning all, or holds any of names."""
+    return fields is None or any(name in fields for name in names)
+
+
+def load_instance_with_guest(cls, context, id, live_volume_used=False,
+                             fields=None):
+    """Loads an instance along with the volume usage of its guest.
+
+    The usage is the one the guest last published, unless live_volume_used
+    asks to call the guest for it. When fields is given, only the work
+    needed to show those fields is done.
+    """
+    db_info = get_db_info(context, id)
+    wants_volume_used = fields_requested(fields, 'volume', 'local_storage')
+    wants_status = (fields_requested(fields, 'status') or
+                    (live_volume_used and wants_volume_used))
+    if wants_status or fields_requested(fields, 'ip'):
+        load_simple_instance_server_status(context, db_info)
+    service_status = None
+    if wants_status or wants_volume_used:
+        service_status = InstanceServiceStatus.find_by(instance_id=id)
+        LOG.info("service status=%s" % service_status)
     instance = cls(context, db_info, service_status)
-    load_guest_info(instance, context, id)
+    if wants_volume_used and live_volume_used:
+        load_guest_info(instance, context, id)
+    elif wants_volume_used:
+        instance.volume_used = service_status.volume_used
+        instance.volume_used_updated = service_status.volume_updated
     return instance
 
 
@@ -319,6 +458,7 @@ def load_guest_info(instance, context, id):
         try:
             volume_info = guest.get_volume_info()
             instance.volume_used = volume_info['used']
+            instance.volume_used_updated = utils.utcnow()
         except Exception as e:
             LOG.error(e)
     return instance
@@ -345,7 +485,7 @@ class BaseInstance(SimpleInstance):
             LOG.debug(_("  ... deleting compute id = %s") %
                       self.db_info.compute_instance_id)
             LOG.debug(_(" ... setting status to DELETING."))
-            self.update_db(task_status=InstanceTasks.DELETING)
+            self._start_task(InstanceTasks.DELETING)
             task_api.API(self.context).delete_instance(self.id)
 
         deltas = {'instances': -1}
@@ -394,6 +534,33 @@ class BaseInstance(SimpleInstance):
             setattr(self.db_info, key, values[key])
         self.db_info.save()
 
+    def transition_task(self, task_status, **values):
+        """Moves the instance to task_status, if its task is still the one
+        last read or written by this object, and sets the values with it.
+
+        Returns False, changing nothing, if someone else changed the task
+        in the meantime.
+        """
+        expected = self.db_info.task_status
+        if not DBInstance.compare_and_set_task(self.id, expected, task_status,
+                                               **values):
+            return False
+        # The values are already written: recorded as loaded rather than
+        # changed, a later flush of db_info doesn't write them over a task
+        # someone else has set since.
+        values.update(task_id=task_status.code,
+                      task_description=task_status.db_text)
+        for key in values:
+            attributes.set_committed_value(self.db_info, key, values[key])
+        return True
+
+    def _start_task(self, task_status):
+        if not self.transition_task(task_status):
+            msg = ("Instance is not currently available for an action to be "
+                   "performed (another request changed its task).")
+            LOG.error(msg)
+            raise exception.UnprocessableEntity(msg)
+
     def set_servicestatus_deleted(self):
         del_instance = InstanceServiceStatus.find_by(instance_id=self.id)
         del_instance.set_status(rd_instance.ServiceStatuses.DELETED)
@@ -541,7 +708,7 @@ class Instance(BuiltInstance):
                 raise exception.CannotResizeToSameSize()
 
         # Set the task to RESIZING and begin the async call before returning.
-        self.update_db(task_status=InstanceTasks.RESIZING)
+        self._start_task(InstanceTasks.RESIZING)
         LOG.debug("Instance %s set to RESIZING." % self.id)
         task_api.API(self.context).resize_flavor(self.id, old_flavor,
                                                  new_flavor)
@@ -559,7 +726,7 @@ class Instance(BuiltInstance):
                        "volume size of '%s'")
                 raise exception.BadRequest(msg % old_size)
             # Set the task to Resizing before sending off to the taskmanager
-            self.update_db(task_status=InstanceTasks.RESIZING)
+            self._start_task(InstanceTasks.RESIZING)
             task_api.API(self.context).resize_volume(new_size, self.id)
 
         new_size_l = long(new_size)
@@ -571,7 +738,7 @@ class Instance(BuiltInstance):
     def reboot(self):
         self.validate_can_perform_action()
         LOG.info("Rebooting instance %s..." % self.id)
-        self.update_db(task_status=InstanceTasks.REBOOTING)
+        self._start_task(InstanceTasks.REBOOTING)
         task_api.API(self.context).reboot(self.id)
 
     def restart(self):
@@ -583,13 +750,13 @@ class Instance(BuiltInstance):
         #                   We need a last updated time to mitigate this;
         #                   after some period of tolerance, we'll assume the
         #                   status is no longer in effect.
-        self.update_db(task_status=InstanceTasks.REBOOTING)
+        self._start_task(InstanceTasks.REBOOTING)
         task_api.API(self.context).restart(self.id)
 
     def migrate(self, host=None):
         self.validate_can_perform_action()
         LOG.info("Migrating instance id = %s, to host = %s" % (self.id, host))
-        self.update_db(task_status=InstanceTasks.MIGRATING)
+        self._start_task(InstanceTasks.MIGRATING)
         task_api.API(self.context).migrate(self.id, host)
 
     def reset_task_status(self):
@@ -618,53 +785,98 @@ class Instance(BuiltInstance):
 
 def create_server_list_matcher(server_list):
     # Returns a method which finds a server from the given list.
+    servers = {}
+    duplicates = set()
+    for server in server_list:
+        if server.id in servers:
+            duplicates.add(server.id)
+        servers[server.id] = server
+
     def find_server(instance_id, server_id):
-        matches = [server for server in server_list if server.id == server_id]
-        if len(matches) == 1:
-            return matches[0]
-        elif len(matches) < 1:
-            # The instance was not found in the list and
-            # this can happen if the instance is deleted from
-            # nova but still in trove database
-            raise exception.ComputeInstanceNotFound(
-                instance_id=instance_id, server_id=server_id)
-        else:
+        if server_id in duplicates:
             # Should never happen, but never say never.
             LOG.error(_("Server %(server)s for instance %(instance)s was"
                         "found twice!") % {'server': server_id,
                                            'instance': instance_id})
             raise exception.TroveError(uuid=instance_id)
+        try:
+            return servers[server_id]
+        except KeyError:
+            # The instance was not found in the list and
+            # this can happen if the instance is deleted from
+            # nova but still in trove database
+            raise exception.ComputeInstanceNotFound(
+                instance_id=instance_id, server_id=server_id)
 
     return find_server
 
 
+def load_servers_by_id(client, server_ids):
+    """Fetches only the given servers from Nova.
+
+    Nova can't filter a server list by several ids, so the servers are
+    fetched with concurrent GETs bounded by
+    instances_page_server_fetch_concurrency. Servers Nova no longer knows
+    about are left out of the result.
+    """
+    def get_server(server_id):
+        try:
+            return client.servers.get(server_id)
+        except nova_exceptions.NotFound:
+            return None
+
+    pool = greenpool.GreenPool(CONF.instances_page_server_fetch_concurrency)
+    server_ids = set(server_id for server_id in server_ids if server_id)
+    return [server for server in pool.imap(get_server, server_ids)
+            if server is not None]
+
+
 class Instances(object):
     DEFAULT_LIMIT = CONF.instances_page_size
 
     @staticmethod
-    def load(context):
+    def load(context, sort_keys=None, sort_dir='asc', conditions=None,
+             ranges=None, fields=None):
+        """Loads a page of the instances of the tenant.
+
+        The sort keys, equality conditions and ranges on the instances
+        table are applied by the database, see Query.limit. Unless fields
+        holds status, the status is neither loaded from Nova nor from the
+        service statuses.
+        """
 
         def load_simple_instance(context, db, status, **kwargs):
             return SimpleInstance(context, db, status)
 
         if context is None:
             raise TypeError("Argument context not defined.")
-        client = create_nova_client(context)
-        servers = client.servers.list()
 
-        db_infos = DBInstance.find_all(tenant_id=context.tenant, deleted=False)
+        conditions = dict(conditions or {})
+        conditions.update(tenant_id=context.tenant, deleted=False)
+        db_infos = DBInstance.find_all(**conditions)
         limit = int(context.limit or Instances.DEFAULT_LIMIT)
         if limit > Instances.DEFAULT_LIMIT:
             limit = Instances.DEFAULT_LIMIT
         data_view = DBInstance.find_by_pagination('instances', db_infos, "foo",
                                                   limit=limit,
-                                                  marker=context.marker)
+                                                  marker=context.marker,
+                                                  sort_keys=sort_keys,
+                                                  sort_dir=sort_dir,
+                                                  ranges=ranges)
         next_marker = data_view.next_page_marker
+        if not fields_requested(fields, 'status'):
+            return ([SimpleInstance(context, db, None)
+                     for db in data_view.collection], next_marker)
 
+        client = create_nova_client(context)
+        if CONF.instances_page_server_fetch or CONF.server_status_from_db:
+            servers = load_servers_by_id(
+                client, [db.compute_instance_id
+                         for db in data_view.collection
+                         if server_status_needed(db)])
+        else:
+            servers = client.servers.list()
         find_server = create_server_list_matcher(servers)
-        for db in db_infos:
-            LOG.debug("checking for db [id=%s, compute_instance_id=%s]" %
-                      (db.id, db.compute_instance_id))
         ret = Instances._load_servers_status(load_simple_instance, context,
                                              data_view.collection,
                                              find_server)
@@ -672,34 +884,41 @@ class Instances(object):
 
     @staticmethod
     def _load_servers_status(load_instance, context, db_items, find_server):
+        # Fetch the service statuses and running backups for the whole page
+        # up front so the number of queries doesn't grow with the page size.
+        db_items = list(db_items)
+        instance_ids = [db.id for db in db_items]
+        statuses = InstanceServiceStatus.find_all_by_instance_ids(
+            instance_ids)
+        backing_up = Backup.running_instance_ids(
+            [db.id for db in db_items
+             if not db.api_status or server_status_needed(db)])
         ret = []
         for db in db_items:
             server = None
-            try:
-                #TODO(tim.simpson): Delete when we get notifications working!
-                if InstanceTasks.BUILDING == db.task_status:
-                    db.server_status = "BUILD"
-                else:
-                    try:
-                        server = find_server(db.id, db.compute_instance_id)
-                        db.server_status = server.status
-                    except exception.ComputeInstanceNotFound:
-                        db.server_status = "SHUTDOWN"  # Fake it...
-                #TODO(tim.simpson): End of hack.
-
-                #volumes = find_volumes(server.id)
-                status = InstanceServiceStatus.find_by(instance_id=db.id)
-                LOG.info(_("Server api_status(%s)") %
-                         status.status.api_status)
-                if not status.status:  # This should never happen.
-                    LOG.error(_("Server status could not be read for "
-                                "instance id(%s)") % db.id)
-                    continue
-            except exception.ModelNotFoundError:
+            #TODO(tim.simpson): Delete when we get notifications working!
+            if InstanceTasks.BUILDING == db.task_status:
+                db.server_status = "BUILD"
+            elif load_server_status_from_db(db):
+                pass
+            else:
+                try:
+                    server = find_server(db.id, db.compute_instance_id)
+                    db.server_status = server.status
+                except exception.ComputeInstanceNotFound:
+                    db.server_status = "SHUTDOWN"  # Fake it...
+            #TODO(tim.simpson): End of hack.
+
+            #volumes = find_volumes(server.id)
+            status = statuses.get(db.id)
+            if status is None or not status.status:
                 LOG.error(_("Server status could not be read for "
                             "instance id(%s)") % db.id)
                 continue
-            ret.append(load_instance(context, db, status, server=server))
+            LOG.info(_("Server api_status(%s)") % status.status.api_status)
+            instance = load_instance(context, db, status, server=server)
+            instance.has_running_backup = db.id in backing_up
+            ret.append(instance)
         return ret
 
 
@@ -734,11 +953,65 @@ class DBInstance(dbmodels.DatabaseModelBase):
 
     task_status = property(get_task_status, set_task_status)
 
+    def save(self):
+        saved = super(DBInstance, self).save()
+        refresh_api_status(self.id)
+        events.publish(self.id)
+        return saved
+
+    @classmethod
+    def compare_and_set_task(cls, instance_id, expected, task_status,
+                             **values):
+        """Moves the instance from the expected task to task_status.
+
+        The transition is a single UPDATE conditioned on the expected task,
+        so of concurrent transitions from the same task only one succeeds.
+        Returns whether this one did.
+        """
+        values.update(task_id=task_status.code,
+                      task_description=task_status.db_text,
+                      updated=utils.utcnow())
+        api_status = task_api_status(task_status)
+        if api_status is not None:
+            values['api_status'] = api_status
+        conditions = {'id': instance_id, 'task_id': expected.code,
+                      'deleted': False}
+        if not get_db_api().compare_and_set(cls, conditions, values):
+            return False
+        if api_status is None:
+            refresh_api_status(instance_id)
+        events.publish(instance_id)
+        return True
+
+    @classmethod
+    def save_server_state(cls, compute_instance_id, server_status,
+                          addresses, updated):
+        """Persists the state Nova reported for a server at updated.
+
+        Reports older than the persisted one are ignored, so notifications
+        arriving out of order can't roll the state back. The addresses are
+        left alone when they are None.
+        """
+        values = {'server_status': server_status, 'server_updated': updated}
+        if addresses is not None:
+            values['server_addresses'] = jsonutils.dumps(addresses)
+        query = cls.write_query().filter(
+            cls.compute_instance_id == compute_instance_id,
+            expression.or_(cls.server_updated == expression.null(),
+                           cls.server_updated <= updated))
+        count = query.update(values, synchronize_session=False)
+        if count:
+            for db_info in cls.find_all(
+                    compute_instance_id=compute_instance_id):
+                refresh_api_status(db_info.id)
+        return count
+
 
 class ServiceImage(dbmodels.DatabaseModelBase):
     """Defines the status of the service being run."""
 
     _data_fields = ['service_name', 'image_id']
+    _cacheable = True
 
 
 class InstanceServiceStatus(dbmodels.DatabaseModelBase):
@@ -765,12 +1038,77 @@ class InstanceServiceStatus(dbmodels.DatabaseModelBase):
         self.status_description = value.description
 
     def save(self):
+        # The heartbeats of the guest mostly report the status last saved,
+        # which leaves the api_status as it is.
+        status_changed = attributes.get_history(self,
+                                                'status_id').has_changes()
         self['updated_at'] = utils.utcnow()
-        return get_db_api().save(self)
+        saved = get_db_api().save(self)
+        if status_changed:
+            refresh_api_status(self.instance_id)
+        events.publish(self.instance_id)
+        return saved
+
+    @classmethod
+    def find_all_by_instance_ids(cls, instance_ids):
+        """Returns a dict of service statuses keyed by instance id."""
+        if not instance_ids:
+            return {}
+        query = cls.query().filter(cls.instance_id.in_(instance_ids))
+        return dict((status.instance_id, status) for status in query.all())
+
+    @classmethod
+    def save_volume_used(cls, instance_id, volume_used):
+        """Stores the volume usage the guest measured just now.
+
+        Only the volume columns are written, so updated_at keeps telling
+        when the service status itself was last reported.
+        """
+        query = cls.write_query().filter(cls.instance_id == instance_id)
+        values = {'volume_used': volume_used,
+                  'volume_updated': utils.utcnow()}
+        return query.update(values, synchronize_session=False)
 
     status = property(get_status, set_status)
 
 
+def task_api_status(task_status):
+    """Returns the API status implied by task_status alone, if any."""
+    if task_status.is_error:
+        return InstanceStatus.ERROR
+    if 'REBOOTING' == task_status.action:
+        return InstanceStatus.REBOOT
+    if 'RESIZING' == task_status.action:
+        return InstanceStatus.RESIZE
+    return None
+
+
+def refresh_api_status(instance_id):
+    """Recomputes the api_status of the instance and stores it if changed.
+
+    Called whenever the task status, the server status, the service status
+    or the backups of the instance are saved. The status is only stored if
+    the task, server status and api_status of the instance are still the
+    ones it was computed from: whoever changed them since refreshes it after
+    them.
+    """
+    db_info = DBInstance.get_by(id=instance_id)
+    if db_info is None:
+        return
+    service_status = InstanceServiceStatus.get_by(instance_id=instance_id)
+    if service_status is None:
+        # The service status is created right after the instance row.
+        service_status = InstanceServiceStatus(rd_instance.ServiceStatuses.NEW,
+                                               instance_id=instance_id)
+    status = SimpleInstance(None, db_info, service_status).computed_status
+    if status != db_info.api_status:
+        conditions = {'id': instance_id, 'task_id': db_info.task_id,
+                      'server_status': db_info.server_status,
+                      'api_status': db_info.api_status}
+        get_db_api().compare_and_set(DBInstance, conditions,
+                                     {'api_status': status})
+
+
 def persisted_models():
     return {
         'instance': DBInstance,
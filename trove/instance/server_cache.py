@@ -0,0 +1,167 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Process wide cache of the Nova server status and addresses.
+
+Entries are keyed by the compute instance id and expire after
+server_cache_ttl seconds. A background greenthread asks Nova for the
+servers that changed since its last run and refreshes the entries, so
+entries for servers which have not changed stay usable.
+"""
+
+import collections
+import datetime
+
+from trove.common import cfg
+from trove.common import utils
+from trove.common.context import TroveContext
+from trove.common.remote import create_admin_nova_client
+from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
+from trove.openstack.common.gettextutils import _
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+# Nova stamps changes-since with its own clock, so look back a little further
+# than the last refresh to allow for some drift between the hosts.
+CLOCK_SKEW = datetime.timedelta(seconds=5)
+
+_CACHE = None
+
+
+class CachedServer(object):
+    """The parts of a Nova server needed to show an instance."""
+
+    def __init__(self, id, status, addresses, cached_at):
+        self.id = id
+        self.status = status
+        self.addresses = addresses
+        self.cached_at = cached_at
+
+
+class ServerCache(object):
+    """A bounded LRU cache of Nova servers with a time to live."""
+
+    def __init__(self, ttl, max_size, page_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.page_size = page_size
+        self.last_refresh = timeutils.utcnow()
+        self._servers = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._servers)
+
+    def get(self, server_id):
+        server = self._servers.pop(server_id, None)
+        if server is None:
+            return None
+        if timeutils.is_older_than(server.cached_at, self.ttl):
+            LOG.debug("Server cache entry for %s has expired." % server_id)
+            return None
+        # Re-insert the entry to mark it as the most recently used.
+        self._servers[server_id] = server
+        return server
+
+    def put(self, server):
+        self._servers.pop(server.id, None)
+        self._servers[server.id] = CachedServer(server.id, server.status,
+                                                server.addresses,
+                                                timeutils.utcnow())
+        while len(self._servers) > self.max_size:
+            self._servers.popitem(last=False)
+
+    def invalidate(self, server_id):
+        self._servers.pop(server_id, None)
+
+    def refresh(self, client):
+        """Updates the cache with the servers Nova changed since last time.
+
+        Entries for servers that did not change are known to be current as
+        of the start of the refresh, so their age is reset as well. Nova
+        returns at most osapi_max_limit servers per request, so the changes
+        are listed a page at a time until a page comes back short.
+        """
+        started = timeutils.utcnow()
+        since = utils.isotime(self.last_refresh - CLOCK_SKEW)
+        search_opts = {'changes-since': since, 'all_tenants': 1}
+        changed = []
+        marker = None
+        while True:
+            page = client.servers.list(search_opts=search_opts, marker=marker,
+                                       limit=self.page_size)
+            changed.extend(page)
+            if len(page) < self.page_size:
+                break
+            marker = page[-1].id
+        for server_id in self._servers:
+            self._servers[server_id].cached_at = started
+        for server in changed:
+            if server.status == 'DELETED':
+                self.invalidate(server.id)
+            elif server.id in self._servers:
+                cached = self._servers[server.id]
+                cached.status = server.status
+                cached.addresses = server.addresses
+        self.last_refresh = started
+        LOG.debug("Server cache refreshed, %d servers changed since %s."
+                  % (len(changed), since))
+
+
+def _refresh(cache, context):
+    try:
+        cache.refresh(create_admin_nova_client(context))
+    except Exception:
+        # Entries simply age out until the next refresh works.
+        LOG.exception(_("Unable to refresh the server cache."))
+
+
+def _get_cache():
+    global _CACHE
+    if not CONF.server_cache:
+        return None
+    if _CACHE is None:
+        _CACHE = ServerCache(CONF.server_cache_ttl, CONF.server_cache_size,
+                             CONF.server_cache_page_size)
+        admin_context = TroveContext(
+            user=CONF.nova_proxy_admin_user,
+            auth_token=CONF.nova_proxy_admin_pass,
+            tenant=CONF.nova_proxy_admin_tenant_name)
+        utils.LoopingCall(_refresh, _CACHE, admin_context).start(
+            CONF.server_cache_refresh_interval, now=False)
+    return _CACHE
+
+
+def get(server_id):
+    """Returns the cached server or None if it isn't cached."""
+    cache = _get_cache()
+    if cache is None:
+        return None
+    return cache.get(server_id)
+
+
+def put(server):
+    cache = _get_cache()
+    if cache is not None:
+        cache.put(server)
+
+
+def invalidate(server_id):
+    cache = _get_cache()
+    if cache is not None:
+        cache.invalidate(server_id)
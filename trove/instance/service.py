@@ -28,6 +28,7 @@ from trove.instance import models, views
 from trove.backup.models import Backup as backup_model
 from trove.backup import views as backup_views
 from trove.openstack.common import log as logging
+from trove.openstack.common import timeutils
 from trove.openstack.common.gettextutils import _
 import trove.common.apischema as apischema
 
@@ -35,6 +36,80 @@ import trove.common.apischema as apischema
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
+# The instance columns the instance lists can be sorted and filtered by.
+LIST_SORT_KEYS = ('created', 'updated', 'name', 'service_type', 'id')
+LIST_FILTERS = ('name', 'service_type')
+
+
+def _parse_list_time(req, name):
+    value = req.GET.get(name)
+    if not value:
+        return None
+    try:
+        return timeutils.normalize_time(timeutils.parse_isotime(value))
+    except ValueError:
+        raise exception.BadRequest(_("%(name)s must be an ISO 8601 time, "
+                                     "not '%(value)s'.") %
+                                   {'name': name, 'value': value})
+
+
+def _watch_timeout(req):
+    timeout = req.GET.get('timeout', CONF.instance_watch_max_timeout)
+    try:
+        timeout = int(timeout)
+    except ValueError:
+        raise exception.BadRequest(_("timeout must be a number of "
+                                     "seconds."))
+    return max(0, min(timeout, CONF.instance_watch_max_timeout))
+
+
+def fields_option(req):
+    """Reads the comma separated fields query parameter into a set.
+
+    None means all the fields were asked for.
+    """
+    if 'fields' not in req.GET:
+        return None
+    fields = set(field for field in req.GET['fields'].split(',') if field)
+    unknown = fields - set(views.INSTANCE_FIELDS)
+    if unknown:
+        raise exception.BadRequest(_("Unknown fields: %s.") %
+                                   ', '.join(sorted(unknown)))
+    return fields
+
+
+def list_options(req):
+    """Reads the sort and filter query parameters of an instance list.
+
+    sort_key takes a comma separated list of LIST_SORT_KEYS and sort_dir
+    either asc or desc. The LIST_FILTERS and status match exactly, while
+    created_since and created_before bound the creation time.
+    """
+    sort_keys = [key for key in req.GET.get('sort_key', '').split(',')
+                 if key]
+    for sort_key in sort_keys:
+        if sort_key not in LIST_SORT_KEYS:
+            raise exception.InvalidSortKey(sort_key=sort_key)
+    sort_dir = req.GET.get('sort_dir', 'asc').lower()
+    if sort_dir not in ('asc', 'desc'):
+        raise exception.BadRequest(_("sort_dir must be asc or desc."))
+    conditions = dict((name, req.GET[name]) for name in LIST_FILTERS
+                      if name in req.GET)
+    if 'status' in req.GET:
+        # The persisted api_status only matches the status shown when the
+        # server status is persisted too.
+        if not CONF.server_status_from_db:
+            raise exception.BadRequest(_("Filtering by status requires "
+                                         "server_status_from_db."))
+        conditions['api_status'] = req.GET['status'].upper()
+    ranges = {}
+    created_range = (_parse_list_time(req, 'created_since'),
+                     _parse_list_time(req, 'created_before'))
+    if created_range != (None, None):
+        ranges['created'] = created_range
+    return {'sort_keys': sort_keys, 'sort_dir': sort_dir,
+            'conditions': conditions, 'ranges': ranges}
+
 
 class InstanceController(wsgi.Controller):
     """Controller for instance functionality"""
@@ -133,8 +208,10 @@ class InstanceController(wsgi.Controller):
         LOG.info(_("req : '%s'\n\n") % req)
         LOG.info(_("Indexing a database instance for tenant '%s'") % tenant_id)
         context = req.environ[wsgi.CONTEXT_KEY]
-        servers, marker = models.Instances.load(context)
-        view = views.InstancesView(servers, req=req)
+        fields = fields_option(req)
+        servers, marker = models.Instances.load(context, fields=fields,
+                                                **list_options(req))
+        view = views.InstancesView(servers, req=req, fields=fields)
         paged = pagination.SimplePaginatedDataView(req.url, 'instances', view,
                                                    marker)
         return wsgi.Result(paged.data(), 200)
@@ -155,10 +232,27 @@ class InstanceController(wsgi.Controller):
         LOG.info(_("id : '%s'\n\n") % id)
 
         context = req.environ[wsgi.CONTEXT_KEY]
-        server = models.load_instance_with_guest(models.DetailInstance,
-                                                 context, id)
-        return wsgi.Result(views.InstanceDetailView(server,
-                                                    req=req).data(), 200)
+        live_volume_used = utils.bool_from_string(
+            req.GET.get('live_volume_used', 'false'))
+        fields = fields_option(req)
+        wait_tag = req.GET.get('wait_for_change')
+        if wait_tag:
+            models.wait_for_change(context, id, wait_tag,
+                                   _watch_timeout(req))
+        headers = {'X-Instance-State': models.load_state_tag(context, id)}
+        if not live_volume_used:
+            etag = models.load_etag(context, id, fields)
+            if etag:
+                not_modified = wsgi.not_modified(req, etag, headers)
+                if not_modified:
+                    return not_modified
+                headers.update(wsgi.etag_headers(etag))
+        server = models.load_instance_with_guest(
+            models.DetailInstance, context, id,
+            live_volume_used=live_volume_used, fields=fields)
+        return wsgi.Result(views.InstanceDetailView(server, req=req,
+                                                    fields=fields).data(), 200,
+                           headers=headers)
 
     def delete(self, req, tenant_id, id):
         """Delete a single instance."""
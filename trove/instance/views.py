@@ -25,6 +25,11 @@ LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
+# The attributes the fields parameter can select, see InstanceView.
+INSTANCE_FIELDS = ('id', 'name', 'status', 'links', 'flavor', 'volume',
+                   'created', 'updated', 'hostname', 'ip', 'local_storage',
+                   'password')
+
 
 def get_ip_address(addresses):
     if addresses is None:
@@ -38,21 +43,31 @@ def get_ip_address(addresses):
 
 
 class InstanceView(object):
-    """Uses a SimpleInstance."""
+    """Uses a SimpleInstance.
+
+    When fields is given, only those attributes of the instance are shown,
+    along with its id.
+    """
 
-    def __init__(self, instance, req=None):
+    def __init__(self, instance, req=None, fields=None):
         self.instance = instance
         self.req = req
+        self.fields = fields
+
+    def _wants(self, field):
+        return models.fields_requested(self.fields, field)
 
     def data(self):
-        instance_dict = {
-            "id": self.instance.id,
-            "name": self.instance.name,
-            "status": self.instance.status,
-            "links": self._build_links(),
-            "flavor": self._build_flavor_info(),
-        }
-        if CONF.trove_volume_support:
+        instance_dict = {"id": self.instance.id}
+        if self._wants('name'):
+            instance_dict['name'] = self.instance.name
+        if self._wants('status'):
+            instance_dict['status'] = self.instance.status
+        if self._wants('links'):
+            instance_dict['links'] = self._build_links()
+        if self._wants('flavor'):
+            instance_dict['flavor'] = self._build_flavor_info()
+        if CONF.trove_volume_support and self._wants('volume'):
             instance_dict['volume'] = {'size': self.instance.volume_size}
 
         LOG.debug(instance_dict)
@@ -75,34 +90,45 @@ class InstanceView(object):
 class InstanceDetailView(InstanceView):
     """Works with a full-blown instance."""
 
-    def __init__(self, instance, req):
+    def __init__(self, instance, req, fields=None):
         super(InstanceDetailView, self).__init__(instance,
-                                                 req=req)
+                                                 req=req,
+                                                 fields=fields)
 
     def data(self):
         result = super(InstanceDetailView, self).data()
-        result['instance']['created'] = self.instance.created
-        result['instance']['updated'] = self.instance.updated
+        if self._wants('created'):
+            result['instance']['created'] = self.instance.created
+        if self._wants('updated'):
+            result['instance']['updated'] = self.instance.updated
 
         dns_support = CONF.trove_dns_support
-        if dns_support:
+        if dns_support and self._wants('hostname'):
             result['instance']['hostname'] = self.instance.hostname
 
-        if CONF.add_addresses:
+        if CONF.add_addresses and self._wants('ip'):
             ip = get_ip_address(self.instance.addresses)
             if ip is not None and len(ip) > 0:
                 result['instance']['ip'] = ip
 
-        if (isinstance(self.instance, models.DetailInstance) and
+        if CONF.trove_volume_support:
+            wants_volume_used = self._wants('volume')
+        else:
+            wants_volume_used = self._wants('local_storage')
+        if (wants_volume_used and
+                isinstance(self.instance, models.DetailInstance) and
                 self.instance.volume_used):
             used = self.instance.volume_used
             if CONF.trove_volume_support:
-                result['instance']['volume']['used'] = used
+                storage = result['instance']['volume']
             else:
                 # either ephemeral or root partition
-                result['instance']['local_storage'] = {'used': used}
+                storage = result['instance']['local_storage'] = {}
+            storage['used'] = used
+            if self.instance.volume_used_updated:
+                storage['used_updated'] = self.instance.volume_used_updated
 
-        if self.instance.root_password:
+        if self.instance.root_password and self._wants('password'):
             result['instance']['password'] = self.instance.root_password
 
         return result
@@ -111,9 +137,10 @@ class InstanceDetailView(InstanceView):
 class InstancesView(object):
     """Shows a list of SimpleInstance objects."""
 
-    def __init__(self, instances, req=None):
+    def __init__(self, instances, req=None, fields=None):
         self.instances = instances
         self.req = req
+        self.fields = fields
 
     def data(self):
         data = []
@@ -123,5 +150,5 @@ class InstancesView(object):
         return {'instances': data}
 
     def data_for_instance(self, instance):
-        view = InstanceView(instance, req=self.req)
+        view = InstanceView(instance, req=self.req, fields=self.fields)
         return view.data()['instance']
@@ -21,6 +21,7 @@ from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
 from oslo.config import cfg
 from trove.common import exception
+from trove.db import get_db_api
 from trove.openstack.common import importutils
 from trove.quota.models import Quota
 from trove.quota.models import QuotaUsage
@@ -126,7 +127,8 @@ class DbQuotaDriver(object):
         """Check quotas and reserve resources for a tenant.
 
         This method checks quotas against current usage,
-        reserved resources and the desired deltas.
+        reserved resources and the desired deltas, in one transaction
+        holding the tenant's usage rows locked.
 
         If any of the proposed values is over the defined quota, an
         QuotaExceeded exception will be raised with the sorted list of the
@@ -144,32 +146,13 @@ class DbQuotaDriver(object):
             raise exception.QuotaResourceUnknown(unknown=
                                                  unregistered_resources)
 
-        quotas = self.get_all_quotas_by_tenant(tenant_id, deltas.keys())
-        quota_usages = self.get_all_quota_usages_by_tenant(tenant_id,
-                                                           deltas.keys())
-
-        overs = [resource for resource in deltas
-                 if (int(deltas[resource]) > 0 and
-                    (quota_usages[resource].in_use +
-                     quota_usages[resource].reserved +
-                     int(deltas[resource])) > quotas[resource].hard_limit)]
-
-        if overs:
-            raise exception.QuotaExceeded(overs=sorted(overs))
-
-        reservations = []
-        for resource in deltas:
-            reserved = deltas[resource]
-            usage = quota_usages[resource]
-            usage.reserved = reserved
-            usage.save()
-
-            resv = Reservation.create(usage_id=usage.id,
-                                      delta=usage.reserved,
-                                      status=Reservation.Statuses.RESERVED)
-            reservations.append(resv)
-
-        return reservations
+        deltas = dict((resource, int(delta))
+                      for resource, delta in deltas.iteritems())
+        default_limits = dict((resource, resources[resource].default)
+                              for resource in deltas)
+        reserved = get_db_api().quota_reserve(tenant_id, deltas,
+                                              default_limits)
+        return [Reservation(**values) for values in reserved]
 
     def commit(self, reservations):
         """Commit reservations.
@@ -178,13 +161,10 @@ class DbQuotaDriver(object):
                              returned by the reserve() method.
         """
 
+        get_db_api().reservation_commit([reservation.id
+                                         for reservation in reservations])
         for reservation in reservations:
-            usage = QuotaUsage.find_by(id=reservation.usage_id)
-            usage.in_use += reservation.delta
-            usage.reserved -= reservation.delta
             reservation.status = Reservation.Statuses.COMMITTED
-            usage.save()
-            reservation.save()
 
     def rollback(self, reservations):
         """Roll back reservations.
@@ -193,12 +173,22 @@ class DbQuotaDriver(object):
                              returned by the reserve() method.
         """
 
+        get_db_api().reservation_rollback([reservation.id
+                                           for reservation in reservations])
         for reservation in reservations:
-            usage = QuotaUsage.find_by(id=reservation.usage_id)
-            usage.reserved -= reservation.delta
             reservation.status = Reservation.Statuses.ROLLEDBACK
-            usage.save()
-            reservation.save()
+
+    def resync_usages(self, resources, reserved_before, batch_size):
+        """Recount the usages of every tenant.
+
+        :param resources: A dictionary of the registered resources.
+        :param reserved_before: The time before which the reservations
+                                still reserved expire.
+        :param batch_size: The number of usages corrected per statement.
+        """
+
+        return get_db_api().quota_usage_resync(sorted(resources),
+                                               reserved_before, batch_size)
 
 
 class QuotaEngine(object):
@@ -303,6 +293,20 @@ class QuotaEngine(object):
             LOG.exception(_("Failed to roll back reservations "
                           "%(reservations)s") % {'reservations': reservations})
 
+    def resync_usages(self, reserved_before, batch_size):
+        """Recount the usages of every tenant from the rows they track.
+
+        Expires the reservations made before reserved_before, then sets
+        the usages with no reservation left to the counts.
+
+        :param reserved_before: The time before which the reservations
+                                still reserved expire.
+        :param batch_size: The number of usages corrected per statement.
+        """
+
+        return self._driver.resync_usages(self._resources, reserved_before,
+                                          batch_size)
+
     @property
     def resources(self):
         return sorted(self._resources.keys())
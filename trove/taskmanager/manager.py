@@ -14,14 +14,22 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import datetime
+
 from trove.common.context import TroveContext
 
 import trove.extensions.mgmt.instances.models as mgmtmodels
 import trove.common.cfg as cfg
 from trove.common import exception
+from trove.common import utils
+from trove.db import get_db_api
+from trove.db import without_session_scope
+from trove.instance.compute_notifications import ComputeNotificationHandler
 from trove.openstack.common import log as logging
 from trove.openstack.common import importutils
 from trove.openstack.common import periodic_task
+from trove.openstack.common.gettextutils import _
+from trove.quota.quota import QUOTAS
 from trove.taskmanager import models
 from trove.taskmanager.models import FreshInstanceTasks
 
@@ -43,26 +51,42 @@ class Manager(periodic_task.PeriodicTasks):
                 CONF.exists_notification_transformer,
                 context=self.admin_context)
 
+    def initialize_service_hook(self, service):
+        if CONF.nova_notifications_consumer:
+            LOG.info(_("Consuming Nova notifications from %s.") %
+                     CONF.nova_notifications_topic)
+            service.conn.join_consumer_pool(
+                ComputeNotificationHandler(),
+                'trove-compute-notifications',
+                CONF.nova_notifications_topic,
+                exchange_name=CONF.nova_control_exchange)
+
+    @without_session_scope
     def resize_volume(self, context, instance_id, new_size):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
         instance_tasks.resize_volume(new_size)
 
+    @without_session_scope
     def resize_flavor(self, context, instance_id, old_flavor, new_flavor):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
         instance_tasks.resize_flavor(old_flavor, new_flavor)
 
+    @without_session_scope
     def reboot(self, context, instance_id):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
         instance_tasks.reboot()
 
+    @without_session_scope
     def restart(self, context, instance_id):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
         instance_tasks.restart()
 
+    @without_session_scope
     def migrate(self, context, instance_id, host):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
         instance_tasks.migrate(host)
 
+    @without_session_scope
     def delete_instance(self, context, instance_id):
         try:
             instance_tasks = models.BuiltInstanceTasks.load(context,
@@ -80,6 +104,7 @@ class Manager(periodic_task.PeriodicTasks):
         instance_tasks = models.BuiltInstanceTasks.load(context, instance_id)
         instance_tasks.create_backup(backup_id)
 
+    @without_session_scope
     def create_instance(self, context, instance_id, name, flavor,
                         image_id, databases, users, service_type,
                         volume_size, security_groups, backup_id,
@@ -101,3 +126,28 @@ class Manager(periodic_task.PeriodicTasks):
             """
             mgmtmodels.publish_exist_events(self.exists_transformer,
                                             self.admin_context)
+
+    if CONF.archive_deleted_rows:
+        @periodic_task.periodic_task(
+            ticks_between_runs=CONF.archive_deleted_rows_ticks)
+        def archive_deleted_rows(self, context):
+            """Moves the rows deleted archive_deleted_rows_age days ago to
+            the shadow tables.
+            """
+            deleted_before = utils.utcnow() - datetime.timedelta(
+                days=CONF.archive_deleted_rows_age)
+            get_db_api().archive_deleted_rows(
+                deleted_before, CONF.archive_deleted_rows_batch_size,
+                CONF.archive_deleted_rows_max_rows)
+
+    if CONF.resync_quota_usages:
+        @periodic_task.periodic_task(
+            ticks_between_runs=CONF.resync_quota_usages_ticks)
+        def resync_quota_usages(self, context):
+            """Recounts the quota usages, expiring the reservations made
+            reservation_expire_age hours ago.
+            """
+            reserved_before = utils.utcnow() - datetime.timedelta(
+                hours=CONF.reservation_expire_age)
+            QUOTAS.resync_usages(reserved_before,
+                                 CONF.resync_quota_usages_batch_size)
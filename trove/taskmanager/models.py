@@ -37,6 +37,7 @@ from trove.instance.models import FreshInstance
 
 from trove.instance.models import InstanceStatus
 from trove.instance.models import InstanceServiceStatus
+from trove.instance import server_cache
 from trove.instance.views import get_ip_address
 from trove.openstack.common import log as logging
 from trove.openstack.common.gettextutils import _
@@ -59,6 +60,18 @@ use_nova_server_volume = CONF.use_nova_server_volume
 use_heat = CONF.use_heat
 
 
+def finish_task(instance, task_status=inst_models.InstanceTasks.NONE):
+    """Ends the task of the instance, unless something else changed it.
+
+    A flow finishing must not undo a task started since, such as a delete.
+    """
+    if not instance.transition_task(task_status):
+        LOG.warn(_("Not setting the task of instance %(id)s to %(task)s, it "
+                   "was changed from %(expected)s meanwhile.") %
+                 {'id': instance.id, 'task': task_status.action,
+                  'expected': instance.db_info.task_status.action})
+
+
 class NotifyMixin(object):
     """Notification Mixin
 
@@ -179,7 +192,7 @@ class FreshInstanceTasks(FreshInstance, NotifyMixin, ConfigurationMixin):
                                 config.config_contents, root_password)
 
         if not self.db_info.task_status.is_error:
-            self.update_db(task_status=inst_models.InstanceTasks.NONE)
+            finish_task(self)
 
         # Make sure the service becomes active before sending a usage
         # record to avoid over billing a customer for an instance that
@@ -215,7 +228,11 @@ class FreshInstanceTasks(FreshInstance, NotifyMixin, ConfigurationMixin):
             raise TroveError("Service not active, status: %s" % status)
 
         c_id = self.db_info.compute_instance_id
-        nova_status = self.nova_client.servers.get(c_id).status
+        server = server_cache.get(c_id)
+        if server is None:
+            server = self.nova_client.servers.get(c_id)
+            server_cache.put(server)
+        nova_status = server.status
         if nova_status in [InstanceStatus.ERROR,
                            InstanceStatus.FAILED]:
             raise TroveError("Server not active, status: %s" % nova_status)
@@ -346,7 +363,7 @@ class FreshInstanceTasks(FreshInstance, NotifyMixin, ConfigurationMixin):
         LOG.error(message)
         LOG.error(exc)
         LOG.error(traceback.format_exc())
-        self.update_db(task_status=task_status)
+        finish_task(self, task_status)
         raise TroveError(message=message)
 
     def _create_volume(self, volume_size):
@@ -589,7 +606,7 @@ class BuiltInstanceTasks(BuiltInstance, NotifyMixin, ConfigurationMixin):
                       "attached volume filesystem for volume: %s"
                       % self.volume_id)
         finally:
-            self.update_db(task_status=inst_models.InstanceTasks.NONE)
+            finish_task(self)
 
     def resize_volume(self, new_size):
         old_volume_size = self.volume_size
@@ -648,7 +665,7 @@ class BuiltInstanceTasks(BuiltInstance, NotifyMixin, ConfigurationMixin):
             LOG.error("Failed to reboot instance %s: %s" % (self.id, str(e)))
         finally:
             LOG.debug("Rebooting FINALLY  %s" % self.id)
-            self.update_db(task_status=inst_models.InstanceTasks.NONE)
+            finish_task(self)
 
     def restart(self):
         LOG.debug("Restarting MySQL on instance %s " % self.id)
@@ -659,7 +676,7 @@ class BuiltInstanceTasks(BuiltInstance, NotifyMixin, ConfigurationMixin):
             LOG.error("Failure to restart MySQL for instance %s." % self.id)
         finally:
             LOG.debug("Restarting FINALLY  %s " % self.id)
-            self.update_db(task_status=inst_models.InstanceTasks.NONE)
+            finish_task(self)
 
     def _refresh_compute_server_info(self):
         """Refreshes the compute server field."""
@@ -795,7 +812,7 @@ class ResizeActionBase(ConfigurationMixin):
             self.instance.guest.stop_db(do_not_start_on_reboot=True)
             self._perform_nova_action()
         finally:
-            self.instance.update_db(task_status=inst_models.InstanceTasks.NONE)
+            finish_task(self.instance)
 
     def _guest_is_awake(self):
         self.instance._refresh_compute_service_status()
@@ -226,6 +226,8 @@ class FakeGuest(object):
             else:
                 status.status = rd_instance.ServiceStatuses.RUNNING
             status.save()
+            InstanceServiceStatus.save_volume_used(
+                self.id, self.get_volume_info()['used'])
             AgentHeartBeat.create(instance_id=self.id)
         eventlet.spawn_after(1.0, update_db)
 
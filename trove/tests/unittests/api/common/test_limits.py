@@ -18,13 +18,16 @@ Tests dealing with HTTP rate-limiting.
 """
 
 import httplib
+import os
+import socket
 import StringIO
 from xml.dom import minidom
 from trove.quota.models import Quota
 import testtools
 import webob
 
-from mockito import when, mock, any
+from mockito import when, mock, any, verify
+from trove.common import cfg
 from trove.common import limits
 from trove.common.limits import Limit
 from trove.limits import views
@@ -32,6 +35,8 @@ from trove.limits.service import LimitsController
 from trove.openstack.common import jsonutils
 from trove.quota.quota import QUOTAS
 
+CONF = cfg.CONF
+
 TEST_LIMITS = [
     Limit("GET", "/delayed", "^/delayed", 1, limits.PER_MINUTE),
     Limit("POST", "*", ".*", 7, limits.PER_MINUTE),
@@ -458,7 +463,34 @@ class LimiterTest(BaseLimitTestSuite):
 
     def test_user_limit(self):
         # Test user-specific limits.
-        self.assertEqual(self.limiter.levels['user3'], [])
+        self.assertEqual([], self.limiter.get_limits('user3'))
+
+    def test_get_limits_after_requests(self):
+        list(self._check(5, "PUT", "/anything", "user1"))
+
+        shown = dict((limit['verb'], limit)
+                     for limit in self.limiter.get_limits('user1'))
+        self.assertEqual(5, shown['PUT']['remaining'])
+        self.assertEqual(7, shown['POST']['remaining'])
+        self.assertEqual(10, self.limiter.get_limits('user2')[2]['remaining'])
+
+    def test_unmatched_request_keeps_no_state(self):
+        self.limiter.check_for_delay("GET", "/anything", "user1")
+        self.assertEqual(0, len(self.limiter._states))
+
+    def test_least_recently_seen_user_evicted(self):
+        self.limiter.max_users = 2
+        list(self._check(10, "PUT", "/anything", "user1"))
+        list(self._check(10, "PUT", "/anything", "user2"))
+        list(self._check(1, "PUT", "/anything", "user1"))
+        list(self._check(1, "PUT", "/anything", "user4"))
+
+        self.assertEqual(['user1', 'user4'], list(self.limiter._states))
+        # user1 is still limited, user2 starts over with a full bucket.
+        self.assertEqual([6.0], list(self._check(1, "PUT", "/anything",
+                                                 "user1")))
+        self.assertEqual([None], list(self._check(1, "PUT", "/anything",
+                                                  "user2")))
 
     def test_multiple_users(self):
         # Tests involving multiple users.
@@ -492,6 +524,56 @@ class LimiterTest(BaseLimitTestSuite):
         self.assertEqual(expected, results)
 
 
+class SharedLimiterTest(LimiterTest):
+    """
+    Tests for the `limits.SharedLimiter` class.
+    """
+
+    def setUp(self):
+        super(SharedLimiterTest, self).setUp()
+        self.limiter = limits.SharedLimiter(TEST_LIMITS, **{'user:user3': ''})
+
+    def test_unmatched_request_keeps_no_state(self):
+        self.limiter.check_for_delay("GET", "/anything", "user1")
+        self.assertEqual(0, sum(self.limiter._keys))
+
+    def test_least_recently_seen_user_evicted(self):
+        CONF.set_override('rate_limit_max_users', 2)
+        self.addCleanup(CONF.clear_override, 'rate_limit_max_users')
+        self.limiter = limits.SharedLimiter(TEST_LIMITS)
+        list(self._check(10, "PUT", "/anything", "user1"))
+        self.update_limits(1.0)
+        list(self._check(10, "PUT", "/anything", "user2"))
+        self.update_limits(2.0)
+        list(self._check(1, "PUT", "/anything", "user1"))
+        self.update_limits(3.0)
+        list(self._check(1, "PUT", "/anything", "user4"))
+
+        # user1 is still limited, user2 starts over with a full bucket.
+        self.assertEqual([3.0], list(self._check(1, "PUT", "/anything",
+                                                 "user1")))
+        self.assertEqual([None], list(self._check(1, "PUT", "/anything",
+                                                  "user2")))
+
+    def test_state_shared_with_forked_process(self):
+        pid = os.fork()
+        if not pid:
+            # The child always exits, so it never returns into the runner.
+            status = 1
+            try:
+                results = list(self._check(10, "PUT", "/anything", "user1"))
+                if results == [None] * 10:
+                    status = 0
+            finally:
+                os._exit(status)
+        self.assertEqual((pid, 0), os.waitpid(pid, 0))
+
+        self.assertEqual([6.0], list(self._check(1, "PUT", "/anything",
+                                                 "user1")))
+        self.assertEqual([None], list(self._check(1, "PUT", "/anything",
+                                                  "user2")))
+
+
 class WsgiLimiterTest(BaseLimitTestSuite):
     """
     Tests for `limits.WsgiLimiter` class.
@@ -685,6 +767,17 @@ class WsgiLimiterProxyTest(BaseLimitTestSuite):
         self.assertEqual(error, "403 Forbidden\n\nOnly 1 GET request(s) can be"
                                 " made to /delayed every minute.")
 
+    def test_stale_connection_replaced(self):
+        stale = mock()
+        when(stale).request(any(), any(), any(), any()).thenRaise(
+            socket.error())
+        self.proxy._connections.append(stale)
+
+        delay = self.proxy.check_for_delay("GET", "/anything")
+        self.assertEqual(delay, (None, None))
+        verify(stale).close()
+        self.assertEqual([], self.proxy._connections)
+
     def tearDown(self):
         # restore original HTTPConnection object
         httplib.HTTPConnection = self.oldHTTPConnection
@@ -172,6 +172,19 @@ class BackupORMTest(testtools.TestCase):
         not_running = models.Backup.running(instance_id='non-existent')
         self.assertFalse(not_running)
 
+    def test_running_instance_ids(self):
+        running = models.Backup.running_instance_ids([self.instance_id,
+                                                      'non-existent'])
+        self.assertEqual(set([self.instance_id]), running)
+
+    def test_running_instance_ids_empty(self):
+        self.assertEqual(set(), models.Backup.running_instance_ids([]))
+
+    def test_last_updated(self):
+        self.assertEqual(self.backup.updated,
+                         models.Backup.last_updated(self.instance_id))
+        self.assertEqual(None, models.Backup.last_updated('non-existent'))
+
     def test_running_exclude(self):
         not_running = models.Backup.running(instance_id=self.instance_id,
                                             exclude=self.backup.id)
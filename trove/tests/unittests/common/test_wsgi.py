@@ -0,0 +1,116 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import webob
+from testtools import TestCase
+
+from trove.common import wsgi
+from trove.instance.service import InstanceController
+
+
+class ConditionalRequestTest(TestCase):
+
+    def setUp(self):
+        super(ConditionalRequestTest, self).setUp()
+        self.etag = wsgi.compute_etag('instance-1',
+                                      datetime.datetime(2013, 10, 1))
+
+    def _request(self, if_none_match=None):
+        req = webob.Request.blank('/instances/instance-1')
+        if if_none_match:
+            req.headers['If-None-Match'] = if_none_match
+        return req
+
+    def test_etag_depends_on_parts(self):
+        self.assertEqual(self.etag, wsgi.compute_etag(
+            'instance-1', datetime.datetime(2013, 10, 1)))
+        self.assertNotEqual(self.etag, wsgi.compute_etag(
+            'instance-1', datetime.datetime(2013, 10, 2)))
+
+    def test_not_modified(self):
+        req = self._request('"%s"' % self.etag)
+        result = wsgi.not_modified(req, self.etag, {'X-Other': 'value'})
+        self.assertEqual(304, result.status)
+        self.assertEqual({'ETag': '"%s"' % self.etag, 'X-Other': 'value'},
+                         result.headers)
+
+    def test_modified(self):
+        self.assertEqual(None, wsgi.not_modified(self._request('"other"'),
+                                                 self.etag))
+        self.assertEqual(None, wsgi.not_modified(self._request(), self.etag))
+
+    def test_serialized_headers(self):
+        response = webob.Response()
+        result = wsgi.Result(None, 304, headers=wsgi.etag_headers(self.etag))
+        wsgi.TroveResponseSerializer().serialize_headers(response, result,
+                                                         'show')
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('"%s"' % self.etag, response.headers['ETag'])
+
+
+class FakeController(wsgi.Controller):
+    schemas = {'create': {'type': 'object',
+                          'properties': {'fake': {'type': 'integer'}}}}
+
+    def __init__(self):
+        self.validated = []
+
+    def validate_request(self, action, action_args):
+        self.validated.append(action)
+        super(FakeController, self).validate_request(action, action_args)
+
+    def show(self, req):
+        return wsgi.Result(None, 200)
+
+    def create(self, req, body):
+        return wsgi.Result(None, 202)
+
+
+class ValidationTest(TestCase):
+
+    def setUp(self):
+        super(ValidationTest, self).setUp()
+        self.controller = FakeController()
+        self.resource = self.controller.create_resource()
+
+    def _execute(self, method, action, **action_args):
+        request = webob.Request.blank('/fake', method=method)
+        return self.resource.execute_action(action, request, **action_args)
+
+    def test_validator_reused(self):
+        validator = self.controller.get_validator('create', {})
+        self.assertTrue(validator is
+                        FakeController.get_validator('create', {}))
+        self.assertEqual(None, self.controller.get_validator('show', {}))
+
+    def test_validator_per_sub_action(self):
+        resize = {'resize': {'flavorRef': 'https://localhost/flavors/1'}}
+        restart = {'restart': {}}
+        validator = InstanceController.get_validator('action', resize)
+        self.assertTrue(validator is
+                        InstanceController.get_validator('action', resize))
+        self.assertFalse(validator is
+                         InstanceController.get_validator('action', restart))
+
+    def test_invalid_body_refused(self):
+        result = self._execute('POST', 'create', body={'fake': 'one'})
+        self.assertEqual(400, result.wrapped_exc.status_int)
+        self.assertEqual(202, self._execute('POST', 'create',
+                                            body={'fake': 1}).status)
+
+    def test_get_not_validated(self):
+        self.assertEqual(200, self._execute('GET', 'show').status)
+        self.assertEqual([], self.controller.validated)
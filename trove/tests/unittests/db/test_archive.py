@@ -0,0 +1,119 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from testtools import TestCase
+
+from trove.common import utils
+from trove.db import get_db_api
+from trove.db.sqlalchemy import archive
+from trove.db.sqlalchemy import session
+from trove.db.sqlalchemy import tables
+from trove.tests.unittests.util import util
+
+TENANT = 'archive-tenant'
+
+
+class ArchiveDeletedRowsTest(TestCase):
+
+    def setUp(self):
+        super(ArchiveDeletedRowsTest, self).setUp()
+        util.init_db()
+        self.now = utils.utcnow()
+        self.old = self.now - datetime.timedelta(days=100)
+        self.ids = [utils.generate_uuid() for _ in range(5)]
+        # Three instances deleted long ago, one deleted recently and one
+        # still running.
+        deleted_at = [self.old, self.old, self.old, self.now, None]
+        self._insert(tables.instances, [
+            {'id': id, 'name': 'instance', 'hostname': id + '.example',
+             'tenant_id': TENANT, 'task_id': 1, 'deleted': at is not None,
+             'deleted_at': at, 'created': self.old, 'updated': self.old}
+            for id, at in zip(self.ids, deleted_at)])
+        self._insert(tables.service_statuses, [
+            {'id': utils.generate_uuid(), 'instance_id': id, 'status_id': 1,
+             'status_description': 'shutdown'} for id in self.ids])
+        self._insert(tables.agent_heartbeats, [
+            {'id': utils.generate_uuid(), 'instance_id': id,
+             'updated_at': self.old} for id in self.ids])
+        self._insert(tables.dns_records, [
+            {'name': id + '.example', 'record_id': id} for id in self.ids])
+        self._insert(tables.backups, [
+            {'id': utils.generate_uuid(), 'name': 'backup', 'state': 'NEW',
+             'instance_id': id, 'tenant_id': TENANT, 'deleted': True,
+             'deleted_at': self.old} for id in self.ids[:2]])
+
+    def _of_test(self, table):
+        """Returns the condition matching the rows this test inserted."""
+        if table.name.endswith('dns_records'):
+            column = table.c.record_id
+        else:
+            column = table.c.get('instance_id', table.c.get('id'))
+        return column.in_(self.ids)
+
+    def _insert(self, table, rows):
+        session._ENGINE.execute(table.insert(), rows)
+        shadow = tables.meta.tables['shadow_' + table.name]
+        for target in (table, shadow):
+            self.addCleanup(session._ENGINE.execute,
+                            target.delete().where(self._of_test(target)))
+
+    def _count(self, table):
+        query = table.select().where(self._of_test(table))
+        return len(session._ENGINE.execute(query).fetchall())
+
+    def _archive(self, batch_size=2, max_rows=None):
+        return get_db_api().archive_deleted_rows(
+            self.now - datetime.timedelta(days=90), batch_size, max_rows)
+
+    def test_archives_old_rows_and_dependents(self):
+        archived = self._archive()
+        for table in (tables.instances, tables.service_statuses,
+                      tables.agent_heartbeats, tables.dns_records):
+            self.assertEqual(2, self._count(table), table.name)
+            shadow = tables.meta.tables['shadow_' + table.name]
+            self.assertEqual(3, self._count(shadow), table.name)
+            self.assertEqual(3, archived[table.name])
+        self.assertEqual(0, self._count(tables.backups))
+        self.assertEqual(2, self._count(tables.shadow_backups))
+
+    def test_keeps_shadow_columns(self):
+        self._archive()
+        query = tables.shadow_instances.select().where(
+            tables.shadow_instances.c.id == self.ids[0])
+        row = session._ENGINE.execute(query).fetchone()
+        self.assertEqual(self.ids[0] + '.example', row['hostname'])
+        self.assertEqual(self.old, row['deleted_at'])
+
+    def test_max_rows(self):
+        archived = self._archive(max_rows=2)
+        self.assertEqual(2, archived['instances'])
+        self.assertEqual(0, archived['backups'])
+        self.assertEqual(2, archived['service_statuses'])
+
+    def test_batches(self):
+        with util.QueryCounter() as counter:
+            self._archive(batch_size=1)
+        # Each instance is moved by its own batch.
+        inserts = [statement for statement in counter.statements
+                   if statement.startswith('INSERT INTO shadow_instances')]
+        self.assertEqual(3, len(inserts))
+
+    def test_tables_have_shadows(self):
+        for table, dependents in archive.ARCHIVED:
+            self.assertTrue('shadow_' + table.name in tables.meta.tables)
+            for dependent, _column, _parent_column in dependents:
+                self.assertTrue('shadow_' + dependent.name
+                                in tables.meta.tables)
@@ -0,0 +1,194 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from testtools import TestCase
+
+from trove.common import cfg
+from trove.db import cache
+from trove.db import get_db_api
+from trove.db.sqlalchemy import session
+from trove.db.sqlalchemy import tables
+from trove.extensions.mysql.models import RootHistory
+from trove.instance.models import DBInstance
+from trove.instance.models import ServiceImage
+from trove.openstack.common import timeutils
+from trove.tests.unittests.util import util
+
+CONF = cfg.CONF
+
+
+class ModelCacheTest(TestCase):
+
+    def setUp(self):
+        super(ModelCacheTest, self).setUp()
+        timeutils.set_time_override(datetime.datetime(2013, 10, 1))
+        self.cache = cache.ModelCache('Model', ttl=60, max_size=2)
+
+    def tearDown(self):
+        super(ModelCacheTest, self).tearDown()
+        timeutils.clear_time_override()
+
+    def test_put_and_get(self):
+        self.cache.put('key', 'model')
+        self.assertEqual('model', self.cache.get('key'))
+        self.assertTrue(self.cache.get('other') is cache._MISSING)
+        data = self.cache.data()
+        self.assertEqual(1, data['hits'])
+        self.assertEqual(1, data['misses'])
+
+    def test_caches_none(self):
+        self.cache.put('key', None)
+        self.assertEqual(None, self.cache.get('key'))
+
+    def test_expired(self):
+        self.cache.put('key', 'model')
+        timeutils.advance_time_seconds(61)
+        self.assertTrue(self.cache.get('key') is cache._MISSING)
+        self.assertEqual(0, len(self.cache))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('key-1', 'model-1')
+        self.cache.put('key-2', 'model-2')
+        self.cache.get('key-1')
+        self.cache.put('key-3', 'model-3')
+        self.assertEqual(2, len(self.cache))
+        self.assertTrue(self.cache.get('key-2') is cache._MISSING)
+        self.assertEqual('model-1', self.cache.get('key-1'))
+
+    def test_clear(self):
+        self.cache.put('key', 'model')
+        self.cache.clear()
+        self.assertTrue(self.cache.get('key') is cache._MISSING)
+        self.assertEqual(1, self.cache.data()['invalidations'])
+
+
+class CachedModelTest(TestCase):
+
+    def setUp(self):
+        super(CachedModelTest, self).setUp()
+        util.init_db()
+        timeutils.set_time_override(datetime.datetime(2013, 10, 1))
+        self.orig_model_cache = CONF.model_cache
+        self.orig_interval = CONF.model_cache_generation_interval
+        CONF.model_cache = True
+        CONF.model_cache_generation_interval = 5
+        cache.reset()
+        self.image = ServiceImage.create(service_name='mysql',
+                                         image_id='image-1')
+
+    def tearDown(self):
+        super(CachedModelTest, self).tearDown()
+        self.image.delete()
+        CONF.model_cache = self.orig_model_cache
+        CONF.model_cache_generation_interval = self.orig_interval
+        cache.reset()
+        timeutils.clear_time_override()
+
+    def _stats(self):
+        return dict((data['name'], data) for data in cache.stats())
+
+    def test_hit_issues_no_statements(self):
+        ServiceImage.find_by(service_name='mysql')
+        with util.QueryCounter() as counter:
+            image = ServiceImage.find_by(service_name='mysql')
+        self.assertEqual('image-1', image.image_id)
+        self.assertEqual(0, counter.count)
+        stats = self._stats()['ServiceImage']
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+    def test_hits_are_new_models(self):
+        ServiceImage.find_by(service_name='mysql')
+        image = ServiceImage.find_by(service_name='mysql')
+        image.image_id = 'unsaved'
+        found = ServiceImage.find_by(service_name='mysql')
+        self.assertFalse(found is image)
+        self.assertEqual('image-1', found.image_id)
+
+    def test_save_hit(self):
+        ServiceImage.find_by(service_name='mysql')
+        image = ServiceImage.find_by(service_name='mysql')
+        image.image_id = 'image-2'
+        image.save()
+        self.assertEqual('image-2',
+                         ServiceImage.find_by(service_name='mysql').image_id)
+        self.assertEqual('image-2', session._ENGINE.execute(
+            tables.service_images.select().where(
+                tables.service_images.c.id == self.image.id)).first().image_id)
+
+    def test_disabled(self):
+        CONF.model_cache = False
+        ServiceImage.find_by(service_name='mysql')
+        with util.QueryCounter() as counter:
+            ServiceImage.find_by(service_name='mysql')
+        self.assertEqual(1, counter.count)
+        self.assertEqual([], cache.stats())
+
+    def test_models_not_cacheable(self):
+        DBInstance.get_by(id='missing')
+        with util.QueryCounter() as counter:
+            DBInstance.get_by(id='missing')
+        self.assertEqual(1, counter.count)
+
+    def test_save_invalidates(self):
+        ServiceImage.find_by(service_name='mysql')
+        self.image.image_id = 'image-2'
+        self.image.save()
+        self.assertEqual('image-2',
+                         ServiceImage.find_by(service_name='mysql').image_id)
+
+    def test_create_invalidates_missing(self):
+        self.assertEqual(None, ServiceImage.get_by(service_name='redis'))
+        image = ServiceImage.create(service_name='redis', image_id='image-3')
+        try:
+            found = ServiceImage.get_by(service_name='redis')
+            self.assertEqual('image-3', found.image_id)
+        finally:
+            image.delete()
+
+    def _write_by_other_process(self, image_id):
+        """Updates the image the way another process would, leaving the
+        caches of this one alone but bumping the generation.
+        """
+        table = tables.service_images
+        session._ENGINE.execute(table.update()
+                                .where(table.c.id == self.image.id)
+                                .values(image_id=image_id))
+        get_db_api().bump_generation('ServiceImage')
+
+    def test_write_by_other_process(self):
+        ServiceImage.find_by(service_name='mysql')
+        self._write_by_other_process('image-2')
+        cached = self._stats()['ServiceImage']['invalidations']
+        # The generations are checked again only after the interval.
+        self.assertEqual('image-1',
+                         ServiceImage.find_by(service_name='mysql').image_id)
+        timeutils.advance_time_seconds(6)
+        self.assertEqual('image-2',
+                         ServiceImage.find_by(service_name='mysql').image_id)
+        self.assertEqual(cached + 1,
+                         self._stats()['ServiceImage']['invalidations'])
+
+    def test_root_history(self):
+        self.assertEqual(None, RootHistory.load(None, 'instance-1'))
+        with util.QueryCounter() as counter:
+            self.assertEqual(None, RootHistory.load(None, 'instance-1'))
+        self.assertEqual(0, counter.count)
+        history = tables.root_enabled_history
+        self.addCleanup(session._ENGINE.execute, history.delete().where(
+            history.c.id == 'instance-1'))
+        RootHistory.create(None, 'instance-1', 'user')
+        self.assertEqual('user', RootHistory.load(None, 'instance-1').user)
@@ -0,0 +1,231 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import attributes
+from sqlalchemy.sql import expression
+from testtools import TestCase
+
+from trove.backup.models import BackupState
+from trove.backup.models import DBBackup
+from trove.common import cfg
+from trove.common import exception
+from trove.common import utils
+from trove.db.memory import api
+from trove.db.sqlalchemy import quotas
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceTasks
+from trove.quota.models import QuotaUsage
+from trove.quota.models import Reservation
+
+CONF = cfg.CONF
+
+
+class MemoryApiTest(TestCase):
+
+    def setUp(self):
+        super(MemoryApiTest, self).setUp()
+        api.configure_db(CONF)
+        api.clean_db()
+        self.addCleanup(api.clean_db)
+        self.now = utils.utcnow()
+
+    def _instance(self, name, tenant_id='tenant', **values):
+        values.setdefault('created', self.now)
+        instance = DBInstance(InstanceTasks.NONE, id=utils.generate_uuid(),
+                              name=name, tenant_id=tenant_id, **values)
+        return api.save(instance)
+
+    def test_save_and_find_by(self):
+        saved = self._instance('one')
+        found = api.find_by(DBInstance, id=saved.id)
+        self.assertEqual('one', found.name)
+        self.assertFalse(found is saved)
+        found.name = 'changed'
+        self.assertEqual('one', api.find_by(DBInstance, id=saved.id).name)
+        self.assertEqual(None, api.find_by(DBInstance, id='missing'))
+
+    def test_found_rows_are_unchanged(self):
+        saved = self._instance('one')
+        found = api.find_by(DBInstance, id=saved.id)
+        found.name = 'one'
+        self.assertFalse(attributes.get_history(found, 'name').has_changes())
+
+    def test_find_all(self):
+        self._instance('one')
+        self._instance('two')
+        self._instance('three', tenant_id='other')
+        query = api.find_all(DBInstance, tenant_id='tenant')
+        self.assertEqual(2, api.count(api.find_all, DBInstance,
+                                      tenant_id='tenant'))
+        self.assertEqual(['one', 'two'],
+                         sorted(instance.name for instance in query.all()))
+
+    def test_delete(self):
+        instance = self._instance('one')
+        api.delete(instance)
+        self.assertEqual(None, api.find_by(DBInstance, id=instance.id))
+
+    def test_unique_constraint(self):
+        api.save(QuotaUsage(id='usage-1', tenant_id='tenant',
+                            resource='instances', in_use=0, reserved=0))
+        self.assertRaises(exception.DBConstraintError, api.save,
+                          QuotaUsage(id='usage-2', tenant_id='tenant',
+                                     resource='instances', in_use=0,
+                                     reserved=0))
+
+    def test_filter_expressions(self):
+        old = self.now - datetime.timedelta(hours=1)
+        one = self._instance('one', compute_instance_id='server',
+                             server_updated=old)
+        two = self._instance('two', compute_instance_id='server')
+        self._instance('three', compute_instance_id='server',
+                       server_updated=self.now)
+        query = api._base_query(DBInstance).filter(
+            DBInstance.compute_instance_id == 'server',
+            expression.or_(DBInstance.server_updated == expression.null(),
+                           DBInstance.server_updated <= old))
+        self.assertEqual(2, query.update({'server_status': 'ACTIVE'}))
+        ids = api._read_query(DBInstance).filter(
+            DBInstance.server_status.in_(['ACTIVE'])).all()
+        self.assertEqual(sorted([one.id, two.id]),
+                         sorted(instance.id for instance in ids))
+
+    def test_entities(self):
+        for instance_id, updated in (('instance-1', self.now),
+                                     ('instance-1', self.now),
+                                     ('instance-2', None)):
+            api.save(DBBackup(id=utils.generate_uuid(), name='backup',
+                              state='NEW', instance_id=instance_id,
+                              updated=updated, deleted=False))
+        query = api._read_query(DBBackup).with_entities(
+            DBBackup.instance_id).distinct()
+        self.assertEqual(['instance-1', 'instance-2'],
+                         sorted(row.instance_id for row in query.all()))
+        query = api._read_query(DBBackup).filter(
+            DBBackup.instance_id == 'instance-2')
+        self.assertEqual(
+            None, query.with_entities(func.max(DBBackup.updated)).scalar())
+
+    def test_find_all_by_limit(self):
+        for name in ('c', 'a', 'b', 'd'):
+            self._instance(name)
+        first = api.find_all_by_limit(api.find_all, DBInstance,
+                                      {'tenant_id': 'tenant'}, limit=2,
+                                      sort_keys=['name'])
+        self.assertEqual(['a', 'b'], [instance.name for instance in first])
+        rest = api.find_all_by_limit(api.find_all, DBInstance,
+                                     {'tenant_id': 'tenant'}, limit=2,
+                                     marker=first[-1].id, sort_keys=['name'])
+        self.assertEqual(['c', 'd'], [instance.name for instance in rest])
+        descending = api.find_all_by_limit(api.find_all, DBInstance,
+                                           {'tenant_id': 'tenant'}, limit=10,
+                                           marker=rest[0].id,
+                                           sort_keys=['name'],
+                                           sort_dir='desc')
+        self.assertEqual(['b', 'a'],
+                         [instance.name for instance in descending])
+        self.assertRaises(exception.MarkerNotFound, api.find_all_by_limit,
+                          api.find_all, DBInstance, {}, limit=2,
+                          marker='missing', sort_keys=['name'])
+
+    def test_update_all_and_delete_all(self):
+        self._instance('one')
+        self._instance('two', tenant_id='other')
+        api.update_all(api.find_all, DBInstance, {'tenant_id': 'tenant'},
+                       {'name': 'renamed'})
+        self.assertEqual('renamed',
+                         api.find_by(DBInstance, tenant_id='tenant').name)
+        api.delete_all(api.find_all, DBInstance, tenant_id='other')
+        self.assertEqual(1, api.count(api.find_all, DBInstance))
+
+    def test_compare_and_set(self):
+        instance = self._instance('one')
+        self.assertTrue(api.compare_and_set(DBInstance,
+                                            {'id': instance.id, 'task_id': 1},
+                                            {'task_id': 2}))
+        self.assertFalse(api.compare_and_set(DBInstance,
+                                             {'id': instance.id,
+                                              'task_id': 1},
+                                             {'task_id': 3}))
+        self.assertEqual(2, api.find_by(DBInstance, id=instance.id).task_id)
+
+    def test_concurrent_saves(self):
+        def save_instances():
+            for _ in range(50):
+                self._instance('concurrent')
+
+        threads = [threading.Thread(target=save_instances)
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(200, api.count(api.find_all, DBInstance,
+                                        name='concurrent'))
+
+    def test_archive_deleted_rows(self):
+        old = self.now - datetime.timedelta(days=100)
+        deleted = self._instance('old')
+        deleted.deleted = True
+        deleted.deleted_at = old
+        api.save(deleted)
+        kept = self._instance('kept')
+        archived = api.archive_deleted_rows(
+            self.now - datetime.timedelta(days=90), batch_size=10)
+        self.assertEqual(1, archived['instances'])
+        self.assertEqual([kept.id], [instance.id for instance
+                                     in api.find_all(DBInstance).all()])
+
+    def test_quota_reserve(self):
+        reserved = api.quota_reserve('tenant', {'instances': 2},
+                                     {'instances': 3})
+        self.assertRaises(exception.QuotaExceeded, api.quota_reserve,
+                          'tenant', {'instances': 2}, {'instances': 3})
+        ids = [reservation['id'] for reservation in reserved]
+        self.assertEqual(ids, api.reservation_commit(ids))
+        self.assertEqual([], api.reservation_rollback(ids))
+        usage = api.find_by(QuotaUsage, tenant_id='tenant')
+        self.assertEqual((2, 0), (usage.in_use, usage.reserved))
+
+    def test_quota_usage_resync(self):
+        self._instance('one', volume_size=2)
+        reserved = api.quota_reserve('tenant', {'instances': 3},
+                                     {'instances': 5})
+        resynced = api.quota_usage_resync(
+            ['instances', 'volumes'], self.now + datetime.timedelta(hours=1),
+            batch_size=10)
+        self.assertEqual({'expired': 1, 'corrected': 1, 'added': 1},
+                         resynced)
+        self.assertEqual(quotas.ROLLED_BACK, api.find_by(
+            Reservation, id=reserved[0]['id']).status)
+        usage = api.find_by(QuotaUsage, tenant_id='tenant',
+                            resource='instances')
+        self.assertEqual((1, 0), (usage.in_use, usage.reserved))
+        usage = api.find_by(QuotaUsage, tenant_id='tenant',
+                            resource='volumes')
+        self.assertEqual((2, 0), (usage.in_use, usage.reserved))
+
+    def test_quota_usage_resync_leaves_out_backups_deletion_failed(self):
+        for state in (BackupState.COMPLETED, BackupState.DELETE_FAILED):
+            api.save(DBBackup(id=utils.generate_uuid(), name='backup',
+                              state=state, tenant_id='tenant',
+                              deleted=False))
+        api.quota_usage_resync(['backups'], self.now, batch_size=10)
+        usage = api.find_by(QuotaUsage, tenant_id='tenant',
+                            resource='backups')
+        self.assertEqual((1, 0), (usage.in_use, usage.reserved))
@@ -0,0 +1,71 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlite3
+
+from sqlalchemy import create_engine
+from sqlalchemy import exc
+from testtools import TestCase
+
+from trove.db.sqlalchemy import metrics
+
+
+class PoolMetricsTest(TestCase):
+
+    def setUp(self):
+        super(PoolMetricsTest, self).setUp()
+        self.metrics = metrics.PoolMetrics('test')
+        self.connections = []
+        self.engine = create_engine(
+            'sqlite://', creator=self._connect,
+            poolclass=metrics.instrumented_pool_class(self.metrics),
+            pool_size=1, max_overflow=0, pool_timeout=0.01)
+
+    def _connect(self):
+        connection = sqlite3.connect(':memory:')
+        self.connections.append(connection)
+        return connection
+
+    def test_checkouts(self):
+        self.metrics.listen(self.engine)
+        connection = self.engine.connect()
+        data = self.metrics.data()
+        self.assertEqual(1, data['checked_out'])
+        self.assertEqual(1, data['size'])
+        self.assertEqual(1, data['wait']['count'])
+        connection.close()
+        self.engine.connect().close()
+        data = self.metrics.data()
+        self.assertEqual(0, data['checked_out'])
+        self.assertEqual(2, data['checkouts'])
+        self.assertEqual(1, data['connections'])
+        self.assertEqual(2, sum(bucket['count']
+                                for bucket in data['wait']['buckets']))
+
+    def test_timeout(self):
+        self.metrics.listen(self.engine)
+        connection = self.engine.connect()
+        self.assertRaises(exc.TimeoutError, self.engine.connect)
+        connection.close()
+        self.assertEqual(1, self.metrics.data()['timeouts'])
+        self.assertEqual(2, self.metrics.data()['wait']['count'])
+
+    def test_ping_replaces_dead_connections(self):
+        metrics.ping_on_checkout(self.engine, self.metrics)
+        self.metrics.listen(self.engine)
+        self.engine.connect().close()
+        self.connections[0].close()
+        self.engine.connect().close()
+        self.assertEqual(2, len(self.connections))
+        self.assertEqual(1, self.metrics.data()['connection_errors'])
@@ -0,0 +1,127 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+
+from testtools import TestCase
+
+from trove.backup.models import Backup
+from trove.common import utils
+from trove.db.sqlalchemy import session
+from trove.db.sqlalchemy import tables
+from trove.extensions.security_group.models import \
+    SecurityGroupInstanceAssociation
+from trove.guestagent.models import AgentHeartBeat
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.quota.models import QuotaUsage
+from trove.tests.unittests.util import util
+
+TENANT = 'query-plan-tenant'
+ROWS = 50
+
+
+class QueryPlanTest(TestCase):
+    """Checks with EXPLAIN that the hot lookups don't scan their table."""
+
+    def setUp(self):
+        super(QueryPlanTest, self).setUp()
+        util.init_db()
+        now = utils.utcnow()
+        self.ids = [utils.generate_uuid() for _ in range(ROWS)]
+        self.server_ids = [utils.generate_uuid() for _ in range(ROWS)]
+        self.group_ids = [utils.generate_uuid() for _ in range(ROWS)]
+        self._insert(tables.instances, [
+            {'id': id, 'name': 'instance', 'tenant_id': TENANT,
+             'compute_instance_id': server_id, 'task_id': 1,
+             'deleted': False, 'created': now, 'updated': now}
+            for id, server_id in zip(self.ids, self.server_ids)])
+        self._insert(tables.service_statuses, [
+            {'id': utils.generate_uuid(), 'instance_id': id, 'status_id': 1,
+             'status_description': 'running'} for id in self.ids])
+        self._insert(tables.agent_heartbeats, [
+            {'id': utils.generate_uuid(), 'instance_id': id,
+             'updated_at': now} for id in self.ids])
+        self._insert(tables.backups, [
+            {'id': utils.generate_uuid(), 'name': 'backup', 'state': 'NEW',
+             'instance_id': id, 'tenant_id': TENANT, 'deleted': False}
+            for id in self.ids])
+        self._insert(tables.quota_usages, [
+            {'id': utils.generate_uuid(), 'tenant_id': TENANT + str(index),
+             'resource': 'instances', 'in_use': 1, 'reserved': 0}
+            for index in range(ROWS)])
+        self._insert(tables.security_group_instance_associations, [
+            {'id': utils.generate_uuid(), 'security_group_id': group_id,
+             'instance_id': id, 'deleted': False}
+            for id, group_id in zip(self.ids, self.group_ids)])
+
+    def _insert(self, table, rows):
+        session._ENGINE.execute(table.insert(), rows)
+        if 'instance_id' in table.c:
+            column = table.c.instance_id
+            values = self.ids
+        else:
+            column = table.c.tenant_id
+            values = [row['tenant_id'] for row in rows]
+        self.addCleanup(session._ENGINE.execute,
+                        table.delete().where(column.in_(values)))
+
+    def _scans(self, statement, parameters):
+        """Returns the steps of the plan of statement scanning a table."""
+        with contextlib.closing(session._ENGINE.raw_connection()) as con:
+            cursor = con.cursor()
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            plan = [row[-1] for row in cursor.fetchall()]
+        return [step for step in plan if step.startswith('SCAN')]
+
+    def assertUsesIndexes(self, finder, *args, **kwargs):
+        with util.QueryCounter() as counter:
+            finder(*args, **kwargs)
+        self.assertTrue(counter.statements)
+        for statement, parameters in zip(counter.statements,
+                                         counter.parameters):
+            self.assertEqual([], self._scans(statement, parameters),
+                             statement)
+
+    def test_service_status(self):
+        self.assertUsesIndexes(InstanceServiceStatus.find_by,
+                               instance_id=self.ids[7])
+
+    def test_heartbeat(self):
+        self.assertUsesIndexes(AgentHeartBeat.find_by,
+                               instance_id=self.ids[7])
+
+    def test_running_backup(self):
+        self.assertUsesIndexes(Backup.running, self.ids[7])
+
+    def test_instance_by_server(self):
+        self.assertUsesIndexes(DBInstance.find_by,
+                               compute_instance_id=self.server_ids[7])
+
+    def test_server_state(self):
+        self.assertUsesIndexes(DBInstance.save_server_state,
+                               self.server_ids[7], 'ACTIVE', None,
+                               utils.utcnow())
+
+    def test_quota_usage(self):
+        self.assertUsesIndexes(
+            lambda: QuotaUsage.find_all(tenant_id=TENANT + '7',
+                                        resource='instances').all())
+
+    def test_security_group_association(self):
+        self.assertUsesIndexes(SecurityGroupInstanceAssociation.find_by,
+                               instance_id=self.ids[7], deleted=False)
+        self.assertUsesIndexes(SecurityGroupInstanceAssociation.find_by,
+                               security_group_id=self.group_ids[7],
+                               deleted=False)
@@ -0,0 +1,213 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import webob
+from sqlalchemy import event
+from testtools import TestCase
+
+from trove.common import cfg
+from trove.common import wsgi
+from trove.common.instance import ServiceStatuses
+from trove.common.rpc.service import SessionScopedManager
+from trove import db
+from trove.db.sqlalchemy import session
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.tasks import InstanceTasks
+from trove.tests.unittests.util import util
+
+CONF = cfg.CONF
+
+
+class ScopeTestCase(TestCase):
+
+    def setUp(self):
+        super(ScopeTestCase, self).setUp()
+        util.init_db()
+        self.db_info = DBInstance.create(name='instance',
+                                         flavor_id=1,
+                                         tenant_id='TENANT',
+                                         volume_size=1,
+                                         service_type='mysql',
+                                         task_status=InstanceTasks.NONE)
+        self.status = InstanceServiceStatus.create(
+            instance_id=self.db_info.id, status=ServiceStatuses.NEW)
+
+    def tearDown(self):
+        super(ScopeTestCase, self).tearDown()
+        self.status.delete()
+        self.db_info.delete()
+
+
+class SessionScopeTest(ScopeTestCase):
+
+    def _restart(self):
+        """Does the database calls of an instance restart request."""
+        db_info = DBInstance.find_by(id=self.db_info.id, deleted=False)
+        status = InstanceServiceStatus.find_by(instance_id=self.db_info.id)
+        db_info.task_status = InstanceTasks.REBOOTING
+        db_info.save()
+        status.set_status(ServiceStatuses.SHUTDOWN)
+        status.save()
+
+    def test_shares_session(self):
+        self.assertFalse(session.get_session() is session.get_session())
+        with db.session_scope():
+            self.assertTrue(session.get_session() is session.get_session())
+            with db.session_scope():
+                self.assertTrue(session.in_scope())
+        self.assertFalse(session.in_scope())
+
+    def test_fewer_statements(self):
+        with util.QueryCounter() as unscoped:
+            self._restart()
+        DBInstance.find_all(id=self.db_info.id).update(
+            task_id=InstanceTasks.NONE.code, api_status=None)
+        InstanceServiceStatus.find_all(id=self.status.id).update(
+            status_id=ServiceStatuses.NEW.code)
+        with util.QueryCounter() as scoped:
+            with db.session_scope():
+                self._restart()
+        # Saving the models loaded in the scope doesn't select them again.
+        self.assertEqual(unscoped.count - 2, scoped.count)
+        self.assertEqual(InstanceTasks.REBOOTING,
+                         DBInstance.find_by(id=self.db_info.id).task_status)
+        self.assertEqual(ServiceStatuses.SHUTDOWN,
+                         InstanceServiceStatus.find_by(
+                             instance_id=self.db_info.id).status)
+
+    def test_rows_read_again_are_refreshed(self):
+        with db.session_scope():
+            db_info = DBInstance.find_by(id=self.db_info.id)
+            DBInstance.find_all(id=self.db_info.id).update(name='renamed')
+            self.assertEqual('renamed',
+                             DBInstance.find_by(id=self.db_info.id).name)
+            self.assertEqual('renamed', db_info.name)
+
+    def test_changes_are_only_written_by_save(self):
+        with db.session_scope():
+            db_info = DBInstance.find_by(id=self.db_info.id)
+            db_info.name = 'unsaved'
+            InstanceServiceStatus.find_by(instance_id=db_info.id)
+        self.assertEqual('instance',
+                         DBInstance.find_by(id=self.db_info.id).name)
+
+    def test_saving_another_model_leaves_unsaved_changes(self):
+        with db.session_scope():
+            db_info = DBInstance.find_by(id=self.db_info.id)
+            db_info.server_status = 'FROM_NOVA_IN_MEMORY'
+            status = InstanceServiceStatus.find_by(instance_id=db_info.id)
+            status.status = ServiceStatuses.SHUTDOWN
+            status.save()
+        self.assertEqual(None,
+                         DBInstance.find_by(id=self.db_info.id).server_status)
+        self.assertEqual(ServiceStatuses.SHUTDOWN,
+                         InstanceServiceStatus.find_by(
+                             instance_id=self.db_info.id).status)
+
+    def test_unscoped(self):
+        with db.session_scope():
+            scoped = session.get_session()
+
+            @db.without_session_scope
+            def long_running():
+                with db.session_scope():
+                    self.assertFalse(session.in_scope())
+                    return session.get_session()
+
+            self.assertFalse(long_running() is scoped)
+            self.assertTrue(session.get_session() is scoped)
+
+    def test_middleware(self):
+        sessions = []
+
+        @webob.dec.wsgify
+        def app(req):
+            sessions.append(session.get_session())
+            sessions.append(session.get_session())
+            return webob.Response()
+
+        wsgi.SessionScopeMiddleware(app)(webob.Request.blank('/'))
+        self.assertTrue(sessions[0] is sessions[1])
+        self.assertFalse(session.in_scope())
+
+    def test_rpc_manager(self):
+        class Manager(object):
+            RPC_API_VERSION = '1.0'
+
+            def call(self, context):
+                return session.in_scope()
+
+        manager = SessionScopedManager(Manager())
+        self.assertEqual('1.0', manager.RPC_API_VERSION)
+        self.assertTrue(manager.call(None))
+
+
+class ReadReplicaTest(ScopeTestCase):
+
+    def setUp(self):
+        super(ReadReplicaTest, self).setUp()
+        self.replica_statements = []
+        engine = session._create_engine(
+            {'sql_connection': CONF.sql_connection})
+        event.listen(engine, 'before_cursor_execute', self._record)
+        self.addCleanup(setattr, session, '_READ_ENGINE', None)
+        self.addCleanup(setattr, session, '_READ_MAKER', None)
+        session._READ_ENGINE = engine
+
+    def _record(self, conn, cursor, statement, *args):
+        self.replica_statements.append(statement)
+
+    def _find(self):
+        with util.QueryCounter() as primary:
+            DBInstance.find_by(id=self.db_info.id)
+            InstanceServiceStatus.find_all(instance_id=self.db_info.id).all()
+        return primary.count
+
+    def test_reads(self):
+        with db.session_scope(replica_reads=True):
+            self.assertEqual(0, self._find())
+        self.assertEqual(2, len(self.replica_statements))
+
+    def test_reads_after_writes(self):
+        with db.session_scope(replica_reads=True):
+            db_info = DBInstance.find_by(id=self.db_info.id)
+            db_info.name = 'renamed'
+            db_info.save()
+            self.assertEqual(2, self._find())
+            self.assertEqual('renamed',
+                             DBInstance.find_by(id=self.db_info.id).name)
+
+    def test_reads_after_bulk_updates(self):
+        with db.session_scope(replica_reads=True):
+            DBInstance.find_all(id=self.db_info.id).update(name='renamed')
+            self.assertEqual(2, self._find())
+
+    def test_other_scopes_read_from_primary(self):
+        with db.session_scope():
+            self.assertEqual(2, self._find())
+        self.assertEqual(2, self._find())
+        self.assertEqual([], self.replica_statements)
+
+    def test_get_requests(self):
+        @webob.dec.wsgify
+        def app(req):
+            self._find()
+            return webob.Response()
+
+        middleware = wsgi.SessionScopeMiddleware(app)
+        middleware(webob.Request.blank('/'))
+        self.assertEqual(2, len(self.replica_statements))
+        middleware(webob.Request.blank('/', method='POST'))
+        self.assertEqual(2, len(self.replica_statements))
@@ -0,0 +1,72 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+import eventlet
+from sqlalchemy import event
+from testtools import TestCase
+
+from trove.common import cfg
+from trove.db.sqlalchemy import session
+
+CONF = cfg.CONF
+
+
+class ConnectionModeTest(TestCase):
+
+    def setUp(self):
+        super(ConnectionModeTest, self).setUp()
+        self.orig_mode = CONF.sql_connection_mode
+
+    def tearDown(self):
+        super(ConnectionModeTest, self).tearDown()
+        CONF.sql_connection_mode = self.orig_mode
+
+    def _engine(self, mode):
+        CONF.sql_connection_mode = mode
+        engine = session._create_engine({'sql_connection': 'sqlite://'})
+
+        def add_sleep(dbapi_con, con_record):
+            # A query blocking in the driver, as a slow MySQLdb query does.
+            dbapi_con.create_function('sleep', 1, time.sleep)
+        event.listen(engine, 'connect', add_sleep)
+        return engine
+
+    def _ticks_during_slow_query(self, engine):
+        """Counts how often another green thread ran during a slow query."""
+        ticks = []
+
+        def tick():
+            while True:
+                ticks.append(time.time())
+                eventlet.sleep(0.01)
+
+        ticker = eventlet.spawn(tick)
+        eventlet.sleep(0)
+        before = len(ticks)
+        self.assertEqual(None, engine.execute("SELECT sleep(0.2)").scalar())
+        ticker.kill()
+        return len(ticks) - before
+
+    def test_direct_blocks_the_hub(self):
+        self.assertEqual(0, self._ticks_during_slow_query(
+            self._engine('direct')))
+
+    def test_tpool_leaves_the_hub_running(self):
+        self.assertTrue(self._ticks_during_slow_query(
+            self._engine('tpool')) >= 5)
+
+    def test_unknown_mode(self):
+        self.assertRaises(RuntimeError, self._engine, 'threads')
@@ -23,6 +23,7 @@ from trove.common.context import TroveContext
 
 from trove.guestagent.manager.mysql import Manager
 import trove.guestagent.manager.mysql_service as dbaas
+from trove.guestagent import dbaas as base_dbaas
 from trove.guestagent import backup
 from trove.guestagent.volume import VolumeDevice
 
@@ -59,9 +60,22 @@ class GuestAgentManagerTest(testtools.TestCase):
     def test_update_status(self):
         mock_status = mock()
         when(dbaas.MySqlAppStatus).get().thenReturn(mock_status)
+        when(base_dbaas).get_filesystem_volume_stats(any()).thenReturn(
+            {'used': 0.25})
         self.manager.update_status(self.context)
         verify(dbaas.MySqlAppStatus).get()
         verify(mock_status).update()
+        verify(mock_status).set_volume_used(0.25)
+
+    def test_update_status_publishes_volume_used_per_interval(self):
+        mock_status = mock()
+        when(dbaas.MySqlAppStatus).get().thenReturn(mock_status)
+        when(base_dbaas).get_filesystem_volume_stats(any()).thenReturn(
+            {'used': 0.25})
+        self.manager.update_status(self.context)
+        self.manager.update_status(self.context)
+        verify(mock_status, times=2).update()
+        verify(mock_status, times=1).set_volume_used(0.25)
 
     def test_create_database(self):
         when(dbaas.MySqlAdmin).create_database(['db1']).thenReturn(None)
@@ -0,0 +1,116 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from testtools import TestCase
+
+from trove.common import utils
+from trove.instance import compute_notifications
+from trove.instance.compute_notifications import ComputeNotificationHandler
+from trove.instance.models import DBInstance
+from trove.instance.tasks import InstanceTasks
+from trove.openstack.common import jsonutils
+from trove.tests.unittests.util import util
+
+
+def _notification(server_id, state, timestamp, task_state=None,
+                  fixed_ips=None, event_type='compute.instance.update'):
+    payload = {'instance_id': server_id, 'state': state,
+               'new_task_state': task_state}
+    if fixed_ips is not None:
+        payload['fixed_ips'] = fixed_ips
+    return {'event_type': event_type, 'timestamp': timestamp,
+            'payload': payload}
+
+
+class ServerStatusFromStateTest(TestCase):
+
+    def test_active(self):
+        self.assertEqual(
+            'ACTIVE', compute_notifications.server_status_from_state('active'))
+
+    def test_task_state(self):
+        self.assertEqual('REBOOT',
+                         compute_notifications.server_status_from_state(
+                             'active', 'rebooting'))
+        self.assertEqual('RESIZE',
+                         compute_notifications.server_status_from_state(
+                             'stopped', 'resize_migrating'))
+
+    def test_deleted(self):
+        self.assertEqual('SHUTDOWN',
+                         compute_notifications.server_status_from_state(
+                             'deleted'))
+
+    def test_unknown(self):
+        self.assertEqual('UNKNOWN',
+                         compute_notifications.server_status_from_state(
+                             'melted'))
+
+    def test_addresses(self):
+        fixed_ips = [{'label': 'private', 'address': '10.0.0.2',
+                      'version': 4,
+                      'floating_ips': [{'address': '172.24.4.3'}]}]
+        self.assertEqual(
+            {'private': [{'addr': '10.0.0.2', 'version': 4},
+                         {'addr': '172.24.4.3', 'version': 4}]},
+            compute_notifications.addresses_from_fixed_ips(fixed_ips))
+
+
+class ComputeNotificationHandlerTest(TestCase):
+
+    def setUp(self):
+        super(ComputeNotificationHandlerTest, self).setUp()
+        util.init_db()
+        self.handler = ComputeNotificationHandler()
+        self.server_id = utils.generate_uuid()
+        self.db_info = DBInstance.create(name='instance',
+                                         flavor_id=1,
+                                         tenant_id='TENANT',
+                                         volume_size=1,
+                                         service_type='mysql',
+                                         compute_instance_id=self.server_id,
+                                         task_status=InstanceTasks.NONE)
+
+    def tearDown(self):
+        super(ComputeNotificationHandlerTest, self).tearDown()
+        self.db_info.delete()
+
+    def _reload(self):
+        return DBInstance.find_by(id=self.db_info.id)
+
+    def test_persists_state(self):
+        fixed_ips = [{'label': 'private', 'address': '10.0.0.2',
+                      'version': 4}]
+        self.handler(_notification(self.server_id, 'active',
+                                   '2013-10-01 00:00:01.000000',
+                                   fixed_ips=fixed_ips))
+        db_info = self._reload()
+        self.assertEqual('ACTIVE', db_info.server_status)
+        self.assertEqual({'private': [{'addr': '10.0.0.2', 'version': 4}]},
+                         jsonutils.loads(db_info.server_addresses))
+        self.assertTrue(db_info.server_updated is not None)
+
+    def test_ignores_older_notifications(self):
+        self.handler(_notification(self.server_id, 'active',
+                                   '2013-10-01 00:00:02.000000',
+                                   task_state='rebooting'))
+        self.handler(_notification(self.server_id, 'active',
+                                   '2013-10-01 00:00:01.000000'))
+        self.assertEqual('REBOOT', self._reload().server_status)
+
+    def test_ignores_other_events(self):
+        self.handler(_notification(self.server_id, 'error',
+                                   '2013-10-01 00:00:01.000000',
+                                   event_type='compute.metrics.update'))
+        self.assertEqual(None, self._reload().server_updated)
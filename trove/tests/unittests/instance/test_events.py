@@ -0,0 +1,200 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from testtools import TestCase
+
+from trove.common import cfg
+from trove.common import instance as rd_instance
+from trove.common import utils
+from trove.common.context import TroveContext
+from trove import db
+from trove.instance import models
+from trove.instance.events import InstanceEventBus
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.tasks import InstanceTasks
+from trove.tests.unittests.util import util
+
+CONF = cfg.CONF
+
+
+class InstanceEventBusTest(TestCase):
+
+    def setUp(self):
+        super(InstanceEventBusTest, self).setUp()
+        self.bus = InstanceEventBus()
+
+    def test_publish_wakes_waiters(self):
+        waiter = eventlet.spawn(self.bus.wait, 'instance-1', 5)
+        eventlet.sleep(0)
+        self.assertEqual(1, self.bus.waiting('instance-1'))
+        self.bus.publish('instance-1')
+        self.assertTrue(waiter.wait())
+        self.assertEqual(0, self.bus.waiting('instance-1'))
+
+    def test_timeout(self):
+        self.assertFalse(self.bus.wait('instance-1', 0.01))
+        self.assertEqual(0, self.bus.waiting('instance-1'))
+
+    def test_publish_other_instance(self):
+        waiter = eventlet.spawn(self.bus.wait, 'instance-1', 0.05)
+        eventlet.sleep(0)
+        self.bus.publish('instance-2')
+        self.assertFalse(waiter.wait())
+
+
+class WaitForChangeTest(TestCase):
+
+    def setUp(self):
+        super(WaitForChangeTest, self).setUp()
+        util.init_db()
+        self.context = TroveContext(tenant='TENANT')
+        self.db_info = DBInstance.create(name='instance',
+                                         flavor_id=1,
+                                         tenant_id='TENANT',
+                                         volume_size=1,
+                                         service_type='mysql',
+                                         compute_instance_id='server',
+                                         task_status=InstanceTasks.BUILDING)
+        self.status = InstanceServiceStatus.create(
+            instance_id=self.db_info.id,
+            status=rd_instance.ServiceStatuses.NEW)
+        self.orig_poll_interval = CONF.instance_watch_poll_interval
+        # Long enough that only a publish can end the waits in time.
+        CONF.instance_watch_poll_interval = 30
+
+    def tearDown(self):
+        super(WaitForChangeTest, self).tearDown()
+        CONF.instance_watch_poll_interval = self.orig_poll_interval
+        self.status.delete()
+        self.db_info.delete()
+
+    def _tag(self):
+        return models.load_state_tag(self.context, self.db_info.id)
+
+    def test_changed_already(self):
+        self.assertTrue(models.wait_for_change(self.context, self.db_info.id,
+                                               'stale', 5))
+
+    def test_timeout(self):
+        self.assertFalse(models.wait_for_change(self.context, self.db_info.id,
+                                                self._tag(), 0))
+
+    def test_service_status_change(self):
+        tag = self._tag()
+
+        def set_status():
+            self.status.set_status(rd_instance.ServiceStatuses.RUNNING)
+            self.status.save()
+
+        eventlet.spawn_after(0.01, set_status)
+        started = utils.utcnow()
+        self.assertTrue(models.wait_for_change(self.context, self.db_info.id,
+                                               tag, 5))
+        self.assertTrue((utils.utcnow() - started).seconds < 5)
+        self.assertNotEqual(tag, self._tag())
+
+    def test_task_status_change(self):
+        tag = self._tag()
+
+        def set_task():
+            self.db_info.task_status = InstanceTasks.NONE
+            self.db_info.save()
+
+        eventlet.spawn_after(0.01, set_task)
+        self.assertTrue(models.wait_for_change(self.context, self.db_info.id,
+                                               tag, 5))
+
+
+class InstanceETagTest(WaitForChangeTest):
+
+    def _etag(self):
+        return models.load_etag(self.context, self.db_info.id)
+
+    def test_changes_with_service_status(self):
+        etag = self._etag()
+        self.assertTrue(etag is not None)
+        self.assertEqual(etag, self._etag())
+        self.status.save()
+        self.assertNotEqual(etag, self._etag())
+
+    def test_depends_on_fields(self):
+        self.assertNotEqual(self._etag(), models.load_etag(
+            self.context, self.db_info.id, set(['name'])))
+
+    def test_none_while_nova_is_needed(self):
+        self.db_info.task_status = InstanceTasks.NONE
+        self.db_info.save()
+        self.assertEqual(None, self._etag())
+
+
+class ApiStatusTest(WaitForChangeTest):
+
+    def _api_status(self):
+        return DBInstance.find_by(id=self.db_info.id).api_status
+
+    def test_building(self):
+        self.assertEqual(models.InstanceStatus.BUILD, self._api_status())
+
+    def test_service_status_and_task_writes(self):
+        self.db_info.task_status = InstanceTasks.NONE
+        self.db_info.save()
+        self.status.set_status(rd_instance.ServiceStatuses.RUNNING)
+        self.status.save()
+        self.assertEqual(models.InstanceStatus.ACTIVE, self._api_status())
+        self.db_info.task_status = InstanceTasks.REBOOTING
+        self.db_info.save()
+        self.assertEqual(models.InstanceStatus.REBOOT, self._api_status())
+
+    def test_heartbeat(self):
+        with db.session_scope():
+            status = InstanceServiceStatus.find_by(instance_id=self.db_info.id)
+            status.set_status(rd_instance.ServiceStatuses.NEW)
+            with util.QueryCounter() as counter:
+                status.save()
+        # Only the service status is written, as the api_status is unchanged.
+        self.assertEqual(1, counter.count)
+
+    def test_inputs_changed_while_computing(self):
+        self.db_info.task_status = InstanceTasks.NONE
+        self.db_info.save()
+        get_by = InstanceServiceStatus.get_by
+
+        def transition_then_get_by(**conditions):
+            # Another request starts a reboot once the instance is read.
+            DBInstance.compare_and_set_task(self.db_info.id,
+                                            InstanceTasks.NONE,
+                                            InstanceTasks.REBOOTING)
+            return get_by(**conditions)
+
+        self.addCleanup(delattr, InstanceServiceStatus, 'get_by')
+        InstanceServiceStatus.get_by = staticmethod(transition_then_get_by)
+        self.status.set_status(rd_instance.ServiceStatuses.RUNNING)
+        self.status.save()
+        self.assertEqual(models.InstanceStatus.REBOOT, self._api_status())
+
+    def test_stored_status_is_read(self):
+        CONF.server_status_from_db = True
+        self.addCleanup(setattr, CONF, 'server_status_from_db', False)
+        DBInstance.save_server_state('server', 'ACTIVE', {}, utils.utcnow())
+        self.db_info = DBInstance.find_by(id=self.db_info.id)
+        self.db_info.task_status = InstanceTasks.NONE
+        self.db_info.save()
+        self.status.set_status(rd_instance.ServiceStatuses.RUNNING)
+        self.status.save()
+        db_info = DBInstance.find_by(id=self.db_info.id)
+        self.assertEqual(models.InstanceStatus.ACTIVE, db_info.api_status)
+        instance = models.SimpleInstance(self.context, db_info, None)
+        self.assertEqual(models.InstanceStatus.ACTIVE, instance.status)
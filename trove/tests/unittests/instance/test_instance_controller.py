@@ -13,12 +13,21 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+import datetime
+
 import jsonschema
+import webob
 from testtools import TestCase
 from testtools.matchers import Is, Equals
 from testtools.testcase import skip
 from trove.common import apischema
+from trove.common import cfg
+from trove.common import exception
+from trove.instance.service import fields_option
 from trove.instance.service import InstanceController
+from trove.instance.service import list_options
+
+CONF = cfg.CONF
 
 
 class TestInstanceController(TestCase):
@@ -215,3 +224,65 @@ class TestInstanceController(TestCase):
         self.assertFalse(validator.is_valid(body))
         errors = sorted(validator.iter_errors(body), key=lambda e: e.path)
         self.verify_errors(errors, ["'' is too short"], ["flavorRef"])
+
+
+class TestListOptions(TestCase):
+
+    def _options(self, query):
+        return list_options(webob.Request.blank('/instances?' + query))
+
+    def test_defaults(self):
+        self.assertEqual({'sort_keys': [], 'sort_dir': 'asc',
+                          'conditions': {}, 'ranges': {}},
+                         self._options(''))
+
+    def test_sort_and_filter(self):
+        options = self._options('sort_key=created,name&sort_dir=DESC'
+                                '&service_type=mysql&tenant_id=other'
+                                '&created_since=2013-10-01T00:00:00Z')
+        self.assertEqual(['created', 'name'], options['sort_keys'])
+        self.assertEqual('desc', options['sort_dir'])
+        self.assertEqual({'service_type': 'mysql'}, options['conditions'])
+        self.assertEqual({'created': (datetime.datetime(2013, 10, 1), None)},
+                         options['ranges'])
+
+    def test_status_filter(self):
+        orig_server_status_from_db = CONF.server_status_from_db
+        try:
+            CONF.server_status_from_db = False
+            self.assertRaises(exception.BadRequest,
+                              self._options, 'status=active')
+            CONF.server_status_from_db = True
+            self.assertEqual({'api_status': 'ACTIVE'},
+                             self._options('status=active')['conditions'])
+        finally:
+            CONF.server_status_from_db = orig_server_status_from_db
+
+    def test_invalid_sort_key(self):
+        self.assertRaises(exception.InvalidSortKey,
+                          self._options, 'sort_key=compute_instance_id')
+
+    def test_invalid_sort_dir(self):
+        self.assertRaises(exception.BadRequest,
+                          self._options, 'sort_dir=sideways')
+
+    def test_invalid_time(self):
+        self.assertRaises(exception.BadRequest,
+                          self._options, 'created_before=yesterday')
+
+
+class TestFieldsOption(TestCase):
+
+    def _fields(self, query):
+        return fields_option(webob.Request.blank('/instances?' + query))
+
+    def test_all_fields(self):
+        self.assertEqual(None, self._fields(''))
+
+    def test_fields(self):
+        self.assertEqual(set(['name', 'status']),
+                         self._fields('fields=name,status'))
+
+    def test_unknown_field(self):
+        self.assertRaises(exception.BadRequest,
+                          self._fields, 'fields=name,secret')
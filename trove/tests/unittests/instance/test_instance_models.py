@@ -0,0 +1,322 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mockito import mock, when, verify, unstub, any
+from testtools import TestCase
+
+from trove.backup.models import Backup
+from trove.common import cfg
+from trove.common import exception
+from trove.common import instance as rd_instance
+from trove.common import utils
+from trove.common.context import TroveContext
+from trove import db
+from trove.instance import models
+from trove.instance.models import DBInstance
+from trove.instance.models import InstanceServiceStatus
+from trove.instance.models import InstanceStatus
+from trove.instance.tasks import InstanceTasks
+from trove.tests.unittests.util import util
+
+
+CONF = cfg.CONF
+
+
+class FakeServer(object):
+    def __init__(self, id, status='ACTIVE'):
+        self.id = id
+        self.status = status
+        self.addresses = {}
+
+
+class ServerListMatcherTest(TestCase):
+
+    def setUp(self):
+        super(ServerListMatcherTest, self).setUp()
+        self.servers = [FakeServer('server-1'), FakeServer('server-2'),
+                        FakeServer('server-dup'), FakeServer('server-dup')]
+        self.find_server = models.create_server_list_matcher(self.servers)
+
+    def test_find_server(self):
+        self.assertEqual(self.servers[1],
+                         self.find_server('instance-2', 'server-2'))
+
+    def test_server_not_found(self):
+        self.assertRaises(exception.ComputeInstanceNotFound,
+                          self.find_server, 'instance-3', 'server-3')
+
+    def test_server_found_twice(self):
+        self.assertRaises(exception.TroveError,
+                          self.find_server, 'instance-dup', 'server-dup')
+
+
+class InstancesLoadTest(TestCase):
+
+    def setUp(self):
+        super(InstancesLoadTest, self).setUp()
+        util.init_db()
+        self.context = TroveContext(tenant='TENANT-' + str(utils.utcnow()))
+        self.servers = []
+        self.db_infos = []
+        self.client = mock()
+        self.client.servers = mock()
+        when(self.client.servers).list().thenReturn(self.servers)
+        when(models).create_nova_client(any()).thenReturn(self.client)
+        self.orig_page_server_fetch = CONF.instances_page_server_fetch
+        self.orig_server_status_from_db = CONF.server_status_from_db
+
+    def tearDown(self):
+        super(InstancesLoadTest, self).tearDown()
+        unstub()
+        CONF.instances_page_server_fetch = self.orig_page_server_fetch
+        CONF.server_status_from_db = self.orig_server_status_from_db
+        for db_info in self.db_infos:
+            InstanceServiceStatus.find_by(instance_id=db_info.id).delete()
+            db_info.delete()
+
+    def _create_instances(self, count, name='instance-%d',
+                          service_type='mysql'):
+        for index in range(count):
+            compute_id = utils.generate_uuid()
+            db_info = DBInstance.create(name=name % index,
+                                        flavor_id=1,
+                                        tenant_id=self.context.tenant,
+                                        volume_size=1,
+                                        service_type=service_type,
+                                        compute_instance_id=compute_id,
+                                        task_status=InstanceTasks.NONE)
+            InstanceServiceStatus.create(
+                instance_id=db_info.id,
+                status=rd_instance.ServiceStatuses.RUNNING)
+            self.servers.append(FakeServer(compute_id))
+            self.db_infos.append(db_info)
+
+    def _load_page(self, limit):
+        self.context.limit = limit
+        with util.QueryCounter() as counter:
+            instances, marker = models.Instances.load(self.context)
+            statuses = [instance.status for instance in instances]
+        self.assertEqual(limit, len(instances))
+        self.assertEqual(limit, len(statuses))
+        return counter.count
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self._create_instances(20)
+        small_page = self._load_page(2)
+        large_page = self._load_page(20)
+        self.assertTrue(small_page > 0)
+        self.assertEqual(small_page, large_page)
+
+    def test_preloaded_running_backup(self):
+        self._create_instances(2)
+        backing_up = self.db_infos[0]
+        when(Backup).running_instance_ids(any()).thenReturn(
+            set([backing_up.id]))
+        when(Backup).running(any()).thenRaise(AssertionError)
+        instances, marker = models.Instances.load(self.context)
+        statuses = dict((instance.id, instance.status)
+                        for instance in instances)
+        self.assertEqual(InstanceStatus.BACKUP, statuses[backing_up.id])
+        self.assertEqual(InstanceStatus.ACTIVE,
+                         statuses[self.db_infos[1].id])
+
+    def test_page_server_fetch(self):
+        CONF.instances_page_server_fetch = True
+        self._create_instances(3)
+        for server in self.servers:
+            when(self.client.servers).get(server.id).thenReturn(server)
+        self.context.limit = 2
+        instances, marker = models.Instances.load(self.context)
+        self.assertEqual(2, len(instances))
+        for instance in instances:
+            self.assertEqual(InstanceStatus.ACTIVE, instance.status)
+        verify(self.client.servers, times=0).list()
+        verify(self.client.servers, times=2).get(any())
+
+    def test_server_status_from_db(self):
+        CONF.server_status_from_db = True
+        self._create_instances(2)
+        DBInstance.save_server_state(self.servers[0].id, 'REBOOT',
+                                     {'private': []}, utils.utcnow())
+        when(self.client.servers).get(self.servers[1].id).thenReturn(
+            self.servers[1])
+        instances, marker = models.Instances.load(self.context)
+        statuses = dict((instance.id, instance.status)
+                        for instance in instances)
+        self.assertEqual(InstanceStatus.REBOOT,
+                         statuses[self.db_infos[0].id])
+        self.assertEqual(InstanceStatus.ACTIVE,
+                         statuses[self.db_infos[1].id])
+        verify(self.client.servers, times=0).list()
+        verify(self.client.servers, times=1).get(any())
+
+    def test_load_instance_with_published_volume_used(self):
+        self._create_instances(1)
+        db_info = self.db_infos[0]
+        when(self.client.servers).get(self.servers[0].id).thenReturn(
+            self.servers[0])
+        when(models).create_guest_client(any(), any()).thenRaise(
+            AssertionError)
+        InstanceServiceStatus.save_volume_used(db_info.id, 0.25)
+        instance = models.load_instance_with_guest(models.DetailInstance,
+                                                   self.context, db_info.id)
+        self.assertEqual(0.25, instance.volume_used)
+        self.assertTrue(instance.volume_used_updated is not None)
+
+    def test_load_instance_with_live_volume_used(self):
+        self._create_instances(1)
+        db_info = self.db_infos[0]
+        when(self.client.servers).get(self.servers[0].id).thenReturn(
+            self.servers[0])
+        guest = mock()
+        when(guest).get_volume_info().thenReturn({'used': 0.5})
+        when(models).create_guest_client(any(), any()).thenReturn(guest)
+        InstanceServiceStatus.save_volume_used(db_info.id, 0.25)
+        instance = models.load_instance_with_guest(models.DetailInstance,
+                                                   self.context, db_info.id,
+                                                   live_volume_used=True)
+        self.assertEqual(0.5, instance.volume_used)
+
+    def _load_names(self, **kwargs):
+        instances, marker = models.Instances.load(self.context, **kwargs)
+        return [instance.name for instance in instances], marker
+
+    def test_sort_keys_with_marker(self):
+        self._create_instances(5, name='b-%d')
+        self._create_instances(2, name='a-%d', service_type='redis')
+        self.context.limit = 3
+        names, marker = self._load_names(sort_keys=['name'], sort_dir='desc')
+        self.assertEqual(['b-4', 'b-3', 'b-2'], names)
+        self.context.marker = marker
+        names, marker = self._load_names(sort_keys=['name'], sort_dir='desc')
+        self.assertEqual(['b-1', 'b-0', 'a-1'], names)
+        self.context.marker = marker
+        names, marker = self._load_names(sort_keys=['name'], sort_dir='desc')
+        self.assertEqual(['a-0'], names)
+        self.assertEqual(None, marker)
+
+    def test_sort_keys_break_ties_by_id(self):
+        self._create_instances(4)
+        self.context.limit = 2
+        ids = []
+        while True:
+            instances, marker = models.Instances.load(
+                self.context, sort_keys=['service_type'])
+            ids.extend(instance.id for instance in instances)
+            if marker is None:
+                break
+            self.context.marker = marker
+        self.assertEqual(sorted(db_info.id for db_info in self.db_infos), ids)
+
+    def test_conditions_and_ranges(self):
+        self._create_instances(2, name='mysql-%d')
+        self._create_instances(2, name='redis-%d', service_type='redis')
+        names, marker = self._load_names(
+            sort_keys=['name'], conditions={'service_type': 'redis'})
+        self.assertEqual(['redis-0', 'redis-1'], names)
+        names, marker = self._load_names(
+            ranges={'created': (None, self.db_infos[0].created)})
+        self.assertEqual([], names)
+
+    def test_unknown_marker(self):
+        self._create_instances(1)
+        self.context.marker = 'missing'
+        self.assertRaises(exception.MarkerNotFound, models.Instances.load,
+                          self.context, sort_keys=['name'])
+
+    def test_fields_without_status_skip_nova_and_statuses(self):
+        self._create_instances(3)
+        when(models).create_nova_client(any()).thenRaise(AssertionError)
+        when(InstanceServiceStatus).find_all_by_instance_ids(
+            any()).thenRaise(AssertionError)
+        instances, marker = models.Instances.load(self.context,
+                                                  fields=set(['name']))
+        self.assertEqual(sorted(db_info.name for db_info in self.db_infos),
+                         sorted(instance.name for instance in instances))
+
+    def test_load_instance_with_guest_fields(self):
+        self._create_instances(1)
+        when(models).load_simple_instance_server_status(
+            any(), any()).thenRaise(AssertionError)
+        with util.QueryCounter() as counter:
+            instance = models.load_instance_with_guest(
+                models.DetailInstance, self.context, self.db_infos[0].id,
+                fields=set(['name', 'created']))
+        self.assertEqual(self.db_infos[0].name, instance.name)
+        self.assertEqual([], [statement for statement in counter.statements
+                              if 'service_statuses' in statement])
+
+
+class TaskTransitionTest(TestCase):
+
+    def setUp(self):
+        super(TaskTransitionTest, self).setUp()
+        util.init_db()
+        self.db_info = DBInstance.create(name='instance',
+                                         flavor_id=1,
+                                         tenant_id='TENANT',
+                                         volume_size=1,
+                                         service_type='mysql',
+                                         task_status=InstanceTasks.NONE)
+
+    def tearDown(self):
+        super(TaskTransitionTest, self).tearDown()
+        self.db_info.delete()
+
+    def _instance(self):
+        db_info = DBInstance.find_by(id=self.db_info.id)
+        return models.BaseInstance(None, db_info, None, None)
+
+    def test_one_statement(self):
+        with util.QueryCounter() as counter:
+            self.assertTrue(DBInstance.compare_and_set_task(
+                self.db_info.id, InstanceTasks.NONE,
+                InstanceTasks.REBOOTING))
+        self.assertEqual(1, counter.count)
+        db_info = DBInstance.find_by(id=self.db_info.id)
+        self.assertEqual(InstanceTasks.REBOOTING, db_info.task_status)
+        self.assertEqual(InstanceStatus.REBOOT, db_info.api_status)
+
+    def test_unexpected_task(self):
+        self.assertFalse(DBInstance.compare_and_set_task(
+            self.db_info.id, InstanceTasks.RESIZING, InstanceTasks.NONE))
+        self.assertEqual(InstanceTasks.NONE,
+                         DBInstance.find_by(id=self.db_info.id).task_status)
+
+    def test_concurrent_transitions(self):
+        first = self._instance()
+        second = self._instance()
+        first._start_task(InstanceTasks.REBOOTING)
+        self.assertEqual(InstanceTasks.REBOOTING, first.db_info.task_status)
+        self.assertRaises(exception.UnprocessableEntity,
+                          second._start_task, InstanceTasks.MIGRATING)
+        self.assertEqual(InstanceTasks.REBOOTING,
+                         DBInstance.find_by(id=self.db_info.id).task_status)
+
+    def test_saving_after_another_transition(self):
+        @db.without_session_scope
+        def transition_elsewhere():
+            DBInstance.compare_and_set_task(self.db_info.id,
+                                            InstanceTasks.REBOOTING,
+                                            InstanceTasks.NONE)
+
+        with db.session_scope():
+            instance = self._instance()
+            instance._start_task(InstanceTasks.REBOOTING)
+            transition_elsewhere()
+            instance.db_info.name = 'renamed'
+            instance.db_info.save()
+        db_info = DBInstance.find_by(id=self.db_info.id)
+        self.assertEqual('renamed', db_info.name)
+        self.assertEqual(InstanceTasks.NONE, db_info.task_status)
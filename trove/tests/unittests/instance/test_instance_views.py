@@ -13,9 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+from mockito import mock
 from testtools import TestCase
 from trove.common import cfg
 from trove.instance.views import get_ip_address
+from trove.instance.views import InstanceDetailView
 
 
 CONF = cfg.CONF
@@ -58,3 +60,28 @@ class InstanceViewsTest(TestCase):
         self.assertTrue('10.123.123.123' in ip)
         self.assertTrue('123.123.123.123' in ip)
         self.assertTrue('15.123.123.123' in ip)
+
+
+class InstanceFieldsViewTest(TestCase):
+
+    def setUp(self):
+        super(InstanceFieldsViewTest, self).setUp()
+        self.instance = mock()
+        self.instance.id = 'instance-1'
+        self.instance.name = 'db-1'
+        self.instance.status = 'ACTIVE'
+        self.instance.created = 'yesterday'
+        self.instance.root_password = None
+
+    def test_only_requested_fields(self):
+        view = InstanceDetailView(self.instance, req=None,
+                                  fields=set(['name', 'status']))
+        self.assertEqual({'id': 'instance-1', 'name': 'db-1',
+                          'status': 'ACTIVE'},
+                         view.data()['instance'])
+
+    def test_id_is_always_shown(self):
+        view = InstanceDetailView(self.instance, req=None,
+                                  fields=set(['created']))
+        self.assertEqual({'id': 'instance-1', 'created': 'yesterday'},
+                         view.data()['instance'])
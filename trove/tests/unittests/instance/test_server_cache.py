@@ -0,0 +1,129 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from mockito import mock, when, verify, unstub, any
+from testtools import TestCase
+
+from trove.instance.server_cache import ServerCache
+from trove.openstack.common import timeutils
+
+
+class FakeServer(object):
+    def __init__(self, id, status='ACTIVE', addresses=None):
+        self.id = id
+        self.status = status
+        self.addresses = addresses or {}
+
+
+class ServerCacheTest(TestCase):
+
+    def setUp(self):
+        super(ServerCacheTest, self).setUp()
+        timeutils.set_time_override(datetime.datetime(2013, 10, 1))
+        self.cache = ServerCache(ttl=60, max_size=2)
+        self.client = mock()
+        self.client.servers = mock()
+
+    def tearDown(self):
+        super(ServerCacheTest, self).tearDown()
+        timeutils.clear_time_override()
+        unstub()
+
+    def test_get_missing(self):
+        self.assertEqual(None, self.cache.get('server-1'))
+
+    def test_put_and_get(self):
+        self.cache.put(FakeServer('server-1', addresses={'private': []}))
+        server = self.cache.get('server-1')
+        self.assertEqual('ACTIVE', server.status)
+        self.assertEqual({'private': []}, server.addresses)
+
+    def test_expired(self):
+        self.cache.put(FakeServer('server-1'))
+        timeutils.advance_time_seconds(61)
+        self.assertEqual(None, self.cache.get('server-1'))
+        self.assertEqual(0, len(self.cache))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put(FakeServer('server-1'))
+        self.cache.put(FakeServer('server-2'))
+        self.cache.get('server-1')
+        self.cache.put(FakeServer('server-3'))
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(None, self.cache.get('server-2'))
+        self.assertTrue(self.cache.get('server-1') is not None)
+
+    def test_invalidate(self):
+        self.cache.put(FakeServer('server-1'))
+        self.cache.invalidate('server-1')
+        self.assertEqual(None, self.cache.get('server-1'))
+
+    def test_refresh(self):
+        self.cache.put(FakeServer('server-1'))
+        self.cache.put(FakeServer('server-2'))
+        when(self.client.servers).list(
+            search_opts=any(), marker=None, limit=1000).thenReturn(
+            [FakeServer('server-1', status='REBOOT'),
+             FakeServer('server-2', status='DELETED'),
+             FakeServer('server-3', status='BUILD')])
+        timeutils.advance_time_seconds(50)
+        self.cache.refresh(self.client)
+        # The refresh confirmed the entry, so it outlives the original ttl.
+        timeutils.advance_time_seconds(50)
+        self.assertEqual('REBOOT', self.cache.get('server-1').status)
+        self.assertEqual(None, self.cache.get('server-2'))
+        self.assertEqual(None, self.cache.get('server-3'))
+
+    def test_refresh_asks_for_changes_since_last_refresh(self):
+        when(self.client.servers).list(
+            search_opts=any(), marker=None, limit=1000).thenReturn([])
+        timeutils.advance_time_seconds(10)
+        self.cache.refresh(self.client)
+        timeutils.advance_time_seconds(10)
+        self.cache.refresh(self.client)
+        verify(self.client.servers).list(
+            search_opts={'changes-since': '2013-09-30T23:59:55Z',
+                         'all_tenants': 1},
+            marker=None, limit=1000)
+        verify(self.client.servers).list(
+            search_opts={'changes-since': '2013-10-01T00:00:05Z',
+                         'all_tenants': 1},
+            marker=None, limit=1000)
+
+    def test_refresh_pages_through_changes(self):
+        self.cache = ServerCache(ttl=60, max_size=2, page_size=2)
+        self.cache.put(FakeServer('server-1'))
+        self.cache.put(FakeServer('server-2'))
+        when(self.client.servers).list(
+            search_opts=any(), marker=None, limit=2).thenReturn(
+            [FakeServer('server-3'), FakeServer('server-4')])
+        when(self.client.servers).list(
+            search_opts=any(), marker='server-4', limit=2).thenReturn(
+            [FakeServer('server-2', status='DELETED')])
+        self.cache.refresh(self.client)
+        # A change past the first page is seen too.
+        self.assertEqual(None, self.cache.get('server-2'))
+        self.assertTrue(self.cache.get('server-1') is not None)
+
+    def test_failed_refresh_leaves_ages(self):
+        self.cache.put(FakeServer('server-1'))
+        when(self.client.servers).list(
+            search_opts=any(), marker=None, limit=1000).thenRaise(
+            Exception('Nova is down.'))
+        timeutils.advance_time_seconds(50)
+        self.assertRaises(Exception, self.cache.refresh, self.client)
+        timeutils.advance_time_seconds(50)
+        self.assertEqual(None, self.cache.get('server-1'))
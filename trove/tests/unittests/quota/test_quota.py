@@ -11,20 +11,32 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import datetime
+import threading
+
 import testtools
 from mockito import mock, when, unstub, any, verify, never, times
 from mock import Mock
+from trove.backup.models import BackupState
 from trove.quota.quota import DbQuotaDriver
 from trove.quota.models import Resource
 from trove.quota.models import Quota
 from trove.quota.models import QuotaUsage
 from trove.quota.models import Reservation
+from trove import db
 from trove.db.models import DatabaseModelBase
 from trove.extensions.mgmt.quota.service import QuotaController
 from trove.common import exception
 from trove.common import cfg
+from trove.common import utils
+from trove.db.sqlalchemy import quotas as db_quotas
+from trove.db.sqlalchemy import session
+from trove.db.sqlalchemy import tables
+from trove.instance.models import DBInstance
+from trove.instance.tasks import InstanceTasks
 from trove.quota.quota import run_with_quotas
 from trove.quota.quota import QUOTAS
+from trove.tests.unittests.util import util
 """
 Unit tests for the classes and functions in DbQuotaDriver.py.
 """
@@ -379,35 +391,6 @@ class DbQuotaDriverTest(testtools.TestCase):
         self.assertEquals(0, usages[Resource.VOLUMES].in_use)
         self.assertEquals(0, usages[Resource.VOLUMES].reserved)
 
-    def test_reserve(self):
-
-        FAKE_QUOTAS = [QuotaUsage(id=1,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.INSTANCES,
-                                  in_use=1,
-                                  reserved=2),
-                       QuotaUsage(id=2,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.VOLUMES,
-                                  in_use=1,
-                                  reserved=1)]
-
-        self.mock_quota_result.all = Mock(return_value=[])
-        self.mock_usage_result.all = Mock(return_value=FAKE_QUOTAS)
-        QuotaUsage.save = Mock()
-        Reservation.create = Mock()
-
-        delta = {'instances': 2, 'volumes': 3}
-        self.driver.reserve(FAKE_TENANT1, resources, delta)
-        _, kw = Reservation.create.call_args_list[0]
-        self.assertEquals(1, kw['usage_id'])
-        self.assertEquals(2, kw['delta'])
-        self.assertEquals(Reservation.Statuses.RESERVED, kw['status'])
-        _, kw = Reservation.create.call_args_list[1]
-        self.assertEquals(2, kw['usage_id'])
-        self.assertEquals(3, kw['delta'])
-        self.assertEquals(Reservation.Statuses.RESERVED, kw['status'])
-
     def test_reserve_resource_unknown(self):
 
         delta = {'instances': 10, 'volumes': 2000, 'Fake_resource': 123}
@@ -417,173 +400,318 @@ class DbQuotaDriverTest(testtools.TestCase):
                           resources,
                           delta)
 
-    def test_reserve_over_quota(self):
-
-        FAKE_QUOTAS = [QuotaUsage(id=1,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.INSTANCES,
-                                  in_use=0,
-                                  reserved=0),
-                       QuotaUsage(id=2,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.VOLUMES,
-                                  in_use=0,
-                                  reserved=0)]
-
-        self.mock_quota_result.all = Mock(return_value=[])
-        self.mock_usage_result.all = Mock(return_value=FAKE_QUOTAS)
-
-        delta = {'instances': 1, 'volumes': CONF.max_volumes_per_user + 1}
-        self.assertRaises(exception.QuotaExceeded,
-                          self.driver.reserve,
-                          FAKE_TENANT1,
-                          resources,
-                          delta)
-
-    def test_reserve_over_quota_with_usage(self):
 
-        FAKE_QUOTAS = [QuotaUsage(id=1,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.INSTANCES,
-                                  in_use=1,
-                                  reserved=0),
-                       QuotaUsage(id=2,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.VOLUMES,
-                                  in_use=0,
-                                  reserved=0)]
-
-        self.mock_quota_result.all = Mock(return_value=[])
-        self.mock_usage_result.all = Mock(return_value=FAKE_QUOTAS)
+class ReservationTest(testtools.TestCase):
 
-        delta = {'instances': 5, 'volumes': 3}
-        self.assertRaises(exception.QuotaExceeded,
-                          self.driver.reserve,
-                          FAKE_TENANT1,
-                          resources,
-                          delta)
-
-    def test_reserve_over_quota_with_reserved(self):
-
-        FAKE_QUOTAS = [QuotaUsage(id=1,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.INSTANCES,
-                                  in_use=1,
-                                  reserved=2),
-                       QuotaUsage(id=2,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.VOLUMES,
-                                  in_use=0,
-                                  reserved=0)]
+    def setUp(self):
+        super(ReservationTest, self).setUp()
+        util.init_db()
+        self.driver = DbQuotaDriver(resources)
+        self.tenant_id = utils.generate_uuid()
+        self.addCleanup(self._delete_rows)
+
+    def _delete_rows(self):
+        usage_ids = [row.id for row in session._ENGINE.execute(
+            tables.quota_usages.select().where(
+                tables.quota_usages.c.tenant_id == self.tenant_id))]
+        if usage_ids:
+            session._ENGINE.execute(tables.reservations.delete().where(
+                tables.reservations.c.usage_id.in_(usage_ids)))
+        for table in (tables.quota_usages, tables.quotas):
+            session._ENGINE.execute(table.delete().where(
+                table.c.tenant_id == self.tenant_id))
+
+    def _add_usage(self, resource, in_use, reserved):
+        usage_id = utils.generate_uuid()
+        session._ENGINE.execute(tables.quota_usages.insert().values(
+            id=usage_id, tenant_id=self.tenant_id, resource=resource,
+            in_use=in_use, reserved=reserved))
+        return usage_id
+
+    def _usages(self):
+        rows = session._ENGINE.execute(tables.quota_usages.select().where(
+            tables.quota_usages.c.tenant_id == self.tenant_id))
+        return dict((row.resource, (row.in_use, row.reserved))
+                    for row in rows)
+
+    def _statuses(self, reservations):
+        table = tables.reservations
+        rows = session._ENGINE.execute(table.select().where(
+            table.c.id.in_([reservation.id for reservation in reservations])))
+        return sorted(row.status for row in rows)
+
+    def test_leaves_the_models_of_the_request(self):
+        db_info = DBInstance.create(name='instance', flavor_id=1,
+                                    tenant_id=self.tenant_id, volume_size=1,
+                                    service_type='mysql',
+                                    task_status=InstanceTasks.NONE)
+        self.addCleanup(db_info.delete)
+        with db.session_scope():
+            loaded = DBInstance.find_by(id=db_info.id)
+            loaded.name = 'unsaved'
+            reservations = self.driver.reserve(self.tenant_id, resources,
+                                               {'instances': 1})
+            self.driver.commit(reservations)
+        self.assertEqual('instance', DBInstance.find_by(id=db_info.id).name)
+        self.assertEqual({Resource.INSTANCES: (1, 0)}, self._usages())
 
-        self.mock_quota_result.all = Mock(return_value=[])
-        self.mock_usage_result.all = Mock(return_value=FAKE_QUOTAS)
+    def test_reserve(self):
+        usage_id = self._add_usage(Resource.INSTANCES, 1, 2)
+        reservations = self.driver.reserve(
+            self.tenant_id, resources, {'instances': 2, 'volumes': 3})
+        self.assertEqual([usage_id, 2, Reservation.Statuses.RESERVED],
+                         [reservations[0].usage_id, reservations[0].delta,
+                          reservations[0].status])
+        self.assertEqual(3, reservations[1].delta)
+        self.assertEqual({Resource.INSTANCES: (1, 4),
+                          Resource.VOLUMES: (0, 3)}, self._usages())
+        self.assertEqual([Reservation.Statuses.RESERVED] * 2,
+                         self._statuses(reservations))
 
-        delta = {'instances': 4, 'volumes': 2}
-        self.assertRaises(exception.QuotaExceeded,
-                          self.driver.reserve,
-                          FAKE_TENANT1,
-                          resources,
-                          delta)
+    def test_reserve_over_quota(self):
+        self._add_usage(Resource.INSTANCES, 1, 2)
+        delta = {'instances': CONF.max_instances_per_user - 2, 'volumes': 1}
+        error = self.assertRaises(exception.QuotaExceeded,
+                                  self.driver.reserve, self.tenant_id,
+                                  resources, delta)
+        self.assertTrue('instances' in str(error))
+        self.assertEqual((1, 2), self._usages()[Resource.INSTANCES])
+        self.assertEqual((0, 0), self._usages()[Resource.VOLUMES])
+
+    def test_reserve_with_tenant_quota(self):
+        session._ENGINE.execute(tables.quotas.insert().values(
+            id=utils.generate_uuid(), tenant_id=self.tenant_id,
+            resource=Resource.INSTANCES,
+            hard_limit=CONF.max_instances_per_user + 5))
+        self.driver.reserve(self.tenant_id, resources,
+                            {'instances': CONF.max_instances_per_user + 5})
+        self.assertRaises(exception.QuotaExceeded, self.driver.reserve,
+                          self.tenant_id, resources, {'instances': 1})
 
     def test_reserve_over_quota_but_can_apply_negative_deltas(self):
-
-        FAKE_QUOTAS = [QuotaUsage(id=1,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.INSTANCES,
-                                  in_use=10,
-                                  reserved=0),
-                       QuotaUsage(id=2,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.VOLUMES,
-                                  in_use=50,
-                                  reserved=0)]
-
-        self.mock_quota_result.all = Mock(return_value=[])
-        self.mock_usage_result.all = Mock(return_value=FAKE_QUOTAS)
-
-        QuotaUsage.save = Mock()
-        Reservation.create = Mock()
-
-        delta = {'instances': -1, 'volumes': -3}
-        self.driver.reserve(FAKE_TENANT1, resources, delta)
-        _, kw = Reservation.create.call_args_list[0]
-        self.assertEquals(1, kw['usage_id'])
-        self.assertEquals(-1, kw['delta'])
-        self.assertEquals(Reservation.Statuses.RESERVED, kw['status'])
-        _, kw = Reservation.create.call_args_list[1]
-        self.assertEquals(2, kw['usage_id'])
-        self.assertEquals(-3, kw['delta'])
-        self.assertEquals(Reservation.Statuses.RESERVED, kw['status'])
+        self._add_usage(Resource.INSTANCES, 10, 0)
+        self._add_usage(Resource.VOLUMES, 50, 0)
+        reservations = self.driver.reserve(
+            self.tenant_id, resources, {'instances': -1, 'volumes': -3})
+        self.assertEqual([-1, -3], [reservation.delta
+                                    for reservation in reservations])
+        self.assertEqual({Resource.INSTANCES: (10, -1),
+                          Resource.VOLUMES: (50, -3)}, self._usages())
 
     def test_commit(self):
-
-        Reservation.save = Mock()
-        QuotaUsage.save = Mock()
-
-        FAKE_QUOTAS = [QuotaUsage(id=1,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.INSTANCES,
-                                  in_use=5,
-                                  reserved=2),
-                       QuotaUsage(id=2,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.VOLUMES,
-                                  in_use=1,
-                                  reserved=2)]
-
-        FAKE_RESERVATIONS = [Reservation(usage_id=1,
-                                         delta=1,
-                                         status=Reservation.Statuses.RESERVED),
-                             Reservation(usage_id=2,
-                                         delta=2,
-                                         status=Reservation.Statuses.RESERVED)]
-
-        QuotaUsage.find_by = Mock(side_effect=FAKE_QUOTAS)
-        self.driver.commit(FAKE_RESERVATIONS)
-
-        self.assertEqual(6, FAKE_QUOTAS[0].in_use)
-        self.assertEqual(1, FAKE_QUOTAS[0].reserved)
-        self.assertEqual(Reservation.Statuses.COMMITTED,
-                         FAKE_RESERVATIONS[0].status)
-
-        self.assertEqual(3, FAKE_QUOTAS[1].in_use)
-        self.assertEqual(0, FAKE_QUOTAS[1].reserved)
-        self.assertEqual(Reservation.Statuses.COMMITTED,
-                         FAKE_RESERVATIONS[1].status)
+        self._add_usage(Resource.INSTANCES, 5, 0)
+        reservations = self.driver.reserve(
+            self.tenant_id, resources, {'instances': -1, 'volumes': 2})
+        self.driver.commit(reservations)
+        self.assertEqual({Resource.INSTANCES: (4, 0),
+                          Resource.VOLUMES: (2, 0)}, self._usages())
+        self.assertEqual([Reservation.Statuses.COMMITTED] * 2,
+                         [reservation.status for reservation in reservations])
+        self.assertEqual([Reservation.Statuses.COMMITTED] * 2,
+                         self._statuses(reservations))
+        # Settled reservations aren't applied again.
+        self.driver.commit(reservations)
+        self.driver.rollback(reservations)
+        self.assertEqual({Resource.INSTANCES: (4, 0),
+                          Resource.VOLUMES: (2, 0)}, self._usages())
 
     def test_rollback(self):
+        self._add_usage(Resource.INSTANCES, 5, 0)
+        reservations = self.driver.reserve(
+            self.tenant_id, resources, {'instances': -1, 'volumes': 2})
+        self.driver.rollback(reservations)
+        self.assertEqual({Resource.INSTANCES: (5, 0),
+                          Resource.VOLUMES: (0, 0)}, self._usages())
+        self.assertEqual([Reservation.Statuses.ROLLEDBACK] * 2,
+                         self._statuses(reservations))
+
+    def test_statements(self):
+        self._add_usage(Resource.INSTANCES, 0, 0)
+        self._add_usage(Resource.VOLUMES, 0, 0)
+        with util.QueryCounter() as counter:
+            reservations = self.driver.reserve(
+                self.tenant_id, resources, {'instances': 1, 'volumes': 2})
+            self.driver.commit(reservations)
+        # The usages are locked and the quotas read once each, each usage is
+        # updated by reserve and by commit, and the reservations are read,
+        # inserted and updated at once.
+        self.assertEqual(9, counter.count)
+
+    def test_concurrent_reserves_keep_the_limit(self):
+        results = []
+
+        def reserve():
+            try:
+                self.driver.reserve(self.tenant_id, resources,
+                                    {'instances': 1})
+                results.append(True)
+            except exception.QuotaExceeded:
+                results.append(False)
+
+        threads = [threading.Thread(target=reserve)
+                   for _ in range(CONF.max_instances_per_user + 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(CONF.max_instances_per_user, results.count(True))
+        self.assertEqual((0, CONF.max_instances_per_user),
+                         self._usages()[Resource.INSTANCES])
+
+
+class ResyncUsagesTest(testtools.TestCase):
 
-        Reservation.save = Mock()
-        QuotaUsage.save = Mock()
-
-        FAKE_QUOTAS = [QuotaUsage(id=1,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.INSTANCES,
-                                  in_use=5,
-                                  reserved=2),
-                       QuotaUsage(id=2,
-                                  tenant_id=FAKE_TENANT1,
-                                  resource=Resource.VOLUMES,
-                                  in_use=1,
-                                  reserved=2)]
-
-        FAKE_RESERVATIONS = [Reservation(usage_id=1,
-                                         delta=1,
-                                         status=Reservation.Statuses.RESERVED),
-                             Reservation(usage_id=2,
-                                         delta=2,
-                                         status=Reservation.Statuses.RESERVED)]
-
-        QuotaUsage.find_by = Mock(side_effect=FAKE_QUOTAS)
-        self.driver.rollback(FAKE_RESERVATIONS)
-
-        self.assertEqual(5, FAKE_QUOTAS[0].in_use)
-        self.assertEqual(1, FAKE_QUOTAS[0].reserved)
-        self.assertEqual(Reservation.Statuses.ROLLEDBACK,
-                         FAKE_RESERVATIONS[0].status)
-
-        self.assertEqual(1, FAKE_QUOTAS[1].in_use)
-        self.assertEqual(0, FAKE_QUOTAS[1].reserved)
-        self.assertEqual(Reservation.Statuses.ROLLEDBACK,
-                         FAKE_RESERVATIONS[1].status)
+    def setUp(self):
+        super(ResyncUsagesTest, self).setUp()
+        util.init_db()
+        self.tenants = [utils.generate_uuid() for _ in range(3)]
+        self._isolate()
+        self.now = utils.utcnow()
+
+    def _isolate(self):
+        """Sets the rows of the other tests aside until the test is done, as
+        the resync covers every tenant.
+        """
+        saved = [(table, session._ENGINE.execute(table.select()).fetchall())
+                 for table in (tables.reservations, tables.quota_usages,
+                               tables.instances, tables.backups)]
+        for table, rows in saved:
+            session._ENGINE.execute(table.delete())
+        self.addCleanup(self._restore, saved)
+
+    def _restore(self, saved):
+        for table, rows in saved:
+            session._ENGINE.execute(table.delete())
+        for table, rows in reversed(saved):
+            if rows:
+                session._ENGINE.execute(table.insert(),
+                                        [dict(row) for row in rows])
+
+    def _add_instance(self, tenant_id, volume_size, deleted=False,
+                      task=InstanceTasks.NONE):
+        session._ENGINE.execute(tables.instances.insert().values(
+            id=utils.generate_uuid(), name='instance', tenant_id=tenant_id,
+            volume_size=volume_size, deleted=deleted, task_id=task.code))
+
+    def _add_backup(self, tenant_id, deleted=False,
+                    state=BackupState.COMPLETED):
+        session._ENGINE.execute(tables.backups.insert().values(
+            id=utils.generate_uuid(), name='backup', state=state,
+            tenant_id=tenant_id, deleted=deleted))
+
+    def _add_usage(self, tenant_id, resource, in_use, reserved):
+        usage_id = utils.generate_uuid()
+        session._ENGINE.execute(tables.quota_usages.insert().values(
+            id=usage_id, tenant_id=tenant_id, resource=resource,
+            in_use=in_use, reserved=reserved))
+        return usage_id
+
+    def _add_reservation(self, usage_id, delta, created):
+        reservation_id = utils.generate_uuid()
+        session._ENGINE.execute(tables.reservations.insert().values(
+            id=reservation_id, usage_id=usage_id, delta=delta,
+            status=Reservation.Statuses.RESERVED, created=created))
+        return reservation_id
+
+    def _usages(self):
+        usages = tables.quota_usages
+        rows = session._ENGINE.execute(usages.select().where(
+            usages.c.tenant_id.in_(self.tenants)))
+        return dict(((row.tenant_id, row.resource), (row.in_use, row.reserved))
+                    for row in rows)
+
+    def _resync(self, batch_size=1000):
+        return QUOTAS.resync_usages(self.now - datetime.timedelta(hours=24),
+                                    batch_size)
+
+    def test_counts_the_rows(self):
+        first, second, third = self.tenants
+        self._add_instance(first, 2)
+        self._add_instance(first, 3)
+        self._add_instance(first, 4, deleted=True)
+        self._add_instance(first, 5, task=InstanceTasks.DELETING)
+        self._add_backup(first)
+        self._add_backup(first, deleted=True)
+        self._add_usage(first, 'instances', 4, 1)
+        self._add_usage(first, 'backups', 1, 0)
+        self._add_usage(second, 'instances', 2, 0)
+        self._add_instance(third, 1)
+        resynced = self._resync()
+        usages = self._usages()
+        self.assertEqual((2, 0), usages[(first, 'instances')])
+        self.assertEqual((1, 0), usages[(first, 'backups')])
+        self.assertEqual((0, 0), usages[(second, 'instances')])
+        self.assertEqual((1, 0), usages[(third, 'instances')])
+        added = 1
+        if CONF.trove_volume_support:
+            self.assertEqual((5, 0), usages[(first, 'volumes')])
+            self.assertEqual((1, 0), usages[(third, 'volumes')])
+            added += 2
+        self.assertEqual({'expired': 0, 'corrected': 2, 'added': added},
+                         resynced)
+
+    def test_leaves_out_backups_whose_deletion_failed(self):
+        first = self.tenants[0]
+        self._add_backup(first)
+        self._add_backup(first, state=BackupState.DELETE_FAILED)
+        self._add_usage(first, 'backups', 2, 0)
+        self._resync()
+        self.assertEqual((1, 0), self._usages()[(first, 'backups')])
+
+    def test_leaves_usages_with_pending_reservations(self):
+        first = self.tenants[0]
+        self._add_instance(first, 1)
+        usage_id = self._add_usage(first, 'instances', 0, 1)
+        self._add_reservation(usage_id, 1, self.now)
+        self._resync()
+        self.assertEqual((0, 1), self._usages()[(first, 'instances')])
+
+    def test_leaves_usages_changed_after_the_count(self):
+        first = self.tenants[0]
+        self._add_instance(first, 1)
+        usage_id = self._add_usage(first, 'instances', 1, 0)
+        count_in_use = db_quotas._count_in_use
+
+        def count_then_create(db_session, resources):
+            # Another instance is created and its reservation committed
+            # once the rows are counted.
+            in_use = count_in_use(db_session, resources)
+            self._add_instance(first, 1)
+            usages = tables.quota_usages
+            session._ENGINE.execute(usages.update().where(
+                usages.c.id == usage_id).values(in_use=2))
+            return in_use
+
+        self.addCleanup(setattr, db_quotas, '_count_in_use', count_in_use)
+        db_quotas._count_in_use = count_then_create
+        self._resync()
+        self.assertEqual((2, 0), self._usages()[(first, 'instances')])
+
+    def test_expires_old_reservations(self):
+        first = self.tenants[0]
+        self._add_instance(first, 1)
+        usage_id = self._add_usage(first, 'instances', 1, 2)
+        expired = self._add_reservation(
+            usage_id, 2, self.now - datetime.timedelta(hours=25))
+        resynced = self._resync()
+        self.assertEqual({'expired': 1, 'corrected': 0,
+                          'added': int(CONF.trove_volume_support)},
+                         resynced)
+        self.assertEqual((1, 0), self._usages()[(first, 'instances')])
+        row = session._ENGINE.execute(tables.reservations.select().where(
+            tables.reservations.c.id == expired)).fetchone()
+        self.assertEqual(Reservation.Statuses.ROLLEDBACK, row.status)
+
+    def test_batches(self):
+        for tenant_id in self.tenants:
+            self._add_usage(tenant_id, 'instances', 3, 0)
+        self._resync()
+        for tenant_id in self.tenants:
+            self._add_usage(tenant_id, 'backups', 3, 0)
+        with util.QueryCounter() as counter:
+            self._resync(batch_size=2)
+        updates = [statement for statement in counter.statements
+                   if statement.startswith('UPDATE quota_usages')]
+        self.assertEqual(2, len(updates))
+        self.assertEqual((0, 0), self._usages()[(self.tenants[2],
+                                                 'backups')])
@@ -15,7 +15,11 @@ import testtools
 from testtools.matchers import Equals
 from mockito import mock, when, unstub, any, verify, never
 
+from trove.instance.models import BaseInstance
+from trove.instance.models import DBInstance
+from trove.instance.tasks import InstanceTasks
 from trove.taskmanager.models import NotifyMixin
+from trove.tests.unittests.util import util
 import trove.common.remote as remote
 import trove.taskmanager.models as taskmanager_models
 import trove.backup.models as backup_models
@@ -244,3 +248,35 @@ class NotifyMixinTest(testtools.TestCase):
         transformer = NotifyMixin()
         self.assertThat(transformer._get_service_id('m0ng0', id_map),
                         Equals('unknown-service-id-error'))
+
+
+class FinishTaskTest(testtools.TestCase):
+
+    def setUp(self):
+        super(FinishTaskTest, self).setUp()
+        util.init_db()
+        self.db_info = DBInstance.create(name='instance',
+                                         flavor_id=1,
+                                         tenant_id='TENANT',
+                                         volume_size=1,
+                                         service_type='mysql',
+                                         task_status=InstanceTasks.REBOOTING)
+        self.instance = BaseInstance(None, self.db_info, None, None)
+
+    def tearDown(self):
+        super(FinishTaskTest, self).tearDown()
+        self.db_info.delete()
+
+    def _task_status(self):
+        return DBInstance.find_by(id=self.db_info.id).task_status
+
+    def test_finish_task(self):
+        taskmanager_models.finish_task(self.instance)
+        self.assertEqual(InstanceTasks.NONE, self._task_status())
+
+    def test_leaves_newer_task(self):
+        DBInstance.compare_and_set_task(self.db_info.id,
+                                        InstanceTasks.REBOOTING,
+                                        InstanceTasks.DELETING)
+        taskmanager_models.finish_task(self.instance)
+        self.assertEqual(InstanceTasks.DELETING, self._task_status())
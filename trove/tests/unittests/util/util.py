@@ -21,3 +21,42 @@ def init_db():
     db_api = get_db_api()
     db_api.db_sync(CONF)
     session.configure_db(CONF)
+
+
+class QueryCounter(object):
+    """Counts the SQL statements issued against the engine while active.
+
+    with QueryCounter() as counter:
+        do_something()
+    self.assertEqual(3, counter.count)
+    """
+
+    _active = []
+    _listening = False
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self.parameters = []
+
+    def __enter__(self):
+        from sqlalchemy import event
+        from trove.db.sqlalchemy import session
+        # SQLAlchemy 0.7 can't remove listeners, so one is attached per
+        # process and dispatches to whichever counters are active.
+        if not QueryCounter._listening:
+            event.listen(session._ENGINE, 'before_cursor_execute',
+                         QueryCounter._record)
+            QueryCounter._listening = True
+        QueryCounter._active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        QueryCounter._active.remove(self)
+
+    @staticmethod
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        for counter in QueryCounter._active:
+            counter.count += 1
+            counter.statements.append(statement)
+            counter.parameters.append(parameters)